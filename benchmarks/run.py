@@ -0,0 +1,216 @@
+"""
+Benchmark page_loader.download against a local synthetic server.
+
+Every scenario runs in a fresh interpreter, so that its peak RSS is its
+own, and is compared with benchmarks/baseline.json. Run from the
+repository root:
+
+    python -m benchmarks.run                    # run and compare
+    python -m benchmarks.run -s small -s errors # only some scenarios
+    python -m benchmarks.run --update-baseline  # record a new baseline
+
+The exit status is 1 if a metric regressed by more than the tolerance.
+Record the baseline on the machine the benchmarks are compared on.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.server import Scenario, SyntheticServer
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+HIGHER_IS_BETTER = ('pages_per_sec', 'assets_per_sec')
+LOWER_IS_BETTER = ('p50_latency', 'p95_latency', 'peak_rss_mib')
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    Scenario('small', pages=20),
+    Scenario('many-assets', pages=5, assets=200, asset_size=2 * 1024,
+             workers=8),
+    Scenario('large-page', pages=2, page_size=4 * 1024 * 1024, assets=20),
+    Scenario('large-assets', pages=3, assets=10,
+             asset_size=2 * 1024 * 1024, workers=4),
+    Scenario('latency', pages=5, assets=30, latency=0.02, workers=8),
+    Scenario('errors', pages=10, assets=20, error_rate=0.2),
+)}
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mib():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in kilobytes elsewhere
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+    return peak_rss / (1024 * 1024)
+
+
+def run_scenario(scenario, base_url):
+    import page_loader
+
+    # Same retry backoff jitter on every run
+    random.seed(0)
+    latencies = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Not measured: warms up the imports and the parser
+        page_loader.download(scenario.page_url(base_url, 0), temp_dir,
+                             workers=scenario.workers)
+
+        start_time = time.perf_counter()
+        for number in range(1, scenario.pages + 1):
+            page_start_time = time.perf_counter()
+            page_loader.download(scenario.page_url(base_url, number),
+                                 temp_dir, workers=scenario.workers)
+            latencies.append(time.perf_counter() - page_start_time)
+        elapsed_time = time.perf_counter() - start_time
+
+    return {
+        'pages_per_sec': scenario.pages / elapsed_time,
+        'assets_per_sec':
+            scenario.pages * scenario.served_assets / elapsed_time,
+        'p50_latency': percentile(latencies, 50),
+        'p95_latency': percentile(latencies, 95),
+        'peak_rss_mib': peak_rss_mib(),
+    }
+
+
+def run_in_subprocess(scenario, base_url):
+    env = dict(os.environ, ENV='production')
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run',
+         '--child', scenario.name, '--base-url', base_url],
+        env=env, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return the (scenario, metric, baseline value, value) that regressed
+    """
+    regressions = []
+    for name, metrics in results.items():
+        baseline_metrics = baseline.get(name, {}).get('metrics', {})
+        for metric, value in metrics.items():
+            baseline_value = baseline_metrics.get(metric)
+            if value is None or not baseline_value:
+                continue
+            if is_regression(metric, value, baseline_value, tolerance):
+                regressions.append((name, metric, baseline_value, value))
+    return regressions
+
+
+def is_regression(metric, value, baseline_value, tolerance):
+    if metric in HIGHER_IS_BETTER:
+        return value < baseline_value * (1 - tolerance)
+    if metric in LOWER_IS_BETTER:
+        return value > baseline_value * (1 + tolerance)
+    return False
+
+
+def format_change(value, baseline_value):
+    if value is None or not baseline_value:
+        return ''
+    return f' ({(value / baseline_value - 1) * 100:+.0f}%)'
+
+
+def print_results(results, baseline):
+    print(f"{'scenario':<14}{'pages/s':>16}{'assets/s':>18}"
+          f"{'p50 ms':>16}{'p95 ms':>16}{'peak RSS MiB':>18}")
+    for name, metrics in results.items():
+        baseline_metrics = baseline.get(name, {}).get('metrics', {})
+        cells = []
+        for metric, scale, width in (
+                ('pages_per_sec', 1, 16), ('assets_per_sec', 1, 18),
+                ('p50_latency', 1000, 16), ('p95_latency', 1000, 16),
+                ('peak_rss_mib', 1, 18)):
+            value = metrics[metric]
+            if value is None:
+                cells.append(f"{'-':>{width}}")
+                continue
+            change = format_change(value, baseline_metrics.get(metric))
+            cells.append(f'{value * scale:.1f}{change}'.rjust(width))
+        print(f'{name:<14}' + ''.join(cells))
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    # The scenarios not run keep their previous baseline
+    baseline = load_baseline(path)
+    baseline.update(
+        (name, {'scenario': SCENARIOS[name].to_dict(), 'metrics': metrics})
+        for name, metrics in results.items())
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='page_loader benchmarks')
+    parser.add_argument(
+        '-s', '--scenario', action='append', choices=list(SCENARIOS),
+        help='Scenario to run, can be repeated (default: all)')
+    parser.add_argument(
+        '--baseline', default=BASELINE_FILE,
+        help='Baseline file to compare with')
+    parser.add_argument(
+        '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+        help='Relative change of a metric reported as a regression')
+    parser.add_argument(
+        '--update-baseline', action='store_true',
+        help='Save the results as the new baseline')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        print(json.dumps(run_scenario(SCENARIOS[args.child], args.base_url)))
+        return
+
+    names = args.scenario or list(SCENARIOS)
+    with SyntheticServer() as server:
+        results = {name: run_in_subprocess(SCENARIOS[name], server.base_url)
+                   for name in names}
+
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        print(f'Baseline saved to {args.baseline}')
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, metric, baseline_value, value in regressions:
+        print(f'REGRESSION {name} {metric}: {baseline_value:.4g} -> '
+              f'{value:.4g}{format_change(value, baseline_value)}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Local HTTP server generating synthetic pages and assets.
+
+The server is stateless: the shape of a page is encoded in its path,
+
+    /<page size>/<assets>/<asset size>/<latency ms>/<error %>/page-<n>.html
+
+so one server serves every scenario, and the same path always gets the
+same bytes.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ASSET_EXTENSIONS = ('css', 'js', 'png')
+ASSET_TAGS = {
+    'css': '<link rel="stylesheet" href="{}">',
+    'js': '<script src="{}"></script>',
+    'png': '<img src="{}" alt="">',
+}
+CONTENT_TYPES = {
+    'html': 'text/html; charset=utf-8',
+    'css': 'text/css',
+    'js': 'application/javascript',
+    'png': 'image/png',
+}
+PARAGRAPH = ('<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, '
+             'sed do eiusmod tempor incididunt ut labore.</p>\n')
+
+
+class Scenario:
+    def __init__(self, name, pages=10, page_size=16 * 1024, assets=10,
+                 asset_size=4 * 1024, latency=0.0, error_rate=0.0,
+                 workers=1):
+        self.name = name
+        self.pages = pages
+        self.page_size = page_size
+        self.assets = assets
+        self.asset_size = asset_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.workers = workers
+
+    @property
+    def prefix(self):
+        return (f'/{self.page_size}/{self.assets}/{self.asset_size}'
+                f'/{round(self.latency * 1000)}'
+                f'/{round(self.error_rate * 100)}')
+
+    def page_url(self, base_url, number):
+        return f'{base_url}{self.prefix}/page-{number}.html'
+
+    @property
+    def served_assets(self):
+        """
+        The number of assets of a page answered with 200
+        """
+        error_percent = round(self.error_rate * 100)
+        return sum(not is_failing(index, error_percent)
+                   for index in range(self.assets))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in (
+            'pages', 'page_size', 'assets', 'asset_size', 'latency',
+            'error_rate', 'workers')}
+
+
+def is_failing(index, error_percent):
+    # Spread the failures evenly and deterministically over the assets
+    return index * 37 % 100 < error_percent
+
+
+def render_page(prefix, page_size, assets):
+    tags = []
+    for index in range(assets):
+        extension = ASSET_EXTENSIONS[index % len(ASSET_EXTENSIONS)]
+        tags.append(ASSET_TAGS[extension].format(
+            f'{prefix}/assets/{index}.{extension}'))
+    head = ('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+            '<title>Synthetic page</title>\n')
+    body = '</head>\n<body>\n' + '\n'.join(tags) + '\n'
+    tail = '</body>\n</html>\n'
+    filler_size = max(0, page_size - len(head) - len(body) - len(tail))
+    filler = PARAGRAPH * (filler_size // len(PARAGRAPH) + 1)
+    return (head + body + filler[:filler_size] + tail).encode('utf-8')
+
+
+class SyntheticRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately: with Nagle's algorithm
+    # the body would wait for the client's delayed ACK on every request
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        try:
+            page_size, assets, asset_size, latency_ms, error_percent, \
+                *resource = self.path.strip('/').split('/')
+            page_size, assets, asset_size, latency_ms, error_percent = map(
+                int, (page_size, assets, asset_size, latency_ms,
+                      error_percent))
+        except ValueError:
+            return self.respond(404)
+
+        time.sleep(latency_ms / 1000)
+
+        prefix = '/'.join(self.path.split('/')[:6])
+        if len(resource) == 1 and resource[0].startswith('page-'):
+            return self.respond(
+                200, 'html', render_page(prefix, page_size, assets))
+        if len(resource) == 2 and resource[0] == 'assets':
+            index, _, extension = resource[1].partition('.')
+            if not index.isdigit():
+                return self.respond(404)
+            if is_failing(int(index), error_percent):
+                return self.respond(500)
+            return self.respond(200, extension, b'x' * asset_size)
+        return self.respond(404)
+
+    def respond(self, status, extension=None, body=b''):
+        self.send_response(status)
+        self.send_header(
+            'Content-Type', CONTENT_TYPES.get(extension, 'text/plain'))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SyntheticServer:
+    """
+    Run the synthetic server on a local port in a background thread
+    """
+
+    def __init__(self, host='localhost', port=0):
+        # The host name is kept for the urls: page_loader derives file
+        # names from them and expects no dots besides the extension
+        self.host = host
+        self.__server = ThreadingHTTPServer(
+            (host, port), SyntheticRequestHandler)
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.__server.server_address[1]}'
+
+    def __enter__(self):
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.__server.shutdown()
+        self.__server.server_close()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark of the per-asset url handling: the string functions of
+url_utils, each parsing the url again, against ParsedUrl.
+
+Run from the repository root:
+
+    python -m benchmarks.url_parsing
+"""
+import timeit
+from urllib.parse import urlparse, urlunparse
+
+from page_loader import url_utils
+from page_loader.url_utils import DEFAULT_PORTS
+
+DOMAIN = 'lorem.dot.net'
+FULL_DOMAIN = 'https://lorem.dot.net'
+BASE_URL = 'https://lorem.dot.net/courses/'
+ASSET_URL_TEMPLATES = (
+    '/assets/{}/application.css',
+    '/assets/professions/{}.png',
+    'https://lorem.dot.net/packs/js/runtime-{}.js',
+    'https://cdn.other.net/lib/jquery-{}.js',
+    'images/logo-{}.png',
+    '/courses/{}',
+)
+UNIQUE_URLS = [template.format(i) for i in range(50)
+               for template in ASSET_URL_TEMPLATES]
+REPEATED_URLS = [template.format(0) for _ in range(50)
+                 for template in ASSET_URL_TEMPLATES]
+REPEAT = 5
+NUMBER = 20
+
+
+def normalize_url(url):
+    # url_utils.normalize_url() before it was based on ParsedUrl
+    parsed_url = urlparse(url)
+    scheme = parsed_url.scheme.lower()
+    netloc = parsed_url.netloc.lower()
+    if parsed_url.port and DEFAULT_PORTS.get(scheme) == parsed_url.port:
+        netloc = netloc.rsplit(':', 1)[0]
+    path = parsed_url.path or ('/' if netloc else '')
+    return urlunparse(
+        (scheme, netloc, path, parsed_url.params, parsed_url.query, ''))
+
+
+def with_functions(asset_url):
+    asset_domain = url_utils.domain(asset_url)
+    if asset_domain and asset_domain != DOMAIN:
+        return None
+    if url_utils.domain(asset_url):
+        request_url = asset_url
+    elif url_utils.is_absolute_path(asset_url):
+        request_url = f'{FULL_DOMAIN}{asset_url}'
+    else:
+        request_url = f'{BASE_URL}{asset_url}'
+    url_for_link = request_url
+    if not url_utils.extension(url_for_link):
+        url_for_link = f"{url_for_link.rstrip('/')}.html"
+    return (normalize_url(request_url),
+            url_utils.filename_from_full_url(url_for_link))
+
+
+def with_parsed_url(asset_url):
+    asset_url = url_utils.parse_url(asset_url)
+    if asset_url.netloc and asset_url.netloc != DOMAIN:
+        return None
+    if asset_url.netloc:
+        request_url = asset_url
+    elif asset_url.is_absolute_path:
+        request_url = url_utils.parse_url(f'{FULL_DOMAIN}{asset_url}')
+    else:
+        request_url = url_utils.parse_url(f'{BASE_URL}{asset_url}')
+    url_for_link = request_url
+    if not url_for_link.extension:
+        url_for_link = url_utils.parse_url(
+            f"{url_for_link.url.rstrip('/')}.html")
+    return request_url.normalized, url_for_link.local_filename
+
+
+def measure(prepare_asset, asset_urls):
+    # Every run starts with an empty cache, so the urls of a run are
+    # memoized only across the tags of that run, as for a real page
+    def run():
+        url_utils.parse_url.cache_clear()
+        for asset_url in asset_urls:
+            prepare_asset(asset_url)
+
+    return min(timeit.repeat(run, repeat=REPEAT, number=NUMBER)) / NUMBER
+
+
+def main():
+    for name, asset_urls in (('unique', UNIQUE_URLS),
+                             ('repeated', REPEATED_URLS)):
+        assert list(map(with_functions, asset_urls)) == \
+            list(map(with_parsed_url, asset_urls))
+        functions_time = measure(with_functions, asset_urls)
+        parsed_url_time = measure(with_parsed_url, asset_urls)
+        print(f'{len(asset_urls)} {name} asset urls: '
+              f'functions {functions_time * 1000:.3f} ms, '
+              f'ParsedUrl {parsed_url_time * 1000:.3f} ms '
+              f'({functions_time / parsed_url_time:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,47 @@
-from page_loader.page_loader import download
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ('download', )
+if TYPE_CHECKING:
+    from page_loader.batch import download_many
+    from page_loader.client import PageLoader
+    from page_loader.events import Event
+    from page_loader.metrics import DownloadMetrics
+    from page_loader.mirroring import mirror
+    from page_loader.page_loader import (
+        download,
+        download_async,
+        download_with_metrics,
+    )
+    from page_loader.progress import ProgressRenderer
+
+# Public name -> module defining it. The modules are imported on first
+# access (PEP 562), so that importing the package, e.g. for the CLI's
+# --version, does not load requests and bs4
+_EXPORTS = {
+    'download': 'page_loader.page_loader',
+    'download_async': 'page_loader.page_loader',
+    'download_with_metrics': 'page_loader.page_loader',
+    'download_many': 'page_loader.batch',
+    'mirror': 'page_loader.mirroring',
+    'PageLoader': 'page_loader.client',
+    'DownloadMetrics': 'page_loader.metrics',
+    'Event': 'page_loader.events',
+    'ProgressRenderer': 'page_loader.progress',
+}
+
+__all__ = ('download', 'download_async', 'download_many',
+           'download_with_metrics', 'mirror', 'PageLoader', 'DownloadMetrics',
+           'Event', 'ProgressRenderer')
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,18 +1,41 @@
+import asyncio
+import hashlib
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from bs4.element import Tag
 
 from . import url_utils
+from .events import (
+    ASSET_DONE,
+    ASSET_FAILED,
+    ASSET_PROGRESS,
+    ASSET_QUEUED,
+    ASSET_STARTED,
+)
+from .manifest import Record
+from .metrics import ASSET_DISCOVERY, ASSET_DOWNLOAD, AssetMetrics
 
 
 class AssetsProcessor:
     def __init__(self, download_manager):
         self.__download_manager = download_manager
-        self.__full_domain = url_utils.full_domain(self.__download_manager.url)
-        self.__base_url = url_utils.base_url(self.__download_manager.url)
-        self.__domain = url_utils.domain(self.__download_manager.url)
+        page_url = url_utils.parse_url(self.__download_manager.url)
+        self.__full_domain = page_url.full_domain
+        self.__base_url = url_utils.base_url(page_url.url)
+        self.__domain = page_url.netloc
         self.__assets_dir = self.__download_manager.assets_dir
+        self.__workers = self.__download_manager.workers
+        self.__http_client = self.__download_manager.http_client
+        self.__metrics = self.__download_manager.metrics
+        self.__events = self.__download_manager.events
+
+        self.__streamed_downloads = {}
+        self.__streaming_executor = None
+        self.__assets_dir_created = None
 
         self.__assets_path = url_utils.dirname_for_web_assets(
             self.__download_manager.path_to_save_page_content)
@@ -21,45 +44,224 @@ class AssetsProcessor:
         self._log_attributes()
 
     def download_assets(self):
-        assets = self._get_page_assets()
+        with self.__metrics.phase(ASSET_DISCOVERY):
+            assets = self._get_page_assets()
 
         if not assets or not self._make_assets_dir():
             return
 
-        processed_assets_results = [
-            self._process_asset(asset)
-            for asset in assets
-        ]
+        processed_assets_results = self._process_assets(assets)
+        processed_assets_exist = any(processed_assets_results)
+
+        if not processed_assets_exist:
+            self.remove_assets_dir()
+
+    async def download_assets_async(self):
+        with self.__metrics.phase(ASSET_DISCOVERY):
+            assets = self._get_page_assets()
+
+        if not assets or not await asyncio.to_thread(self._make_assets_dir):
+            return
+
+        processed_assets_results = await self._process_assets_async(assets)
         processed_assets_exist = any(processed_assets_results)
 
         if not processed_assets_exist:
-            self.__remove_assets_dir()
+            await asyncio.to_thread(self.remove_assets_dir)
+
+    def process_streamed_asset(self, tag_name, attrs):
+        """
+        Queue the download of an asset tag found while streaming the page
+        and return (link attribute, updated link), or None to leave the
+        tag as is
+        """
+        asset_link_attr = self.__download_manager.asset_tags.get(tag_name)
+        if asset_link_attr is None or not dict(attrs).get(asset_link_attr):
+            return None
+
+        prepared = self._prepare_asset(Tag(name=tag_name, attrs=dict(attrs)))
+        if prepared is None:
+            return None
+        _, request_url, path_to_save, url_for_link = prepared
+
+        key = path_to_save
+        if key in self.__streamed_downloads:
+            self.__logger.debug('Duplicate asset URL: %s', request_url)
+            self.__metrics.duplicates_skipped += 1
+        elif self.__make_streamed_assets_dir():
+            if self.__streaming_executor is None:
+                self.__streaming_executor = ThreadPoolExecutor(
+                    max_workers=self.__workers)
+            self.__events.emit(ASSET_QUEUED, request_url.url)
+            self.__streamed_downloads[key] = self.__streaming_executor.submit(
+                self._download_asset, request_url.url, path_to_save)
+        else:
+            return None
+
+        return asset_link_attr, self._get_asset_updated_link(url_for_link)
+
+    def finish_streamed_assets(self):
+        """
+        Wait for the downloads queued by process_streamed_asset
+        """
+        if self.__streaming_executor is None:
+            return
+        with self.__metrics.phase(ASSET_DOWNLOAD):
+            self.__streaming_executor.shutdown(wait=True)
+        self.__streaming_executor = None
+        self.__logger.debug(
+            'Unique assets: %s, duplicates skipped: %s',
+            len(self.__streamed_downloads), self.__metrics.duplicates_skipped)
+
+    def __make_streamed_assets_dir(self):
+        # Created on the first asset to download, so nothing has to be
+        # removed when the page has none
+        if self.__assets_dir_created is None:
+            self.__assets_dir_created = self._make_assets_dir()
+        return self.__assets_dir_created
+
+    def revalidate_assets(self, records):
+        """
+        Bring the saved assets of a page up to date from their manifest
+        records, without the page itself
+        """
+        records = list(records)
+        with self.__metrics.phase(ASSET_DOWNLOAD):
+            self._download_assets(
+                [record.url for record in records],
+                [os.path.join(self.__download_manager.path, record.path)
+                 for record in records])
 
     def remove_assets_dir(self):
         try:
             shutil.rmtree(self.__assets_path)
             self.__logger.debug(
-                f'Removed assets directory: {self.__assets_path}')
+                'Removed assets directory: %s', self.__assets_path)
         except Exception as e:
             self.__logger.debug(
-                f'Failed to remove assets directory: {self.__assets_path}: {e}')
+                'Failed to remove assets directory: %s: %s',
+                self.__assets_path, e)
+
+    def list_assets(self):
+        """
+        Return the unique request URLs of the assets that would be
+        downloaded, without downloading them
+        """
+        _, downloads = self._prepare_assets(self._get_page_assets())
+        return [request_url.url for request_url, _, _ in downloads]
 
     def _get_page_assets(self):
-        return [asset for tag in self.__download_manager.asset_tags
-                for asset in self.__download_manager.soup.find_all(tag)]
+        # One traversal of the tree collects every asset tag in document
+        # order, instead of one find_all per tag name
+        return self.__download_manager.soup.find_all(
+            list(self.__download_manager.asset_tags))
+
+    def _process_assets(self, assets):
+        """
+        Download the assets (concurrently if more than one worker is
+        configured), then update their links in document order.
+        """
+        with self.__metrics.phase(ASSET_DISCOVERY):
+            prepared_assets, downloads = self._prepare_assets(assets)
+        request_urls = [request_url.url for request_url, _, _ in downloads]
+        paths_to_save = [path for _, path, _ in downloads]
+
+        with self.__metrics.phase(ASSET_DOWNLOAD):
+            self._download_assets(request_urls, paths_to_save)
+
+        self._update_asset_links(prepared_assets)
+        return [prepared is not None for prepared in prepared_assets]
+
+    def _download_assets(self, request_urls, paths_to_save):
+        for request_url in request_urls:
+            self.__events.emit(ASSET_QUEUED, request_url)
+        if self.__workers > 1 and len(request_urls) > 1:
+            self.__logger.debug(
+                'Downloading %s assets with %s workers',
+                len(request_urls), self.__workers)
+            with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+                list(executor.map(
+                    self._download_asset, request_urls, paths_to_save))
+        else:
+            for request_url, path_to_save in zip(request_urls, paths_to_save):
+                self._download_asset(request_url, path_to_save)
+
+    async def _process_assets_async(self, assets):
+        """
+        Download the assets on the running event loop, with at most
+        `workers` downloads in flight, then update their links in
+        document order.
+        """
+        with self.__metrics.phase(ASSET_DISCOVERY):
+            prepared_assets, downloads = self._prepare_assets(assets)
+        semaphore = asyncio.BoundedSemaphore(self.__workers)
+        for request_url, _, _ in downloads:
+            self.__events.emit(ASSET_QUEUED, request_url.url)
+
+        async def download_asset(request_url, path_to_save):
+            async with semaphore:
+                await asyncio.to_thread(
+                    self._download_asset, request_url.url, path_to_save)
+
+        with self.__metrics.phase(ASSET_DOWNLOAD):
+            await asyncio.gather(*(
+                download_asset(request_url, path_to_save)
+                for request_url, path_to_save, _ in downloads
+            ))
+
+        self._update_asset_links(prepared_assets)
+        return [prepared is not None for prepared in prepared_assets]
+
+    def _prepare_assets(self, assets):
+        """
+        Resolve every asset to (asset, request URL, path to save, URL for
+        link), or None if it is ignored, and collect the downloads to run.
+        URLs are ParsedUrl instances, so each one is parsed only once.
+        Assets are memoized by the path they are saved to, so a resource
+        referenced by several tags is downloaded once and all of them
+        link to the same local file. Urls differing only in their query
+        string share a path too: the first one is downloaded, so that no
+        two downloads write the same file.
+        """
+        downloads = {}
+        prepared_assets = []
+
+        for asset in assets:
+            prepared = self._prepare_asset(asset)
+            if prepared is None:
+                prepared_assets.append(None)
+                continue
+            _, request_url, path_to_save, url_for_link = prepared
+            key = path_to_save
+            if key in downloads:
+                self.__logger.debug('Duplicate asset URL: %s', request_url)
+            else:
+                downloads[key] = (request_url, path_to_save, url_for_link)
+            prepared_assets.append((asset, *downloads[key]))
 
-    def _process_asset(self, asset):
-        asset_url = self._get_asset_url(asset)
+        processed_count = sum(bool(prepared) for prepared in prepared_assets)
+        self.__metrics.duplicates_skipped = processed_count - len(downloads)
+        self.__logger.debug(
+            'Unique assets: %s, duplicates skipped: %s',
+            len(downloads), self.__metrics.duplicates_skipped)
+        return prepared_assets, list(downloads.values())
+
+    def _update_asset_links(self, prepared_assets):
+        for prepared in prepared_assets:
+            if prepared is not None:
+                asset, _, _, url_for_link = prepared
+                self._update_asset_link(asset, url_for_link)
+
+    def _prepare_asset(self, asset):
+        asset_url = url_utils.parse_url(self._get_asset_url(asset))
 
         if self._should_ignore_host(asset_url):
-            return False
+            return None
 
         asset_request_url = self._get_request_url(asset_url)
         asset_url_for_link = self.__get_url_for_link(asset_request_url)
         path_to_save = self._get_path_to_save_asset(asset_url_for_link)
-        self._download_asset(asset_request_url, path_to_save)
-        self._update_asset_link(asset, asset_url_for_link)
-        return True
+        return asset, asset_request_url, path_to_save, asset_url_for_link
 
     def _should_ignore_host(self, asset_path):
         return self.__download_manager.ignore_other_hosts and \
@@ -68,30 +270,30 @@ class AssetsProcessor:
     def _update_asset_link(self, asset, asset_full_url):
         new_asset_link = self._get_asset_updated_link(asset_full_url)
         asset_link_attr = self._get_asset_link_attr(asset)
-        asset[asset_link_attr] = new_asset_link
+        self.__download_manager.rewrite_link(
+            asset, asset_link_attr, new_asset_link)
 
     def _get_asset_url(self, asset):
         asset_link_attr = self._get_asset_link_attr(asset)
         url = asset.get(asset_link_attr)
-        self.__logger.debug(f'Asset URL: {url}')
+        self.__logger.debug('Asset URL: %s', url)
         return url
 
     def _get_request_url(self, url):
-        if url_utils.domain(url):
-            self.__logger.debug(f'Asset is an absolute URL: {url}')
+        if url.netloc:
+            self.__logger.debug('Asset is an absolute URL: %s', url)
             return url
 
-        if url_utils.is_absolute_path(url):
+        if url.is_absolute_path:
             full_url = f'{self.__full_domain}{url}'
-            self.__logger.debug(f'Full URL for absolute path: {full_url}')
-            return full_url
+            self.__logger.debug('Full URL for absolute path: %s', full_url)
+            return url_utils.parse_url(full_url)
 
-        full_url = f'{self.__base_url}{url}'
-        return full_url
+        return url_utils.parse_url(f'{self.__base_url}{url}')
 
     def __get_url_for_link(self, url):
-        if not url_utils.extension(url):
-            url = f"{url.rstrip('/')}.html"
+        if not url.extension:
+            url = url_utils.parse_url(f"{url.url.rstrip('/')}.html")
         return url
 
     def _get_full_url(self, asset_path, asset):
@@ -107,36 +309,39 @@ class AssetsProcessor:
             return full_url
 
         full_url = f'{self.__base_url}{asset_path}'
-        self.__logger.debug(f'Full URL for relative path: {full_url}')
+        self.__logger.debug('Full URL for relative path: %s', full_url)
         return full_url
 
     # TODO: test it
     def _make_assets_dir(self):
         try:
-            os.makedirs(self.__assets_path)
+            # Left by a previous run of the page, whose manifest tells
+            # which of its assets are still up to date
+            os.makedirs(self.__assets_path, exist_ok=True)
             self.__logger.debug(
-                f'Created assets directory: {self.__assets_path}')
+                'Created assets directory: %s', self.__assets_path)
             return True
 
         except OSError as e:
-            self.__logger.debug(f'Failed to create assets directory: '
-                                f'{self.__assets_path}. Error: {e}')
+            self.__logger.debug(
+                'Failed to create assets directory: %s. Error: %s',
+                self.__assets_path, e)
             return False
 
     # TODO: Maybe refactoring is needed again
     # TODO: Move an asset processing logic to a separate class
     def _get_asset_updated_link(self, asset_full_url):
-        base_path_to_save = url_utils.filename_from_full_url(asset_full_url)
+        base_path_to_save = asset_full_url.local_filename
         updated_link = os.path.join(
             self.__download_manager.assets_dir, base_path_to_save)
-        self.__logger.debug(f'Updated asset link: {updated_link}')
+        self.__logger.debug('Updated asset link: %s', updated_link)
         return updated_link
 
     def _get_path_to_save_asset(self, asset_full_url):
         asset_new_link = self._get_asset_updated_link(asset_full_url)
         path_to_save = os.path.join(
             self.__download_manager.path, asset_new_link)
-        self.__logger.debug(f'Path to save asset: {path_to_save}')
+        self.__logger.debug('Path to save asset: %s', path_to_save)
         return path_to_save
 
     def _get_asset_link_attr(self, asset):
@@ -155,30 +360,114 @@ class AssetsProcessor:
         return False
 
     def _is_other_domain(self, asset_url):
-        asset_domain = url_utils.domain(asset_url)
+        asset_domain = asset_url.netloc
         return asset_domain != '' and asset_domain != self.__domain
 
     # TODO: test it
     def _download_asset(self, url, save_path):
+        start_time = time.perf_counter()
+        asset_metrics = AssetMetrics(url, 0.0)
+        self.__events.emit(ASSET_STARTED, url)
+        record = self._get_previous_record(url, save_path)
         try:
-            response = requests.get(url)
-            if response.ok:
-                with open(save_path, 'wb') as f:
-                    f.write(response.content)
-                self.__logger.debug(
-                    f"asset file '{url}' downloaded successfully "
-                    f"and saved to '{save_path}'")
+            record = self._fetch_asset(url, save_path, record, asset_metrics)
+        except requests.exceptions.RequestException as e:
+            asset_metrics.error = str(e)
+            self.__logger.debug(
+                "Failed to download asset file '%s'. Error: %s", url, e)
+        except Exception as e:
+            asset_metrics.error = str(e)
+            raise
+        finally:
+            # An asset failing to download keeps its previous copy
+            if record and self.__download_manager.manifest:
+                self.__download_manager.manifest.add_asset(record)
+            asset_metrics.elapsed_time = time.perf_counter() - start_time
+            self.__metrics.record_asset(asset_metrics)
+            if asset_metrics.failed:
+                self.__events.emit(
+                    ASSET_FAILED, url, error=asset_metrics.error)
             else:
+                self.__events.emit(
+                    ASSET_DONE, url, size=asset_metrics.size,
+                    path=save_path)
+
+    def _fetch_asset(self, url, save_path, previous, asset_metrics):
+        """
+        Download the asset unless its previous copy is still fresh or
+        not modified, and return the record of the saved copy
+        """
+        if previous and previous.is_fresh():
+            asset_metrics.unchanged = True
+            self.__logger.debug("asset file '%s' is fresh, not requested", url)
+            return previous
+
+        headers = previous.conditional_headers() if previous else None
+        with self.__http_client.get(
+                url, headers=headers,
+                deadline=self.__download_manager.deadline_at) as response:
+            self.__metrics.record_response(response)
+            asset_metrics.status_code = response.status_code
+            asset_metrics.from_cache = response.from_cache
+            asset_metrics.attempts = response.attempts
+
+            if previous and response.status_code == 304:
+                previous.update_validators(response.headers)
+                asset_metrics.unchanged = True
+                self.__logger.debug("asset file '%s' not modified", url)
+                return previous
+
+            if not response.ok:
+                asset_metrics.error = f'Status code: {response.status_code}'
                 self.__logger.debug(
-                    f"Failed to download asset file '{url}'"
-                    f'Status code: {response.status_code}')
-        except requests.exceptions.RequestException as e:
-            self.__logger.debug(f"Failed to download asset file '{url}'. "
-                                f"Error: {e}")
+                    "Failed to download asset file '%s'. Status code: %s",
+                    url, response.status_code)
+                return previous
+
+            # Hashed as it streams in, to tell a changed or corrupted
+            # copy from the one recorded
+            digest = hashlib.sha256()
+            asset_metrics.size = self.__http_client.save_content(
+                response, save_path,
+                self._get_progress_callback(url, response), digest)
+            self.__metrics.record_bytes(response, asset_metrics.size)
+            sha256 = digest.hexdigest()
+            # New validators, same content
+            asset_metrics.unchanged = bool(previous) and \
+                previous.sha256 == sha256
+            self.__logger.debug(
+                "asset file '%s' downloaded successfully and saved to '%s'",
+                url, save_path)
+            return Record.from_response(
+                url, self._get_relative_path(save_path), response,
+                asset_metrics.size, sha256)
+
+    def _get_progress_callback(self, url, response):
+        # No callback, hence no per-chunk cost, without observers
+        if not self.__events:
+            return None
+        length = response.headers.get('Content-Length')
+        total = int(length) if length and length.isdigit() else None
+
+        def on_chunk(size):
+            self.__events.emit(ASSET_PROGRESS, url, size=size, total=total)
+
+        return on_chunk
+
+    def _get_previous_record(self, url, save_path):
+        manifest = self.__download_manager.manifest
+        record = manifest and manifest.previous_asset(url)
+        if record and record.path == self._get_relative_path(save_path):
+            return record
+        return None
+
+    def _get_relative_path(self, save_path):
+        return os.path.relpath(
+            save_path, self.__download_manager.path or os.curdir)
 
     def _log_attributes(self):
-        self.__logger.debug(f'{self.__class__.__name__} initialized')
-        self.__logger.debug(f'domain: {self.__domain}')
-        self.__logger.debug(f'base_url: {self.__base_url}')
-        self.__logger.debug(f'full_domain: {self.__full_domain}')
-        self.__logger.debug(f'assets_path: {self.__assets_path}')
+        self.__logger.debug('%s initialized', self.__class__.__name__)
+        self.__logger.debug('domain: %s', self.__domain)
+        self.__logger.debug('base_url: %s', self.__base_url)
+        self.__logger.debug('full_domain: %s', self.__full_domain)
+        self.__logger.debug('assets_path: %s', self.__assets_path)
@@ -0,0 +1,78 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .download_manager import (
+    DownloadManager,
+    create_http_client,
+    load_settings,
+)
+
+
+class BatchResult:
+    def __init__(self, url, path=None, error=None, elapsed_time=0.0,
+                 metrics=None):
+        self.url = url
+        self.path = path
+        self.error = error
+        self.elapsed_time = elapsed_time
+        self.metrics = metrics
+
+    @property
+    def ok(self):
+        return self.path is not None and self.error is None
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(url={self.url!r}, '
+                f'path={self.path!r}, error={self.error!r})')
+
+
+def download_page(url, create_manager):
+    """
+    Download the page at url with the DownloadManager create_manager(url)
+    returns, as a BatchResult: a failure is returned, not raised
+    """
+    start_time = time.time()
+    manager = None
+    try:
+        manager = create_manager(url)
+        result_path = manager.download()
+        return BatchResult(url, result_path,
+                           elapsed_time=time.time() - start_time,
+                           metrics=manager.metrics)
+    except Exception as e:
+        return BatchResult(url, error=e,
+                           elapsed_time=time.time() - start_time,
+                           metrics=manager and manager.metrics)
+
+
+def download_many(urls, path=None, jobs=None, workers=None, cache_dir=None,
+                  parser=None, preserve_source=None, streaming=None,
+                  incremental=None, deadline=None, adaptive=None,
+                  on_event=None):
+    """
+    Download several pages with a pool of `jobs` threads sharing one
+    pooled HTTP session. Returns a BatchResult per url, in input order,
+    with the page's DownloadMetrics; a failed page does not stop the
+    others. on_event, if any, observes the events of every page.
+    """
+    settings = load_settings()
+    jobs = max(1, jobs or settings.get('jobs', 1))
+    workers = max(1, workers or settings.get('workers', 1))
+    http_client = create_http_client(
+        settings, jobs * workers, cache_dir, adaptive)
+
+    def create_manager(url):
+        return DownloadManager(
+            url, path or '', workers=workers, cache_dir=cache_dir,
+            http_client=http_client, parser=parser,
+            preserve_source=preserve_source, streaming=streaming,
+            incremental=incremental, deadline=deadline, on_event=on_event)
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(
+                partial(download_page, create_manager=create_manager),
+                urls))
+    finally:
+        http_client.close()
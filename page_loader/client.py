@@ -0,0 +1,104 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .batch import download_page
+from .download_manager import (
+    DownloadManager,
+    create_http_client,
+    load_settings,
+)
+
+
+class PageLoader:
+    """
+    Long-lived download client, e.g. for a resident service. It is
+    configured once and keeps its pooled keep-alive session, HTTP cache,
+    per-host scheduler and concurrency limiter warm across downloads.
+    One client may be shared by several threads.
+
+    Construction does no I/O: the settings (`settings`, else
+    settings.json) and the session are set up on the first download.
+    Close the client, or use it as a context manager, to release its
+    connections.
+    """
+
+    def __init__(self, path=None, jobs=None, workers=None, cache_dir=None,
+                 parser=None, preserve_source=None, streaming=None,
+                 incremental=None, deadline=None, adaptive=None,
+                 on_event=None, settings=None):
+        self.path = path or ''
+        self.jobs = jobs
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.parser = parser
+        self.preserve_source = preserve_source
+        self.streaming = streaming
+        self.incremental = incremental
+        self.deadline = deadline
+        self.adaptive = adaptive
+        self.on_event = on_event
+        self.__settings = settings
+        self.__http_client = None
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def settings(self):
+        if self.__settings is None:
+            self.__settings = load_settings()
+        return self.__settings
+
+    def download(self, url, path=None):
+        """
+        Download the page at url and its assets into path (else the
+        client's path) and return the path of the saved page
+        """
+        return self._create_manager(url, path).download()
+
+    async def download_async(self, url, path=None):
+        return await self._create_manager(url, path).download_async()
+
+    def download_many(self, urls, path=None, jobs=None):
+        """
+        Download several pages with a pool of `jobs` threads (else the
+        client's). Returns a BatchResult per url, in input order; a
+        failed page does not stop the others.
+        """
+        jobs = max(1, jobs or self.jobs or self.settings.get('jobs', 1))
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(partial(
+                download_page,
+                create_manager=partial(self._create_manager, path=path)),
+                urls))
+
+    def close(self):
+        with self.__lock:
+            http_client, self.__http_client = self.__http_client, None
+        if http_client is not None:
+            http_client.close()
+
+    def _create_manager(self, url, path=None):
+        return DownloadManager(
+            url, path or self.path, workers=self.workers,
+            cache_dir=self.cache_dir, http_client=self._get_http_client(),
+            parser=self.parser, preserve_source=self.preserve_source,
+            streaming=self.streaming, incremental=self.incremental,
+            deadline=self.deadline, on_event=self.on_event,
+            settings=self.settings)
+
+    def _get_http_client(self):
+        with self.__lock:
+            if self.__http_client is None:
+                settings = self.settings
+                jobs = max(1, self.jobs or settings.get('jobs', 1))
+                workers = max(1, self.workers or settings.get('workers', 1))
+                # Sized for `jobs` pages fetching `workers` assets each
+                self.__http_client = create_http_client(
+                    settings, jobs * workers, self.cache_dir, self.adaptive)
+            return self.__http_client
@@ -0,0 +1,149 @@
+import threading
+import time
+
+from .exceptions.network_exceptions import DeadlineExceeded
+
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 16
+DEFAULT_LATENCY_TOLERANCE = 2.0
+DEFAULT_BACKOFF_RATIO = 0.7
+# Latencies up to this many seconds never count as an overload: below it
+# the ratio to the lowest latency is timer and scheduling noise
+DEFAULT_LATENCY_FLOOR = 0.005
+# Samples needed before the latency may cut the limit
+DEFAULT_MIN_SAMPLES = 5
+# Weight of a new sample in the smoothed latency
+LATENCY_SMOOTHING = 0.2
+
+
+class Permit:
+    """
+    A request allowed in flight by the limiter, to release once its
+    response is read
+    """
+
+    def __init__(self, limiter, wait_time=0.0):
+        self.wait_time = wait_time
+        self.__limiter = limiter
+        self.__lock = threading.Lock()
+
+    def release(self):
+        with self.__lock:
+            limiter, self.__limiter = self.__limiter, None
+        if limiter is not None:
+            limiter.release()
+
+
+class AdaptiveLimiter:
+    """
+    Limit of the requests in flight, between min_limit and max_limit,
+    adjusted by additive increase and multiplicative decrease (AIMD).
+    Every response in time raises the limit by 1/limit, so by about one
+    per round of requests, as long as the requests use half of it. An
+    overload signal cuts it by backoff_ratio, at most once per round
+    trip: a failed or throttled request, or, after min_samples requests,
+    a smoothed latency beyond both latency_floor seconds and
+    latency_tolerance times the lowest seen.
+    """
+
+    def __init__(self, min_limit=DEFAULT_MIN_LIMIT,
+                 max_limit=DEFAULT_MAX_LIMIT, initial_limit=None,
+                 latency_tolerance=DEFAULT_LATENCY_TOLERANCE,
+                 backoff_ratio=DEFAULT_BACKOFF_RATIO,
+                 latency_floor=DEFAULT_LATENCY_FLOOR,
+                 min_samples=DEFAULT_MIN_SAMPLES):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(self._clamp(initial_limit or self.min_limit))
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.latency_floor = latency_floor
+        self.min_samples = min_samples
+        self.samples = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.min_latency = None
+        self.latency = None
+        self.__decreased_at = 0.0
+        self.__condition = threading.Condition()
+
+    @classmethod
+    def from_settings(cls, settings, initial_limit=None):
+        return cls(
+            settings.get('min', DEFAULT_MIN_LIMIT),
+            settings.get('max', DEFAULT_MAX_LIMIT),
+            initial_limit,
+            settings.get('latency_tolerance', DEFAULT_LATENCY_TOLERANCE),
+            settings.get('backoff_ratio', DEFAULT_BACKOFF_RATIO),
+            settings.get('latency_floor', DEFAULT_LATENCY_FLOOR),
+            settings.get('min_samples', DEFAULT_MIN_SAMPLES))
+
+    @property
+    def concurrency(self):
+        """
+        The number of requests currently allowed in flight
+        """
+        return int(self.limit)
+
+    def acquire(self, deadline=None):
+        """
+        Wait until a request may be sent and return its Permit.
+        `deadline` is a time.monotonic() value not to wait past: then
+        DeadlineExceeded is raised.
+        """
+        start_time = time.monotonic()
+        with self.__condition:
+            while self.in_flight >= self.concurrency:
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        raise DeadlineExceeded(
+                            'Deadline exceeded waiting for the concurrency '
+                            'limit')
+                self.__condition.wait(timeout)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return Permit(self, time.monotonic() - start_time)
+
+    def release(self):
+        with self.__condition:
+            self.in_flight -= 1
+            self.__condition.notify()
+
+    def record(self, latency, overloaded=False):
+        """
+        Adjust the limit to the latency of a request (up to its response
+        headers) and whether the server failed or throttled it
+        """
+        with self.__condition:
+            self.samples += 1
+            self.min_latency = latency if self.min_latency is None \
+                else min(self.min_latency, latency)
+            self.latency = latency if self.latency is None \
+                else self.latency + LATENCY_SMOOTHING * (latency - self.latency)
+
+            if overloaded or self._latency_grown():
+                self._decrease()
+            elif self.in_flight * 2 >= self.limit:
+                # Raised only while in use: a limit the requests do not
+                # reach (held back elsewhere) tells nothing about the
+                # network
+                self.limit = self._clamp(self.limit + 1 / self.limit)
+                self.__condition.notify_all()
+
+    def _latency_grown(self):
+        return self.samples >= self.min_samples and self.latency > max(
+            self.latency_floor, self.latency_tolerance * self.min_latency)
+
+    def _decrease(self):
+        # The requests in flight when the limit was cut report the same
+        # overload: one cut per round trip
+        now = time.monotonic()
+        if now - self.__decreased_at < self.latency:
+            return
+        self.__decreased_at = now
+        self.limit = self._clamp(self.limit * self.backoff_ratio)
+
+    def _clamp(self, limit):
+        return min(self.max_limit, max(self.min_limit, limit))
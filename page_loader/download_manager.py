@@ -1,92 +1,422 @@
+import asyncio
+import contextlib
+import functools
+import hashlib
 import json
 import os
+import time
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 from . import url_utils
 from .assets_processor import AssetsProcessor
+from .concurrency import AdaptiveLimiter
+from .encoding import detect_encoding
+from .events import PAGE_FETCHED, PAGE_SAVED, EventEmitter
 from .exceptions.io_exceptions import DirectoryError, SaveError
 from .exceptions.network_exceptions import HttpError, RequestError
+from .http_cache import DEFAULT_MAX_SIZE as DEFAULT_CACHE_MAX_SIZE
+from .http_cache import HttpCache
+from .http_client import HttpClient
 from .logger import Logger
+from .manifest import Manifest, Record
+from .metrics import (
+    PAGE_FETCH,
+    PARSE,
+    SERIALIZE,
+    STREAM,
+    WRITE,
+    DownloadMetrics,
+)
+from .parsers import AUTO_PARSER, select_parser
+from .scheduler import Scheduler
+from .source_patcher import SourcePatcher
+from .streaming import StreamingPageProcessor
 
 SETTINGS_FILE = 'settings.json'
 
 
+@functools.lru_cache(maxsize=None)
+def load_settings():
+    settings_path = os.path.join(os.path.dirname(__file__), SETTINGS_FILE)
+    with open(settings_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def create_http_client(settings, workers=1, cache_dir=None, adaptive=None):
+    cache_settings = settings.get('cache', {})
+    cache_dir = cache_dir or cache_settings.get('dir')
+    cache = HttpCache(
+        cache_dir,
+        cache_settings.get('max_size', DEFAULT_CACHE_MAX_SIZE)
+    ) if cache_dir else None
+
+    # In the adaptive mode the workers only set the initial concurrency
+    concurrency_settings = settings.get('concurrency', {})
+    if adaptive is None:
+        adaptive = concurrency_settings.get('adaptive', False)
+    limiter = AdaptiveLimiter.from_settings(
+        concurrency_settings, workers) if adaptive else None
+
+    return HttpClient(settings.get('http', {}), workers, cache=cache,
+                      scheduler=Scheduler(settings.get('scheduler', {})),
+                      limiter=limiter)
+
+
 class DownloadManager:
-    def __init__(self, url, path):
+    def __init__(self, url, path, workers=None, cache_dir=None,
+                 http_client=None, page_links_handler=None, parser=None,
+                 preserve_source=None, streaming=None, incremental=None,
+                 deadline=None, adaptive=None, on_event=None, settings=None):
         self.url = url
         self.path = path or ''
         self._validate_path()
+        # Settings to use instead of settings.json
+        self._load_settings(settings)
+        self.workers = max(1, workers or self._default_workers)
+        self.cache_dir = cache_dir or self._cache_settings.get('dir')
+        self.preserve_source = self._preserve_source \
+            if preserve_source is None else preserve_source
+        self.incremental = self._incremental \
+            if incremental is None else incremental
+        # Seconds the whole download may take, its requests included
+        self.deadline = self._deadline if deadline is None else deadline
+        self.deadline_at = None
+        self.parser = select_parser(self._get_parser_name(parser))
+
+        # A client passed in is shared with other downloads and is
+        # closed by its owner
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or create_http_client(
+            self._settings, self.workers, self.cache_dir, adaptive)
+        # The limiter of an adaptive client decides how many of the
+        # workers fetch at once
+        self.limiter = self.http_client.limiter
+        if self.limiter is not None:
+            self.workers = max(self.workers, self.limiter.max_limit)
 
         self.page_content_filename = url_utils.filename_from_url(self.url)
         self.path_to_save_page_content = \
             os.path.join(self.path, self.page_content_filename)
         self.assets_dir = \
             url_utils.dirname_for_web_assets(self.page_content_filename)
+        manifest_filename = url_utils.dirname_for_web_assets(
+            self.page_content_filename, 'manifest')
+        self.manifest_path = \
+            os.path.join(self.path, f'{manifest_filename}.json')
+
+        # Called with the manager once the assets are processed, e.g. to
+        # rewrite links to other pages before the page is saved
+        self.page_links_handler = page_links_handler
+        # Links to other pages can only be rewritten on a parse tree
+        self.streaming = (self._streaming if streaming is None
+                          else streaming) and page_links_handler is None
 
         self.logger = Logger(self.page_content_filename)
         self._log_initial_attributes()
 
-        self.soup = self._fetch_page_content()
+        self.soup = None
+        self.page_source = None
+        self.page_encoding = None
+        self.encoding_method = None
+        self.link_rewrites = []
+        self.metrics = DownloadMetrics(self.url)
+        # Observers of the download progress, see events.py
+        self.events = EventEmitter(self.url, [on_event])
+        self.manifest = None
+        self.page_headers = {}
+        self.page_unchanged = False
 
-        if self.soup:
-            self._load_settings()
-            self.assets_processor = AssetsProcessor(self)
+    def rewrite_link(self, tag, attr, value):
+        """
+        Set the tag's link attribute, recording the change so that it can
+        be patched into the original page source
+        """
+        tag[attr] = value
+        self.link_rewrites.append((tag, attr, value))
 
     def download(self):
-        if not self.soup:
-            return
-
+        start_time = time.perf_counter()
+        self._start_deadline()
         try:
+            self._start_manifest()
+            if self.streaming:
+                return self._download_streaming()
+
+            if not self._fetch_page():
+                return self._finish_unchanged_page()
+
             self.assets_processor.download_assets()
+            self._process_page_links()
             self._save_processed_page()
-            return self.path_to_save_page_content
+            return self._finish_download()
         except Exception as e:
-            self.logger.debug(f'Download failed: {e}')
+            self.logger.debug('Download failed: %s', e)
             raise
+        finally:
+            self.metrics.elapsed_time = time.perf_counter() - start_time
+            self._record_concurrency()
+            self._close_http_client()
+            self.logger.close()
+
+    async def download_async(self):
+        """
+        Same as download, but the page and asset fetches are awaited on
+        the running event loop instead of blocking it.
+        """
+        start_time = time.perf_counter()
+        self._start_deadline()
+        try:
+            await asyncio.to_thread(self._start_manifest)
+            if self.streaming:
+                return await asyncio.to_thread(self._download_streaming)
+
+            if not await asyncio.to_thread(self._fetch_page):
+                return await asyncio.to_thread(self._finish_unchanged_page)
+
+            await self.assets_processor.download_assets_async()
+            await asyncio.to_thread(self._process_page_links)
+            await asyncio.to_thread(self._save_processed_page)
+            return await asyncio.to_thread(self._finish_download)
+        except Exception as e:
+            self.logger.debug('Download failed: %s', e)
+            raise
+        finally:
+            self.metrics.elapsed_time = time.perf_counter() - start_time
+            self._record_concurrency()
+            self._close_http_client()
+            self.logger.close()
+
+    def list_assets(self):
+        """
+        Fetch the page and return the URLs of the assets it would
+        download. Only the asset tags are parsed.
+        """
+        self._start_deadline()
+        try:
+            if not self._fetch_page(
+                    parse_only=SoupStrainer(list(self.asset_tags))):
+                return []
+            return self.assets_processor.list_assets()
+        finally:
+            self._close_http_client()
+            self.logger.close()
+
+    def _fetch_page(self, parse_only=None):
+        self.soup = self._fetch_page_content(parse_only)
+        if self.soup:
+            self.assets_processor = AssetsProcessor(self)
+        return self.soup
+
+    def _start_deadline(self):
+        # As a time.monotonic() value, which HttpClient checks
+        self.deadline_at = time.monotonic() + self.deadline \
+            if self.deadline else None
+
+    def _start_manifest(self):
+        # Without the incremental mode the manifest is still written, for
+        # the next run, but the previous one is ignored
+        if self.incremental:
+            self.manifest = Manifest.load(
+                self.manifest_path, self.url, self.path)
+        else:
+            self.manifest = Manifest(self.manifest_path, self.url, self.path)
+
+    def _finish_unchanged_page(self):
+        """
+        Revalidate the assets of a page the server reports as not
+        modified since the previous run, keeping the saved html
+        """
+        if not self.page_unchanged:
+            return None
+        self.logger.debug(
+            "Page '%s' not modified, revalidating its assets", self.url)
+        self.assets_processor = AssetsProcessor(self)
+        self.assets_processor.revalidate_assets(
+            self.manifest.previous.assets.values())
+        self.manifest.page = self.manifest.previous.page
+        self.manifest.page.update_validators(self.page_headers)
+        return self._finish_download()
+
+    def _finish_download(self):
+        self._save_manifest()
+        self.events.emit(
+            PAGE_SAVED, self.url, size=self.manifest.page.size,
+            path=self.path_to_save_page_content)
+        return self.path_to_save_page_content
+
+    def _save_manifest(self):
+        for record in self.manifest.stale_assets():
+            # Only files saved in the assets directory are removed
+            if not record.path.startswith(self.assets_dir + os.sep):
+                continue
+            try:
+                os.remove(os.path.join(self.path, record.path))
+                self.logger.debug('Removed stale asset: %s', record.path)
+            except OSError:
+                pass
+        try:
+            self.manifest.save()
+            self.logger.debug('Manifest saved to %s', self.manifest_path)
+        except OSError as e:
+            self.logger.debug(
+                'Failed to save manifest %s: %s', self.manifest_path, e)
+
+    def _page_conditional_headers(self):
+        # The page can be left as saved only if its links to other pages
+        # need not be followed, since that takes a parse tree
+        if not self.manifest or self.page_links_handler:
+            return None
+        previous_page = self.manifest.previous_page()
+        return previous_page and previous_page.conditional_headers()
+
+    def _process_page_links(self):
+        if self.page_links_handler:
+            self.page_links_handler(self)
 
     def _validate_path(self):
         if self.path and not os.path.exists(self.path):
             raise DirectoryError(f"Directory '{self.path}' does not exist.")
 
-    def _fetch_page_content(self):
-        self.logger.debug(f"Start download from '{self.url}'")
+    def _download_streaming(self):
+        self._check_write_permissions()
+        self.assets_processor = AssetsProcessor(self)
+
+        with self._page_response() as response:
+            if self.page_unchanged:
+                return self._finish_unchanged_page()
+            try:
+                with self.metrics.phase(STREAM):
+                    StreamingPageProcessor(self).process(
+                        response, self.path_to_save_page_content)
+            except OSError as e:
+                self._handle_save_error()
+                raise SaveError(
+                    f'Failed to save page content to '
+                    f'{self.path_to_save_page_content}. Error: {e}'
+                )
+
+        # The html is written as it streams in, so its hash is unknown
+        self.manifest.page = Record(
+            self.url, self.page_content_filename,
+            os.path.getsize(self.path_to_save_page_content))
+        self.manifest.page.update_validators(self.page_headers)
+        self.logger.debug(
+            "Page content from '%s' streamed successfully and saved to '%s'",
+            self.url, self.path_to_save_page_content)
+        return self._finish_download()
+
+    @contextlib.contextmanager
+    def _page_response(self):
+        self.logger.debug("Start download from '%s'", self.url)
+        headers = self._page_conditional_headers()
+        start_time = time.perf_counter()
         try:
-            response = requests.get(self.url)
-            if not response.ok:
-                msg = (f'Failed to retrieve content. '
-                       f'Status code: {response.status_code}')
-                self.logger.debug(msg)
-                raise HttpError(msg)
-            return BeautifulSoup(response.text, 'html.parser')
+            with self.http_client.get(
+                    self.url, headers=headers,
+                    deadline=self.deadline_at) as response:
+                self.metrics.add_time(
+                    PAGE_FETCH, time.perf_counter() - start_time)
+                self.metrics.record_response(response)
+                self.page_headers = response.headers
+                self.page_unchanged = bool(headers) and \
+                    response.status_code == 304
+                if not response.ok:
+                    msg = (f'Failed to retrieve content. '
+                           f'Status code: {response.status_code}')
+                    self.logger.debug(msg)
+                    raise HttpError(msg)
+                yield response
 
         except requests.exceptions.RequestException as e:
             msg = f"Failed to retrieve content. Error: {e}"
             self.logger.debug(msg)
             raise RequestError(msg)
 
-    def _load_settings(self):
-        settings_path = os.path.join(os.path.dirname(__file__), SETTINGS_FILE)
-        with open(settings_path, 'r', encoding='utf-8') as f:
-            settings = json.load(f)
+    def _fetch_page_content(self, parse_only=None):
+        with self._page_response() as response:
+            if self.page_unchanged:
+                return None
+            with self.metrics.phase(PAGE_FETCH):
+                content = self.http_client.read_content(response)
+            self.metrics.record_bytes(response, len(content))
+            self.events.emit(PAGE_FETCHED, self.url, size=len(content))
+            return self._parse_page_content(response, content, parse_only)
+
+    def _parse_page_content(self, response, content, parse_only=None):
+        with self.metrics.phase(PARSE):
+            self.page_encoding, self.encoding_method = detect_encoding(
+                response.headers.get('Content-Type'), content)
+            self.logger.debug(
+                'Page encoding: %s (detected from %s)',
+                self.page_encoding, self.encoding_method)
+
+            # The parser decodes the raw bytes itself, without a decoded
+            # copy of the page (unless it is needed to preserve the source)
+            if self.preserve_source:
+                self.page_source = content.decode(
+                    self.page_encoding, errors='replace')
+            return BeautifulSoup(
+                content, self.parser, from_encoding=self.page_encoding,
+                parse_only=parse_only)
+
+    def _load_settings(self, settings=None):
+        self._settings = settings = settings or load_settings()
 
         self.asset_tags = settings.get('asset_tags', [])
         self.ignore_other_hosts = settings.get('ignore_other_hosts', True)
         self._prettify = settings.get('prettify', False)
+        self._default_workers = settings.get('workers', 1)
+        self._cache_settings = settings.get('cache', {})
+        self._parser = settings.get('parser', AUTO_PARSER)
+        self._preserve_source = settings.get('preserve_source', False)
+        self._streaming = settings.get('streaming', False)
+        self._incremental = settings.get('incremental', True)
+        self._deadline = settings.get('deadline')
+
+    def _get_parser_name(self, parser):
+        parser = parser or self._parser
+        if self.preserve_source and parser == AUTO_PARSER:
+            # Only html.parser records the source positions of the tags
+            return 'html.parser'
+        return parser
+
+    def _record_concurrency(self):
+        if self.limiter is not None:
+            self.metrics.record_concurrency(
+                self.limiter.concurrency, adaptive=True)
+        else:
+            self.metrics.record_concurrency(self.workers)
+
+    def _close_http_client(self):
+        if self._owns_http_client:
+            self.http_client.close()
 
     def _save_processed_page(self):
-        html = self._process_html()
+        with self.metrics.phase(SERIALIZE):
+            html, encoding = self._process_html()
+            content = html.encode(encoding, errors='xmlcharrefreplace')
+            sha256 = hashlib.sha256(content).hexdigest()
 
         self._check_write_permissions()
 
+        self.manifest.page = Record(
+            self.url, self.page_content_filename, len(content), sha256)
+        self.manifest.page.update_validators(self.page_headers)
+        if self._is_html_saved(sha256):
+            self.logger.debug(
+                "Page content from '%s' unchanged, '%s' left as is",
+                self.url, self.path_to_save_page_content)
+            return
+
         try:
-            with open(self.path_to_save_page_content,
-                      'w', encoding='utf-8') as f:
-                f.write(html)
+            with self.metrics.phase(WRITE), \
+                    open(self.path_to_save_page_content, 'wb') as f:
+                f.write(content)
             self.logger.debug(
-                f"Page content from '{self.url}' downloaded successfully "
-                f"and saved to '{self.path_to_save_page_content}'")
+                "Page content from '%s' downloaded successfully "
+                "and saved to '%s'", self.url, self.path_to_save_page_content)
         except Exception as e:
             self._handle_save_error()
             raise SaveError(
@@ -94,6 +424,12 @@ class DownloadManager:
                 f'{self.path_to_save_page_content}. Error: {e}'
             )
 
+    def _is_html_saved(self, sha256):
+        previous = self.manifest.previous
+        return bool(previous and previous.page) and \
+            previous.page.sha256 == sha256 and \
+            previous.page.is_saved(self.path)
+
     def _check_write_permissions(self):
         directory = os.path.dirname(self.path_to_save_page_content) or \
                     os.getcwd()
@@ -107,7 +443,26 @@ class DownloadManager:
                                 f'{self.path_to_save_page_content}')
 
     def _process_html(self):
-        return self.soup.prettify() if self._prettify else str(self.soup)
+        """
+        Return the page html and the encoding to save it with
+        """
+        if self.preserve_source:
+            html = self._patch_page_source()
+            if html is not None:
+                return html, self.page_encoding
+        html = self.soup.prettify() if self._prettify else str(self.soup)
+        return html, 'utf-8'
+
+    def _patch_page_source(self):
+        patcher = SourcePatcher(self.page_source)
+        for tag, attr, value in self.link_rewrites:
+            if not patcher.patch(tag.sourceline, tag.sourcepos, attr, value,
+                                 tag.name):
+                self.logger.debug(
+                    "Failed to locate '%s' of <%s> in the page source, "
+                    "the whole page is serialized instead", attr, tag.name)
+                return None
+        return patcher.apply()
 
     def _handle_save_error(self):
         if os.path.exists(self.path_to_save_page_content):
@@ -116,11 +471,19 @@ class DownloadManager:
             self.assets_processor.remove_assets_dir()
 
     def _log_initial_attributes(self):
-        self.logger.debug(f'{self.__class__.__name__} initialized')
-        self.logger.debug(f'Log level: {self.logger.log_level}')
-        self.logger.debug(f'Log path: {self.logger.log_path}')
+        self.logger.debug('%s initialized', self.__class__.__name__)
+        self.logger.debug('Log level: %s', self.logger.log_level)
+        self.logger.debug('Log path: %s', self.logger.log_path)
         self.logger.debug(
-            f'page_content_filename: {self.page_content_filename}')
+            'page_content_filename: %s', self.page_content_filename)
         self.logger.debug(
-            f'path_to_save_page_content: {self.path_to_save_page_content}')
-        self.logger.debug(f'assets_dir: {self.assets_dir}')
+            'path_to_save_page_content: %s', self.path_to_save_page_content)
+        self.logger.debug('assets_dir: %s', self.assets_dir)
+        self.logger.debug('workers: %s', self.workers)
+        self.logger.debug('adaptive: %s', self.limiter is not None)
+        self.logger.debug('cache_dir: %s', self.cache_dir)
+        self.logger.debug('parser: %s', self.parser)
+        self.logger.debug('preserve_source: %s', self.preserve_source)
+        self.logger.debug('streaming: %s', self.streaming)
+        self.logger.debug('incremental: %s', self.incremental)
+        self.logger.debug('deadline: %s', self.deadline)
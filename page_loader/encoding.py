@@ -0,0 +1,76 @@
+import codecs
+import re
+
+SNIFF_SIZE = 4096
+DETECTOR_SAMPLE_SIZE = 64 * 1024
+DEFAULT_ENCODING = 'utf-8'
+
+# The codecs named here strip the BOM when decoding and write it back
+# when encoding, so a page keeps it when saved
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+HEADER_CHARSET_PATTERN = re.compile(
+    r'charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_PATTERN = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+BOM_METHOD = 'bom'
+HEADER_METHOD = 'header'
+META_METHOD = 'meta'
+DETECTOR_METHOD = 'detector'
+DEFAULT_METHOD = 'default'
+
+
+def detect_encoding(content_type, head):
+    """
+    Find the encoding of a page from the first bytes of its body and its
+    Content-Type header, cheapest source first: BOM, header charset,
+    <meta charset> in the first SNIFF_SIZE bytes. Statistical detection
+    over at most DETECTOR_SAMPLE_SIZE bytes runs only if none of them
+    names a known encoding and the bytes are not plain ASCII.
+
+    Return (encoding, method), method being the source it came from.
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, BOM_METHOD
+
+    match = HEADER_CHARSET_PATTERN.search(content_type or '')
+    encoding = normalize_encoding(match.group(1)) if match else None
+    if encoding:
+        return encoding, HEADER_METHOD
+
+    match = META_CHARSET_PATTERN.search(head[:SNIFF_SIZE])
+    encoding = normalize_encoding(match.group(1).decode('ascii')) \
+        if match else None
+    if encoding:
+        return encoding, META_METHOD
+
+    sample = head[:DETECTOR_SAMPLE_SIZE]
+    if not sample.isascii():
+        encoding = detect_encoding_statistically(sample)
+        if encoding:
+            return encoding, DETECTOR_METHOD
+
+    return DEFAULT_ENCODING, DEFAULT_METHOD
+
+
+def detect_encoding_statistically(sample):
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return None
+    best_match = from_bytes(sample).best()
+    return normalize_encoding(best_match.encoding) if best_match else None
+
+
+def normalize_encoding(encoding):
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
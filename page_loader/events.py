@@ -0,0 +1,67 @@
+import threading
+
+PAGE_FETCHED = 'page_fetched'
+ASSET_QUEUED = 'asset_queued'
+ASSET_STARTED = 'asset_started'
+ASSET_PROGRESS = 'asset_progress'
+ASSET_DONE = 'asset_done'
+ASSET_FAILED = 'asset_failed'
+PAGE_SAVED = 'page_saved'
+EVENT_TYPES = (PAGE_FETCHED, ASSET_QUEUED, ASSET_STARTED, ASSET_PROGRESS,
+               ASSET_DONE, ASSET_FAILED, PAGE_SAVED)
+
+
+class Event:
+    """
+    Something that happened during the download of the page at page_url.
+    `url` is the asset (or page) concerned, `size` the bytes it brought:
+    the body of a fetched page or a saved asset, the chunk of an asset
+    in progress, the file of a saved page. `total` is the size announced
+    by the server, if any.
+    """
+
+    def __init__(self, type, page_url, url=None, size=0, total=None,
+                 path=None, error=None):
+        self.type = type
+        self.page_url = page_url
+        self.url = url
+        self.size = size
+        self.total = total
+        self.path = path
+        self.error = error
+
+    def __repr__(self):
+        return f'Event({self.type!r}, {self.url!r}, size={self.size})'
+
+
+class EventEmitter:
+    """
+    Dispatch the events of a page download to its observers: callables
+    taking an Event, called from the thread the event happened in (the
+    asset workers included). Without observers, no event is created.
+    """
+
+    def __init__(self, page_url, observers=()):
+        self.page_url = page_url
+        self.__observers = [observer for observer in observers if observer]
+        self.__lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.__observers)
+
+    def subscribe(self, observer):
+        with self.__lock:
+            self.__observers = self.__observers + [observer]
+
+    def unsubscribe(self, observer):
+        with self.__lock:
+            self.__observers = [
+                item for item in self.__observers if item != observer]
+
+    def emit(self, type, url=None, **fields):
+        observers = self.__observers
+        if not observers:
+            return
+        event = Event(type, self.page_url, url, **fields)
+        for observer in observers:
+            observer(event)
@@ -1,3 +1,6 @@
+import requests
+
+
 class NetworkException(Exception):
     pass
 
@@ -8,3 +11,10 @@ class HttpError(NetworkException):
 
 class RequestError(NetworkException):
     pass
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    Raised by HttpClient past the deadline of a download. A requests
+    Timeout, so it is handled like the other request errors.
+    """
@@ -0,0 +1,6 @@
+class ParserException(Exception):
+    pass
+
+
+class ParserNotFoundError(ParserException):
+    pass
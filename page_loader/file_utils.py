@@ -0,0 +1,21 @@
+import os
+import threading
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode='w', **kwargs):
+    """
+    Open a temporary file next to path and move it over path once the
+    block completes, so that path never holds a partial file. The file
+    is left out if the block raises.
+    """
+    # Not a mkstemp file, which would be readable by its owner only
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
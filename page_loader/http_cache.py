@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+META_SUFFIX = '.json'
+BODY_SUFFIX = '.body'
+STORED_HEADERS = (
+    'Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Date')
+MAX_AGE_PATTERN = re.compile(r'max-age\s*=\s*(\d+)', re.IGNORECASE)
+
+
+class CacheEntry:
+    def __init__(self, cache, key, meta):
+        self.cache = cache
+        self.key = key
+        self.url = meta['url']
+        self.headers = CaseInsensitiveDict(meta.get('headers', {}))
+        self.stored_at = meta.get('stored_at', 0)
+        self.size = meta.get('size', 0)
+
+    @property
+    def body_path(self):
+        return self.cache.body_path(self.key)
+
+    def is_fresh(self, now=None):
+        cache_control = self.headers.get('Cache-Control', '').lower()
+        if 'no-cache' in cache_control:
+            return False
+        max_age = max_age_from_headers(self.headers)
+        if max_age is None:
+            return False
+        now = time.time() if now is None else now
+        return now - self.stored_at < max_age
+
+    def conditional_headers(self):
+        headers = {}
+        if 'ETag' in self.headers:
+            headers['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            headers['If-Modified-Since'] = self.headers['Last-Modified']
+        elif not headers:
+            headers['If-Modified-Since'] = formatdate(
+                self.stored_at, usegmt=True)
+        return headers
+
+    def to_response(self):
+        """
+        Build a streamed requests.Response reading the cached body, so
+        callers consume it exactly like a network response. Closing the
+        response closes the body file, read or not.
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        body = response.raw = open(self.body_path, 'rb')
+        close = response.close
+
+        # Response.close leaves raw open once the content is consumed
+        def close_with_body():
+            try:
+                close()
+            finally:
+                body.close()
+
+        response.close = close_with_body
+        response.from_cache = True
+        return response
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache keyed by URL. Each entry is a body file plus a
+    JSON file with its validators; the least recently used entries are
+    evicted once the bodies exceed max_size bytes.
+
+    The directory is scanned once, on construction; the total size and
+    the least recently used order are then kept up to date in memory.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.__lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Entry key -> body size, from the least to the most recently used
+        self.__sizes = OrderedDict()
+        self.total_size = 0
+        self._load()
+
+    def lookup(self, url):
+        key = self.key(url)
+        try:
+            with open(self.meta_path(key), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url or not os.path.exists(self.body_path(key)):
+            return None
+        return CacheEntry(self, key, meta)
+
+    def touch(self, entry):
+        """
+        Mark the entry as recently used
+        """
+        try:
+            os.utime(self.meta_path(entry.key))
+        except OSError:
+            pass
+        with self.__lock:
+            if entry.key in self.__sizes:
+                self.__sizes.move_to_end(entry.key)
+
+    def refresh(self, entry, headers):
+        """
+        Update a revalidated (304 Not Modified) entry with the new headers
+        """
+        entry.headers.update(
+            {name: headers[name] for name in STORED_HEADERS if name in headers})
+        entry.stored_at = time.time()
+        self._write_meta(entry.key, {
+            'url': entry.url,
+            'headers': dict(entry.headers),
+            'stored_at': entry.stored_at,
+            'size': entry.size,
+        })
+
+    def store(self, url, headers, chunks):
+        """
+        Pass the chunks through while writing them to the cache. The entry
+        is committed only when the whole body has been read.
+        """
+        key = self.key(url)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        size = 0
+        committed = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            os.replace(tmp_path, self.body_path(key))
+            self._write_meta(key, {
+                'url': url,
+                'headers': {name: headers[name]
+                            for name in STORED_HEADERS if name in headers},
+                'stored_at': time.time(),
+                'size': size,
+            })
+            committed = True
+        finally:
+            if not committed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self.__lock:
+            self.total_size += size - self.__sizes.pop(key, 0)
+            self.__sizes[key] = size
+        if self.total_size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the bodies fit in
+        max_size bytes
+        """
+        with self.__lock:
+            while self.total_size > self.max_size and self.__sizes:
+                key, size = self.__sizes.popitem(last=False)
+                self._remove(key)
+                self.total_size -= size
+
+    @staticmethod
+    def is_cacheable(response):
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        if response.status_code != 200 or 'no-store' in cache_control:
+            return False
+        return 'ETag' in response.headers or \
+            'Last-Modified' in response.headers or \
+            max_age_from_headers(response.headers) is not None
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def meta_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}{META_SUFFIX}')
+
+    def body_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}{BODY_SUFFIX}')
+
+    def _load(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(META_SUFFIX):
+                continue
+            key = name[:-len(META_SUFFIX)]
+            try:
+                last_used = os.path.getmtime(self.meta_path(key))
+                size = os.path.getsize(self.body_path(key))
+            except OSError:
+                continue
+            entries.append((last_used, key, size))
+        for _, key, size in sorted(entries):
+            self.__sizes[key] = size
+            self.total_size += size
+
+    def _write_meta(self, key, meta):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path(key))
+
+    def _remove(self, key):
+        for path in (self.meta_path(key), self.body_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def max_age_from_headers(headers):
+    match = MAX_AGE_PATTERN.search(headers.get('Cache-Control', ''))
+    return int(match.group(1)) if match else None
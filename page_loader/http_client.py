@@ -0,0 +1,346 @@
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .exceptions.network_exceptions import DeadlineExceeded
+from .scheduler import parse_retry_after
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_BACKOFF_MAX = 10
+# Transient failures only: a plain 500 is mostly a permanent error of
+# the resource, which retrying would only delay with backoff
+DEFAULT_RETRY_STATUSES = (429, 502, 503, 504)
+DEFAULT_MAX_RETRY_AFTER = 120
+RETRY_AFTER_STATUSES = (429, 503)
+
+# Time spent opening connections (DNS lookup, TCP and TLS handshakes)
+# by the request running in the current thread
+_connect_time = threading.local()
+
+
+class ConnectTimerMixin:
+    def connect(self):
+        start_time = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_time.seconds = getattr(_connect_time, 'seconds', 0.0) \
+                + time.perf_counter() - start_time
+
+
+def backoff_delay(attempt, factor, maximum):
+    """
+    Seconds to wait before retrying after the failed attempt number
+    `attempt` (from 0): exponential backoff with full jitter, so that
+    clients failing together do not retry together
+    """
+    return random.uniform(0, min(maximum, factor * 2 ** attempt))
+
+
+class TimedHTTPConnection(ConnectTimerMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(ConnectTimerMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connections record how long they take to open
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+class HttpClient:
+    """
+    Thin wrapper around a pooled keep-alive requests session shared by
+    the page and asset fetches of a download.
+    """
+
+    def __init__(self, settings=None, workers=1, cache=None, scheduler=None,
+                 limiter=None):
+        settings = settings or {}
+        self.cache = cache
+        self.scheduler = scheduler
+        # AdaptiveLimiter of the requests in flight, if any
+        self.limiter = limiter
+        if limiter is not None:
+            workers = max(workers, limiter.max_limit)
+        self.pool_connections = settings.get(
+            'pool_connections', DEFAULT_POOL_CONNECTIONS)
+        # A pool smaller than the number of workers would make urllib3
+        # discard the extra connections instead of keeping them alive
+        self.pool_maxsize = max(
+            settings.get('pool_maxsize', DEFAULT_POOL_MAXSIZE), workers)
+        self.pool_block = settings.get('pool_block', False)
+        self.headers = settings.get('headers', {})
+        self.chunk_size = settings.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        self.connect_timeout = settings.get(
+            'connect_timeout', DEFAULT_CONNECT_TIMEOUT)
+        self.read_timeout = settings.get('read_timeout', DEFAULT_READ_TIMEOUT)
+        self.retries = max(0, settings.get('retries', DEFAULT_RETRIES))
+        self.backoff_factor = settings.get(
+            'backoff_factor', DEFAULT_BACKOFF_FACTOR)
+        self.backoff_max = settings.get('backoff_max', DEFAULT_BACKOFF_MAX)
+        self.retry_statuses = frozenset(
+            settings.get('retry_statuses', DEFAULT_RETRY_STATUSES))
+        # A longer Retry-After is not waited for: the request fails
+        self.max_retry_after = settings.get(
+            'max_retry_after', DEFAULT_MAX_RETRY_AFTER)
+        self.session = self._create_session()
+
+    def get(self, url, deadline=None, **kwargs):
+        """
+        Send a GET request without reading the body: it is consumed
+        chunk by chunk via iter_content, read_content or save_content.
+        With a cache, a fresh cached body is returned without a request
+        and a stale one is revalidated with a conditional request.
+
+        With a scheduler, every request waits for its turn to the host,
+        and with a limiter for the concurrency limit, which it adjusts.
+        Connection errors, timeouts and the retry statuses are retried
+        with backoff, or after the Retry-After delay the server asked
+        for. `deadline` is a time.monotonic() value no request or body
+        read may outlast: DeadlineExceeded is raised past it.
+
+        The response tells whether a request was sent (sent_request),
+        how many were (attempts), whether the body comes from the cache
+        (from_cache), how long opening connections took (connect_time)
+        and how long the requests were held back (throttle_time).
+        """
+        entry = self.cache.lookup(url) if self.cache else None
+
+        if entry and entry.is_fresh():
+            self.cache.touch(entry)
+            response = entry.to_response()
+            response.sent_request = False
+            response.attempts = 0
+            response.connect_time = 0.0
+            response.throttle_time = 0.0
+            return response
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry:
+            headers.update(entry.conditional_headers())
+
+        _connect_time.seconds = 0.0
+        response, attempts, throttle_time = self._send(
+            url, headers, deadline, **kwargs)
+        connect_time = _connect_time.seconds
+
+        if entry and response.status_code == 304:
+            response.close()
+            self.cache.refresh(entry, response.headers)
+            response = entry.to_response()
+        else:
+            response.from_cache = False
+            cacheable = self.cache is not None and \
+                self.cache.is_cacheable(response)
+            response.cache_url = url if cacheable else None
+
+        response.sent_request = True
+        response.attempts = attempts
+        response.connect_time = connect_time
+        response.throttle_time = throttle_time
+        response.deadline = deadline
+        return response
+
+    def _send(self, url, headers, deadline, **kwargs):
+        """
+        Return the response of the last attempt, the number of attempts
+        and the time spent waiting for the scheduler and the limiter
+        """
+        attempt = 0
+        throttle_time = 0.0
+        while True:
+            slots = self._acquire_slots(url, deadline)
+            throttle_time += sum(slot.wait_time for slot in slots)
+            retry_after = None
+            start_time = time.monotonic()
+            try:
+                response = self.session.get(
+                    url, stream=True, headers=headers,
+                    timeout=self._get_timeout(url, deadline), **kwargs)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                self._release_slots(slots)
+                if not isinstance(e, DeadlineExceeded):
+                    self._record_latency(start_time, overloaded=True)
+                if isinstance(e, DeadlineExceeded) or \
+                        attempt >= self.retries:
+                    raise
+                error = e
+            else:
+                self._record_latency(
+                    start_time,
+                    overloaded=response.status_code in self.retry_statuses)
+                retry_after = self._get_retry_after(url, response)
+                if response.status_code not in self.retry_statuses or \
+                        attempt >= self.retries or \
+                        (retry_after or 0) > self.max_retry_after:
+                    self._hold_slots(response, slots)
+                    return response, attempt + 1, throttle_time
+                response.close()
+                self._release_slots(slots)
+                error = f'status code {response.status_code}'
+
+            attempt += 1
+            delay = retry_after if retry_after is not None else backoff_delay(
+                attempt - 1, self.backoff_factor, self.backoff_max)
+            if deadline is not None and \
+                    time.monotonic() + delay >= deadline:
+                raise DeadlineExceeded(
+                    f'Deadline exceeded for {url} after {attempt} '
+                    f'attempts, last error: {error}')
+            time.sleep(delay)
+
+    def _acquire_slots(self, url, deadline):
+        """
+        Wait for the turn of a request to url with the scheduler, then
+        with the limiter, and return what to release once it is done
+        """
+        slots = [self.scheduler.acquire(url, deadline)] \
+            if self.scheduler else []
+        if self.limiter is not None:
+            try:
+                slots.append(self.limiter.acquire(deadline))
+            except Exception:
+                self._release_slots(slots)
+                raise
+        return slots
+
+    @staticmethod
+    def _release_slots(slots):
+        for slot in slots:
+            slot.release()
+
+    def _record_latency(self, start_time, overloaded):
+        if self.limiter is not None:
+            self.limiter.record(time.monotonic() - start_time, overloaded)
+
+    def _get_retry_after(self, url, response):
+        """
+        The Retry-After delay of a throttling response, also applied to
+        the other requests to the host
+        """
+        if response.status_code not in RETRY_AFTER_STATUSES:
+            return None
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is not None and self.scheduler:
+            self.scheduler.defer(url, min(retry_after, self.max_retry_after))
+        return retry_after
+
+    @classmethod
+    def _hold_slots(cls, response, slots):
+        # The request is in flight until the body is read or the response
+        # is closed, whichever comes first
+        response.slots = slots
+        close = response.close
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                cls._release_slots(slots)
+
+        response.close = close_and_release
+
+    def _get_timeout(self, url, deadline):
+        if deadline is None:
+            return self.connect_timeout, self.read_timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f'Deadline exceeded for {url}')
+        return (min(self.connect_timeout, remaining),
+                min(self.read_timeout, remaining))
+
+    def iter_content(self, response):
+        chunks = self._iter_body(response)
+        cache_url = getattr(response, 'cache_url', None)
+        if cache_url:
+            chunks = self.cache.store(cache_url, response.headers, chunks)
+        yield from chunks
+
+    def _iter_body(self, response):
+        deadline = getattr(response, 'deadline', None)
+        try:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                # The read timeout bounds each read, the deadline the body
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise DeadlineExceeded(
+                        f'Deadline exceeded while reading {response.url}')
+                if chunk:
+                    yield chunk
+        finally:
+            # A cached body is a file of its own, closed once read even
+            # if the caller never closes the response
+            if getattr(response, 'from_cache', False):
+                response.close()
+        self._release_slots(getattr(response, 'slots', ()))
+
+    def read_content(self, response):
+        return b''.join(self.iter_content(response))
+
+    def save_content(self, response, path, on_chunk=None, digest=None):
+        """
+        Stream the response body to the file at path and return the number
+        of bytes written. A partially written file is removed on failure.
+        on_chunk, if any, is called with the size of every chunk written,
+        and digest, a hashlib object, is updated with the chunks.
+        """
+        size = 0
+        try:
+            with open(path, 'wb') as f:
+                for chunk in self.iter_content(response):
+                    f.write(chunk)
+                    size += len(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+                    if on_chunk is not None:
+                        on_chunk(len(chunk))
+        except Exception:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return size
+
+    def close(self):
+        self.session.close()
+
+    def _create_session(self):
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = TimedHTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
@@ -1,5 +1,10 @@
+import atexit
+import functools
 import logging
+import logging.handlers
 import os
+import queue
+import threading
 from datetime import datetime
 
 from dotenv import load_dotenv
@@ -7,39 +12,132 @@ from dotenv import load_dotenv
 LOGS_DIR = 'logs'
 LOG_FILE_TEMPLATE = 'download_{formatted_page_content_filename}_{date_time}.log'
 TIME_FORMAT = '%Y%m%d_%H%M%S'
+LOGGER_NAME = __name__
 
+_setup_lock = threading.Lock()
 
-class Logger:
-    def __init__(self, page_content_filename):
-        self.log_level = self.__get_level()
-        self.log_path = self.__get_log_file_path(page_content_filename)
-        self.__logger = logging.getLogger(__name__)
-        self.__configure_logger()
 
-    def debug(self, message):
-        self.__logger.debug(message)
+class PageFileHandler(logging.Handler):
+    """
+    Handler writing each record to the log file of its download, named
+    by the record's log_path. A file is opened on its first record and
+    closed by a record with close_log_file set, once its download ends.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.__streams = {}
 
-    def info(self, message):
-        self.__logger.info(message)
+    def emit(self, record):
+        log_path = getattr(record, 'log_path', None)
+        if log_path is None:
+            return
+        if getattr(record, 'close_log_file', False):
+            stream = self.__streams.pop(log_path, None)
+            if stream is not None:
+                stream.close()
+            return
+        try:
+            stream = self.__streams.get(log_path)
+            if stream is None:
+                os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+                stream = self.__streams[log_path] = open(
+                    log_path, 'a', encoding='utf-8')
+            stream.write(self.format(record) + '\n')
+            stream.flush()
+        except Exception:
+            self.handleError(record)
 
-    def error(self, message):
-        self.__logger.error(message)
+    def close(self):
+        for stream in self.__streams.values():
+            stream.close()
+        self.__streams.clear()
+        super().close()
 
-    def __configure_logger(self):
-        self.__logger.setLevel(self.log_level)
 
-        if self.log_level == logging.DEBUG:
-            self.__formatter = logging.Formatter(
+class LoggingSetup:
+    """
+    The handlers of the package logger, added once per process. Log
+    files are only written in debug mode, by a background thread the
+    records are handed to through a queue.
+    """
+
+    def __init__(self):
+        load_dotenv()
+        env = os.environ.get('ENV', 'production')
+        self.level = logging.DEBUG if env != 'production' else logging.INFO
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.setLevel(self.level)
+
+        if self.level == logging.DEBUG:
+            formatter = logging.Formatter(
                 fmt='[%(asctime)s %(levelname)s] %(message)s',
                 datefmt='%Y-%m-%d %H:%M:%S'
             )
         else:
-            self.__formatter = logging.Formatter(fmt='%(message)s')
+            formatter = logging.Formatter(fmt='%(message)s')
+
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        self.logger.addHandler(console_handler)
+
+        self.listener = None
+        if self.level < logging.INFO:
+            file_handler = PageFileHandler()
+            file_handler.setFormatter(formatter)
+            log_queue = queue.SimpleQueue()
+            self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            self.listener = logging.handlers.QueueListener(
+                log_queue, file_handler)
+            self.listener.start()
+            # Flushes the queued records before the process exits
+            atexit.register(self.listener.stop)
+
+    def close_log_file(self, log_path):
+        if self.listener is not None:
+            self.listener.queue.put_nowait(logging.makeLogRecord(
+                {'log_path': log_path, 'close_log_file': True}))
 
-        self.__add_console_handler()
 
-        if self.log_level < logging.INFO:
-            self.__add_file_handler()
+@functools.lru_cache(maxsize=None)
+def _create_logging_setup():
+    return LoggingSetup()
+
+
+def get_logging_setup():
+    with _setup_lock:
+        return _create_logging_setup()
+
+
+class Logger:
+    """
+    Logger of a download, writing to the package logger set up once per
+    process. Messages are %-format strings formatted only if logged:
+    logger.debug('Asset URL: %s', url).
+    """
+
+    def __init__(self, page_content_filename):
+        self.__setup = get_logging_setup()
+        self.log_level = self.__setup.level
+        self.log_path = self.__get_log_file_path(page_content_filename)
+        self.__logger = self.__setup.logger
+        # Routes the records to the download's log file
+        self.__extra = {'log_path': self.log_path}
+
+    def debug(self, message, *args):
+        self.__logger.debug(message, *args, extra=self.__extra)
+
+    def info(self, message, *args):
+        self.__logger.info(message, *args, extra=self.__extra)
+
+    def error(self, message, *args):
+        self.__logger.error(message, *args, extra=self.__extra)
+
+    def close(self):
+        """
+        Close the download's log file once its queued records are written
+        """
+        self.__setup.close_log_file(self.log_path)
 
     @staticmethod
     def __get_log_file_path(filename):
@@ -50,20 +148,3 @@ class Logger:
             formatted_page_content_filename=formatted_page_content_filename,
             date_time=date_time)
         return os.path.join(log_file_dir, log_file_name)
-
-    @staticmethod
-    def __get_level():
-        load_dotenv()
-        env = os.environ.get('ENV', 'production')
-        log_level = logging.DEBUG if env != 'production' else logging.INFO
-        return log_level
-
-    def __add_file_handler(self):
-        file_handler = logging.FileHandler(self.log_path)
-        file_handler.setFormatter(self.__formatter)
-        self.__logger.addHandler(file_handler)
-
-    def __add_console_handler(self):
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(self.__formatter)
-        self.__logger.addHandler(console_handler)
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .file_utils import atomic_write
+from .http_cache import max_age_from_headers
+
+MANIFEST_VERSION = 1
+
+
+class Record:
+    """
+    What was saved from a url: the local path (relative to the output
+    directory), size, sha256 (unknown for a streamed html) and the
+    validators of the response
+    """
+
+    def __init__(self, url, path, size=0, sha256=None, etag=None,
+                 last_modified=None, expires=None):
+        self.url = url
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    @classmethod
+    def from_response(cls, url, path, response, size=0, sha256=None):
+        record = cls(url, path, size, sha256)
+        record.update_validators(response.headers)
+        return record
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['url'], data['path'], data.get('size', 0),
+                   data.get('sha256'), data.get('etag'),
+                   data.get('last_modified'), data.get('expires'))
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'path': self.path,
+            'size': self.size,
+            'sha256': self.sha256,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'expires': self.expires,
+        }
+
+    def update_validators(self, headers):
+        self.etag = headers.get('ETag', self.etag)
+        self.last_modified = headers.get('Last-Modified', self.last_modified)
+        max_age = max_age_from_headers(headers)
+        self.expires = time.time() + max_age if max_age is not None \
+            else None
+
+    def is_fresh(self, now=None):
+        now = time.time() if now is None else now
+        return self.expires is not None and now < self.expires
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def is_saved(self, output_dir):
+        """
+        Whether the local copy is still there, as it was saved: same
+        size and, when recorded, same sha256
+        """
+        path = os.path.join(output_dir, self.path)
+        try:
+            if os.path.getsize(path) != self.size:
+                return False
+            return self.sha256 is None or file_sha256(path) == self.sha256
+        except OSError:
+            return False
+
+
+class Manifest:
+    """
+    Record of a saved page, kept next to it: the html written for the
+    page and its assets. The records of the previous run are kept apart
+    from the ones of the current run, which are saved at the end.
+    """
+
+    def __init__(self, path, url, output_dir):
+        self.path = path
+        self.url = url
+        self.output_dir = output_dir
+        # The page's record is the one of the html written for it
+        self.page = None
+        self.assets = {}
+        self.previous = None
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, url, output_dir):
+        """
+        Start a manifest for a new run at path, with the previous run's
+        records if its manifest is there and is for the same url
+        """
+        manifest = cls(path, url, output_dir)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION or \
+                    data.get('url') != url:
+                return manifest
+            previous = cls(path, url, output_dir)
+            if data.get('page'):
+                previous.page = Record.from_dict(data['page'])
+            previous.assets = {
+                record['url']: Record.from_dict(record)
+                for record in data.get('assets', [])
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            return manifest
+        manifest.previous = previous
+        return manifest
+
+    def previous_asset(self, url):
+        """
+        The previous record of the asset at url, if its file is unchanged
+        """
+        record = self.previous and self.previous.assets.get(url)
+        if record and record.is_saved(self.output_dir):
+            return record
+        return None
+
+    def previous_page(self):
+        """
+        The previous record of the page, if the saved html and the
+        assets are all unchanged
+        """
+        previous = self.previous
+        if not previous or not previous.page or \
+                not previous.page.is_saved(self.output_dir):
+            return None
+        if not all(record.is_saved(self.output_dir)
+                   for record in previous.assets.values()):
+            return None
+        return previous.page
+
+    def add_asset(self, record):
+        with self.__lock:
+            self.assets[record.url] = record
+
+    def stale_assets(self):
+        """
+        The previous records of the files the current run no longer uses.
+        Staleness goes by path, not url: urls differing only in their
+        query string (e.g. cache busting) are saved to the same file.
+        """
+        if not self.previous:
+            return []
+        with self.__lock:
+            paths_in_use = {record.path for record in self.assets.values()}
+        if self.page:
+            paths_in_use.add(self.page.path)
+        stale = {}
+        for record in self.previous.assets.values():
+            if record.path not in paths_in_use:
+                stale.setdefault(record.path, record)
+        return list(stale.values())
+
+    def save(self):
+        data = {
+            'version': MANIFEST_VERSION,
+            'url': self.url,
+            'page': self.page.to_dict() if self.page else None,
+            'assets': [record.to_dict() for record in self.assets.values()],
+        }
+        with atomic_write(self.path, encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+
+def file_sha256(path, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,184 @@
+import contextlib
+import threading
+import time
+
+THROTTLE = 'throttle'
+CONNECT = 'connect'
+PAGE_FETCH = 'page_fetch'
+PARSE = 'parse'
+ASSET_DISCOVERY = 'asset_discovery'
+ASSET_DOWNLOAD = 'asset_download'
+STREAM = 'stream'
+SERIALIZE = 'serialize'
+WRITE = 'write'
+PHASES = (THROTTLE, CONNECT, PAGE_FETCH, PARSE, ASSET_DISCOVERY,
+          ASSET_DOWNLOAD, STREAM, SERIALIZE, WRITE)
+
+# Called with the name of every phase entered, returning a context
+# manager to run it in, if set: see profiling.MemoryTracer
+_phase_tracer = None
+
+
+def set_phase_tracer(tracer):
+    global _phase_tracer
+    _phase_tracer = tracer
+
+
+class AssetMetrics:
+    def __init__(self, url, elapsed_time, size=0, status_code=None,
+                 from_cache=False, unchanged=False, attempts=0, error=None):
+        self.url = url
+        self.elapsed_time = elapsed_time
+        self.size = size
+        self.status_code = status_code
+        self.from_cache = from_cache
+        # Same as the copy saved by the previous run
+        self.unchanged = unchanged
+        self.attempts = attempts
+        # Why the asset could not be saved, None if it was
+        self.error = error
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'elapsed_time': self.elapsed_time,
+            'size': self.size,
+            'status_code': self.status_code,
+            'from_cache': self.from_cache,
+            'unchanged': self.unchanged,
+            'attempts': self.attempts,
+            'error': self.error,
+        }
+
+
+class DownloadMetrics:
+    """
+    Wall-clock durations of the phases of a page download, plus its
+    transfer counters. Phases may overlap: waiting for the scheduler and
+    connecting happen during the fetches, and in streaming mode the
+    assets download while the page streams. Safe to update from the
+    asset worker threads.
+    """
+
+    def __init__(self, url=None):
+        self.url = url
+        self.elapsed_time = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.assets = []
+        # Asset references to a url already downloaded for the page
+        self.duplicates_skipped = 0
+        self.requests = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.bytes_downloaded = 0
+        self.bytes_from_cache = 0
+        # Requests allowed in flight at the end of the download, as set
+        # by the adaptive limiter or by the number of workers
+        self.concurrency = None
+        self.adaptive_concurrency = False
+        self.__lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        tracer = _phase_tracer
+        # The tracer's own work is left out of the phase time
+        with tracer(name) if tracer else contextlib.nullcontext():
+            start_time = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.add_time(name, time.perf_counter() - start_time)
+
+    def add_time(self, name, seconds):
+        with self.__lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record_response(self, response):
+        """
+        Count the request behind a response returned by HttpClient.get
+        """
+        with self.__lock:
+            if getattr(response, 'from_cache', False):
+                self.cache_hits += 1
+            if getattr(response, 'sent_request', True):
+                attempts = getattr(response, 'attempts', 1)
+                self.requests += attempts
+                self.retries += attempts - 1
+            self.phases[THROTTLE] += getattr(response, 'throttle_time', 0.0)
+            self.phases[CONNECT] += getattr(response, 'connect_time', 0.0)
+
+    def record_bytes(self, response, size):
+        with self.__lock:
+            if getattr(response, 'from_cache', False):
+                self.bytes_from_cache += size
+            else:
+                self.bytes_downloaded += size
+
+    def record_concurrency(self, concurrency, adaptive=False):
+        self.concurrency = concurrency
+        self.adaptive_concurrency = adaptive
+
+    def record_asset(self, asset_metrics):
+        with self.__lock:
+            self.assets.append(asset_metrics)
+
+    @property
+    def failed_assets(self):
+        return [asset for asset in self.assets if asset.failed]
+
+    @property
+    def throughput(self):
+        """
+        Bytes received from the network per second of the download
+        """
+        if not self.elapsed_time:
+            return 0.0
+        return self.bytes_downloaded / self.elapsed_time
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'elapsed_time': self.elapsed_time,
+            'phases': dict(self.phases),
+            'requests': self.requests,
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'bytes_downloaded': self.bytes_downloaded,
+            'bytes_from_cache': self.bytes_from_cache,
+            'throughput': self.throughput,
+            'concurrency': self.concurrency,
+            'adaptive_concurrency': self.adaptive_concurrency,
+            'assets': [asset.to_dict() for asset in self.assets],
+            'duplicates_skipped': self.duplicates_skipped,
+        }
+
+    def format(self):
+        lines = [f'Stats for {self.url}:']
+        lines.extend(f'  {name:<16}{seconds:10.3f} s'
+                     for name, seconds in self.phases.items() if seconds)
+        lines.append(f"  {'total':<16}{self.elapsed_time:10.3f} s")
+        lines.append(f'  requests: {self.requests}, '
+                     f'retries: {self.retries}, '
+                     f'cache hits: {self.cache_hits}')
+        lines.append(f'  downloaded: {self.bytes_downloaded} bytes '
+                     f'({self.throughput / 1024:.1f} KiB/s), '
+                     f'from cache: {self.bytes_from_cache} bytes')
+        if self.concurrency is not None:
+            mode = 'adaptive' if self.adaptive_concurrency else 'fixed'
+            lines.append(f'  concurrency: {self.concurrency} ({mode})')
+        if self.assets:
+            unchanged = sum(asset.unchanged for asset in self.assets)
+            failed_assets = self.failed_assets
+            slowest = max(self.assets, key=lambda asset: asset.elapsed_time)
+            lines.append(f'  assets: {len(self.assets)} '
+                         f'({unchanged} unchanged, '
+                         f'{self.duplicates_skipped} duplicates skipped, '
+                         f'{len(failed_assets)} failed), slowest: '
+                         f'{slowest.url} ({slowest.elapsed_time:.3f} s)')
+            lines.extend(f'  failed: {asset.url}: {asset.error}'
+                         for asset in failed_assets)
+        return '\n'.join(lines)
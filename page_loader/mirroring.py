@@ -0,0 +1,179 @@
+import html
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urldefrag
+
+from . import url_utils
+from .batch import download_page
+from .download_manager import (
+    DownloadManager,
+    create_http_client,
+    load_settings,
+)
+from .file_utils import atomic_write
+
+PAGE_EXTENSIONS = ('', 'html', 'htm')
+PAGE_SCHEMES = ('http', 'https')
+
+
+class Mirror:
+    """
+    Mirror the pages reachable from the seed urls through same-host
+    <a href> links, breadth first, up to `depth` links away from a seed
+    and `max_pages` pages in total. Links to mirrored pages are
+    rewritten to their local copies; those to pages that then fail to
+    download are set back to their absolute urls.
+    """
+
+    def __init__(self, urls, path=None, depth=1, max_pages=None, jobs=None,
+                 workers=None, cache_dir=None, parser=None,
+                 preserve_source=None, incremental=None, deadline=None,
+                 adaptive=None, on_event=None):
+        settings = load_settings()
+        mirror_settings = settings.get('mirror', {})
+        self.path = path or ''
+        self.depth = max(0, depth)
+        self.max_pages = max(
+            1, max_pages or mirror_settings.get('max_pages', 100))
+        self.jobs = max(1, jobs or settings.get('jobs', 1))
+        self.workers = max(1, workers or settings.get('workers', 1))
+        self.cache_dir = cache_dir
+        self.parser = parser
+        self.preserve_source = preserve_source
+        self.incremental = incremental
+        self.deadline = deadline
+        self.adaptive = adaptive
+        self.on_event = on_event
+        self.hosts = {url_utils.parse_url(url).host for url in urls}
+
+        self.__lock = threading.Lock()
+        self.__seen = set()
+        self.__frontier = []
+        # Page url -> (target key, local link, target url) of every link
+        # rewritten in it
+        self.__local_links = {}
+        for url in urls:
+            self._admit(url_utils.resolve_url(url, ''))
+
+    def run(self):
+        http_client = create_http_client(
+            load_settings(), self.jobs * self.workers, self.cache_dir,
+            self.adaptive)
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                for page_depth in range(self.depth + 1):
+                    level, self.__frontier = self.__frontier, []
+                    if not level:
+                        break
+                    results.extend(executor.map(partial(
+                        download_page, create_manager=partial(
+                            self._create_manager, page_depth=page_depth,
+                            http_client=http_client)),
+                        level))
+        finally:
+            http_client.close()
+        self._restore_failed_links(results)
+        return results
+
+    def _create_manager(self, url, page_depth, http_client):
+        return DownloadManager(
+            url, self.path, workers=self.workers,
+            cache_dir=self.cache_dir, http_client=http_client,
+            parser=self.parser, preserve_source=self.preserve_source,
+            incremental=self.incremental, deadline=self.deadline,
+            on_event=self.on_event,
+            page_links_handler=partial(
+                self._rewrite_page_links, page_depth=page_depth))
+
+    def _rewrite_page_links(self, manager, page_depth):
+        can_follow = page_depth < self.depth
+        for anchor in manager.soup.find_all('a', href=True):
+            href = anchor['href']
+            link_url = url_utils.resolve_url(manager.url, href)
+            if not self._is_page_link(link_url):
+                continue
+            if not self._admit(link_url, can_follow):
+                continue
+            fragment = urldefrag(href).fragment
+            # Named after the url the page is downloaded from
+            page_url = url_utils.normalize_url(link_url)
+            local_link = url_utils.filename_from_url(page_url)
+            manager.rewrite_link(
+                anchor, 'href',
+                f'{local_link}#{fragment}' if fragment else local_link)
+            with self.__lock:
+                self.__local_links.setdefault(manager.url, []).append(
+                    (page_url, local_link, urldefrag(link_url).url))
+            manager.logger.debug(
+                "Page link '%s' -> '%s'", href, anchor['href'])
+
+    def _restore_failed_links(self, results):
+        """
+        Point the local links to the pages that failed to download back
+        to their urls, in the saved pages linking to them
+        """
+        failed = {url_utils.normalize_url(result.url)
+                  for result in results if not result.ok}
+        if not failed:
+            return
+        for result in results:
+            links = [(local_link, url) for key, local_link, url
+                     in self.__local_links.get(result.url, ())
+                     if key in failed]
+            if result.ok and links:
+                self._restore_links(result.path, links)
+
+    @staticmethod
+    def _restore_links(path, links):
+        with open(path, 'rb') as f:
+            content = f.read()
+        for local_link, url in links:
+            # Any fragment is kept. The url is escaped to ASCII, which
+            # reads the same in the encoding the page was saved with
+            pattern = re.compile(
+                rb'href="' + re.escape(local_link.encode('utf-8')) +
+                rb'(#[^"]*)?"')
+            replacement = html.escape(url, quote=True).encode(
+                'ascii', 'xmlcharrefreplace')
+            content = pattern.sub(
+                lambda match: b'href="' + replacement +
+                (match.group(1) or b'') + b'"', content)
+        with atomic_write(path, 'wb') as f:
+            f.write(content)
+
+    def _is_page_link(self, url):
+        parsed_url = url_utils.parse_url(url)
+        return parsed_url.scheme in PAGE_SCHEMES and \
+            parsed_url.host in self.hosts and \
+            parsed_url.extension.lower() in PAGE_EXTENSIONS
+
+    def _admit(self, url, can_follow=True):
+        """
+        Return True if the page at url is (or is now) part of the mirror,
+        adding its normalized url to the frontier the first time it is
+        seen, so that every form of the url names the same local file
+        """
+        key = url_utils.normalize_url(url)
+        with self.__lock:
+            if key in self.__seen:
+                return True
+            if not can_follow or len(self.__seen) >= self.max_pages:
+                return False
+            self.__seen.add(key)
+            self.__frontier.append(key)
+            return True
+
+
+def mirror(urls, path=None, depth=1, max_pages=None, jobs=None, workers=None,
+           cache_dir=None, parser=None, preserve_source=None,
+           incremental=None, deadline=None, adaptive=None, on_event=None):
+    if isinstance(urls, str):
+        urls = [urls]
+    return Mirror(urls, path, depth=depth, max_pages=max_pages, jobs=jobs,
+                  workers=workers, cache_dir=cache_dir, parser=parser,
+                  preserve_source=preserve_source,
+                  incremental=incremental, deadline=deadline,
+                  adaptive=adaptive, on_event=on_event).run()
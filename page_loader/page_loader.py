@@ -1,6 +1,45 @@
 from .download_manager import DownloadManager
 
 
-def download(url, path=None):
-    manager = DownloadManager(url, path or '')
+def download(url, path=None, workers=None, cache_dir=None, parser=None,
+             preserve_source=None, streaming=None, incremental=None,
+             deadline=None, adaptive=None, on_event=None):
+    """
+    Download the page at url and its assets into path and return the
+    path of the saved page. on_event, if any, is called with every
+    Event of the download (see events.py).
+    """
+    manager = DownloadManager(
+        url, path or '', workers=workers, cache_dir=cache_dir, parser=parser,
+        preserve_source=preserve_source, streaming=streaming,
+        incremental=incremental, deadline=deadline, adaptive=adaptive,
+        on_event=on_event)
     return manager.download()
+
+
+async def download_async(url, path=None, workers=None, cache_dir=None,
+                         parser=None, preserve_source=None, streaming=None,
+                         incremental=None, deadline=None, adaptive=None,
+                         on_event=None):
+    manager = DownloadManager(
+        url, path or '', workers=workers, cache_dir=cache_dir, parser=parser,
+        preserve_source=preserve_source, streaming=streaming,
+        incremental=incremental, deadline=deadline, adaptive=adaptive,
+        on_event=on_event)
+    return await manager.download_async()
+
+
+def download_with_metrics(url, path=None, workers=None, cache_dir=None,
+                          parser=None, preserve_source=None, streaming=None,
+                          incremental=None, deadline=None, adaptive=None,
+                          on_event=None):
+    """
+    Same as download, but return (path, DownloadMetrics) to show where
+    the time of the download went
+    """
+    manager = DownloadManager(
+        url, path or '', workers=workers, cache_dir=cache_dir, parser=parser,
+        preserve_source=preserve_source, streaming=streaming,
+        incremental=incremental, deadline=deadline, adaptive=adaptive,
+        on_event=on_event)
+    return manager.download(), manager.metrics
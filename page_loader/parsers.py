@@ -0,0 +1,44 @@
+import functools
+import importlib.util
+
+from .exceptions.parser_exceptions import ParserNotFoundError
+
+AUTO_PARSER = 'auto'
+# bs4 tree builder name -> module it needs
+PARSER_MODULES = {
+    'lxml': 'lxml',
+    'html5lib': 'html5lib',
+    'html.parser': 'html.parser',
+}
+PARSERS = tuple(PARSER_MODULES)
+# Fastest first; html5lib is the slowest backend, so it is never chosen
+# automatically
+AUTO_PARSERS = ('lxml', 'html.parser')
+
+
+@functools.lru_cache(maxsize=None)
+def is_available(parser):
+    module = PARSER_MODULES.get(parser)
+    return module is not None and \
+        importlib.util.find_spec(module.split('.')[0]) is not None
+
+
+def available_parsers():
+    return [parser for parser in PARSERS if is_available(parser)]
+
+
+def select_parser(parser=AUTO_PARSER):
+    """
+    Return the BeautifulSoup parser to use: the requested one or, for
+    'auto', the fastest one installed
+    """
+    if parser in (None, AUTO_PARSER):
+        return next(name for name in AUTO_PARSERS if is_available(name))
+    if parser not in PARSER_MODULES:
+        raise ParserNotFoundError(
+            f"Unknown HTML parser '{parser}'. "
+            f"Choose one of: {', '.join((AUTO_PARSER, ) + PARSERS)}")
+    if not is_available(parser):
+        raise ParserNotFoundError(
+            f"HTML parser '{parser}' is not installed.")
+    return parser
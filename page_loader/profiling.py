@@ -0,0 +1,184 @@
+import contextlib
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from datetime import datetime
+
+from . import metrics
+from .progress import format_size
+
+PROFILE_FILE_TEMPLATE = 'page-loader_{date_time}.prof'
+MEMORY_REPORT_TEMPLATE = 'page-loader_{date_time}_memory.txt'
+TIME_FORMAT = '%Y%m%d_%H%M%S'
+TOP_ALLOCATIONS = 10
+# Allocations by the tracing itself and by imports are left out
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class CpuProfiler:
+    """
+    cProfile of every thread of the run, the asset workers included
+    """
+
+    def __init__(self):
+        self.__profiler = cProfile.Profile()
+        self.__thread_profilers = []
+
+    def start(self):
+        self.__profiler.enable()
+        # From Python 3.12 on, cProfile sees every thread (through
+        # sys.monitoring) and only one profiler may be active at once;
+        # before, each thread needs its own
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._start_thread_profiler)
+
+    def stop(self):
+        if sys.version_info < (3, 12):
+            threading.setprofile(None)
+        self.__profiler.disable()
+
+    def dump(self, path):
+        stats = pstats.Stats(self.__profiler)
+        for profiler in self.__thread_profilers:
+            stats.add(profiler)
+        stats.dump_stats(path)
+
+    def _start_thread_profiler(self, *args):
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        self.__thread_profilers.append(profiler)
+        profiler.enable()
+
+
+class MemoryTracer:
+    """
+    tracemalloc of the run, attributing the memory allocated and still
+    held at the end of each phase (parse, asset discovery, download,
+    serialize...) to the lines that allocated it. Phases overlap across
+    pages and asset workers: what a phase running concurrently
+    allocates is attributed to both.
+    """
+
+    def __init__(self, top=TOP_ALLOCATIONS):
+        self.top = top
+        self.peak = 0
+        self.__phases = {}
+        self.__final_snapshot = None
+        self.__lock = threading.Lock()
+
+    def start(self):
+        tracemalloc.start()
+        metrics.set_phase_tracer(self.phase)
+
+    def stop(self):
+        metrics.set_phase_tracer(None)
+        self.__final_snapshot = self._take_snapshot()
+        self.peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        before = self._take_snapshot()
+        try:
+            yield
+        finally:
+            differences = self._take_snapshot().compare_to(before, 'lineno')
+            with self.__lock:
+                allocations = self.__phases.setdefault(name, {})
+                for difference in differences:
+                    size, count = allocations.get(
+                        difference.traceback, (0, 0))
+                    allocations[difference.traceback] = (
+                        size + difference.size_diff,
+                        count + difference.count_diff)
+
+    def format(self):
+        lines = [f'Peak traced memory: {format_size(self.peak)}']
+        for name, allocations in self.__phases.items():
+            size = sum(size for size, _ in allocations.values())
+            count = sum(count for _, count in allocations.values())
+            lines.append('')
+            lines.append(f'{name}: {format_signed_size(size)} '
+                         f'in {count:+d} blocks')
+            top = sorted(allocations.items(),
+                         key=lambda item: item[1][0], reverse=True)
+            lines.extend(
+                f'  {format_signed_size(size)} ({count:+d} blocks) '
+                f'{traceback}'
+                for traceback, (size, count) in top[:self.top] if size > 0)
+
+        if self.__final_snapshot is not None:
+            lines.append('')
+            lines.append('Held at the end of the run:')
+            lines.extend(
+                f'  {format_size(statistic.size)} '
+                f'({statistic.count} blocks) {statistic.traceback}'
+                for statistic in self.__final_snapshot.statistics(
+                    'lineno')[:self.top])
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+
+def format_signed_size(size):
+    sign = '-' if size < 0 else '+'
+    return f'{sign}{format_size(abs(size))}'
+
+
+class Profiling:
+    """
+    Profile the run inside the `with` block: its cProfile stats with
+    `cpu` and its memory allocations per phase with `memory`, written
+    to output_dir (or the current directory if it does not exist) on
+    exit. Each file written is logged with `logger`, if any.
+    """
+
+    def __init__(self, output_dir, cpu=False, memory=False, logger=None):
+        self.output_dir = output_dir if output_dir and \
+            os.path.isdir(output_dir) else os.getcwd()
+        self.cpu_profiler = CpuProfiler() if cpu else None
+        self.memory_tracer = MemoryTracer() if memory else None
+        self.logger = logger
+        self.paths = []
+
+    def __enter__(self):
+        date_time = datetime.now().strftime(TIME_FORMAT)
+        self.__profile_path = os.path.join(
+            self.output_dir, PROFILE_FILE_TEMPLATE.format(date_time=date_time))
+        self.__memory_report_path = os.path.join(
+            self.output_dir,
+            MEMORY_REPORT_TEMPLATE.format(date_time=date_time))
+        if self.cpu_profiler:
+            self.cpu_profiler.start()
+        if self.memory_tracer:
+            self.memory_tracer.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.memory_tracer:
+            self.memory_tracer.stop()
+        if self.cpu_profiler:
+            self.cpu_profiler.stop()
+
+        if self.cpu_profiler:
+            self.cpu_profiler.dump(self.__profile_path)
+            self._written(self.__profile_path)
+        if self.memory_tracer:
+            with open(self.__memory_report_path, 'w', encoding='utf-8') as f:
+                f.write(self.memory_tracer.format())
+            self._written(self.__memory_report_path)
+
+    def _written(self, path):
+        self.paths.append(path)
+        if self.logger:
+            self.logger.info(f'write profile: {path}')
@@ -0,0 +1,180 @@
+import sys
+import threading
+import time
+
+from .events import (
+    ASSET_DONE,
+    ASSET_FAILED,
+    ASSET_PROGRESS,
+    ASSET_QUEUED,
+    ASSET_STARTED,
+    PAGE_FETCHED,
+    PAGE_SAVED,
+)
+
+TTY_INTERVAL = 0.1
+# Each redraw is a line of its own when the output is not a terminal
+PIPE_INTERVAL = 5.0
+SIZE_UNITS = ('B', 'KiB', 'MiB', 'GiB')
+
+
+def format_size(size):
+    for unit in SIZE_UNITS[:-1]:
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else \
+                f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} {SIZE_UNITS[-1]}'
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f'{hours}:{minutes:02d}:{seconds:02d}'
+    return f'{minutes:02d}:{seconds:02d}'
+
+
+class ProgressRenderer:
+    """
+    Observer of the download events drawing a status line: the assets
+    completed out of those queued, the bytes received, the throughput
+    and the estimated time left. The time left goes by the bytes left
+    while the sizes of the assets in progress are announced, else by
+    the assets left. The line is redrawn at most once per
+    `interval` seconds: in place on a terminal, as a new line every
+    few seconds otherwise.
+    """
+
+    def __init__(self, stream=None, interval=None, clock=time.monotonic):
+        self.stream = stream or sys.stderr
+        isatty = getattr(self.stream, 'isatty', None)
+        self.is_tty = bool(isatty and isatty())
+        if interval is None:
+            interval = TTY_INTERVAL if self.is_tty else PIPE_INTERVAL
+        self.interval = interval
+        self.pages = set()
+        self.pages_saved = 0
+        self.assets_queued = 0
+        self.assets_done = 0
+        self.assets_failed = 0
+        self.bytes_received = 0
+        self.asset_bytes_received = 0
+        # Bytes of the assets saved
+        self.asset_bytes_done = 0
+        # Asset url -> [bytes received, size announced or None], for
+        # the assets in progress
+        self.__in_progress = {}
+        self.__clock = clock
+        self.__started_at = None
+        self.__drawn_at = None
+        self.__line_length = 0
+        self.__lock = threading.Lock()
+
+    def __call__(self, event):
+        with self.__lock:
+            self._update(event)
+            now = self.__clock()
+            if self.__started_at is None:
+                self.__started_at = now
+            if self.__drawn_at is not None and \
+                    now - self.__drawn_at < self.interval:
+                return
+            self.__drawn_at = now
+            self._draw(self.format_line(now))
+
+    def close(self):
+        """
+        Draw the final state, ending the line
+        """
+        with self.__lock:
+            if self.__started_at is None:
+                return
+            self._draw(self.format_line(self.__clock()))
+            if self.is_tty:
+                self.stream.write('\n')
+                self.stream.flush()
+            self.__started_at = None
+
+    def _update(self, event):
+        self.pages.add(event.page_url)
+        if event.type == ASSET_QUEUED:
+            self.assets_queued += 1
+        elif event.type == ASSET_STARTED:
+            self.__in_progress[event.url] = [0, None]
+        elif event.type == ASSET_DONE:
+            self.assets_done += 1
+            self.asset_bytes_done += event.size
+            self.__in_progress.pop(event.url, None)
+        elif event.type == ASSET_FAILED:
+            self.assets_failed += 1
+            self.__in_progress.pop(event.url, None)
+        elif event.type == ASSET_PROGRESS:
+            self.bytes_received += event.size
+            self.asset_bytes_received += event.size
+            progress = self.__in_progress.setdefault(event.url, [0, None])
+            progress[0] += event.size
+            progress[1] = event.total
+        elif event.type == PAGE_FETCHED:
+            self.bytes_received += event.size
+        elif event.type == PAGE_SAVED:
+            self.pages_saved += 1
+
+    def format_line(self, now):
+        elapsed = now - self.__started_at
+        completed = self.assets_done + self.assets_failed
+        parts = []
+        if len(self.pages) > 1:
+            parts.append(f'{self.pages_saved}/{len(self.pages)} pages')
+        assets = f'{completed}/{self.assets_queued} assets'
+        if self.assets_failed:
+            assets += f' ({self.assets_failed} failed)'
+        parts.append(assets)
+        parts.append(format_size(self.bytes_received))
+        if elapsed > 0:
+            parts.append(f'{format_size(self.bytes_received / elapsed)}/s')
+        time_left = self._estimate_time_left(elapsed)
+        if time_left is not None:
+            parts.append(f'ETA {format_duration(time_left)}')
+        return 'Downloading: ' + ', '.join(parts)
+
+    def _estimate_time_left(self, elapsed):
+        completed = self.assets_done + self.assets_failed
+        remaining = self.assets_queued - completed
+        if remaining <= 0:
+            return None
+        bytes_left = self._estimate_bytes_left(remaining)
+        if bytes_left is not None:
+            return bytes_left * elapsed / self.asset_bytes_received
+        # From the pace of the assets completed so far
+        if completed:
+            return elapsed * remaining / completed
+        return None
+
+    def _estimate_bytes_left(self, remaining):
+        """
+        The bytes left of the assets in progress, from their announced
+        sizes, plus the ones not started yet at the average size. None
+        if a size is unknown or nothing was received yet.
+        """
+        progress = list(self.__in_progress.values())
+        if not self.asset_bytes_received or \
+                any(total is None for _, total in progress):
+            return None
+        sized_assets = self.assets_done + len(progress)
+        if not sized_assets:
+            return None
+        announced = sum(total for _, total in progress)
+        average_size = (self.asset_bytes_done + announced) / sized_assets
+        not_started = remaining - len(progress)
+        return sum(max(0, total - received) for received, total in progress) \
+            + not_started * average_size
+
+    def _draw(self, line):
+        if self.is_tty:
+            padding = ' ' * max(0, self.__line_length - len(line))
+            self.stream.write(f'\r{line}{padding}')
+            self.__line_length = len(line)
+        else:
+            self.stream.write(f'{line}\n')
+        self.stream.flush()
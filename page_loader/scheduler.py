@@ -0,0 +1,200 @@
+import email.utils
+import threading
+import time
+
+from . import url_utils
+from .exceptions.network_exceptions import DeadlineExceeded
+
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_BURST = 1
+
+
+def parse_retry_after(value, now=None):
+    """
+    Seconds to wait from a Retry-After header value, either a number of
+    seconds or an HTTP date, or None if it is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, retry_at.timestamp() - now)
+
+
+class TokenBucket:
+    """
+    Rate limit of `rate` requests per second on average, with bursts of
+    up to `burst` requests
+    """
+
+    def __init__(self, rate, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def reserve(self, deadline=None):
+        """
+        Take the next token, possibly one yet to come, and return how long
+        to wait for it. Return None, taking nothing, if it would come
+        after the deadline.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait and deadline is not None and now + wait >= deadline:
+                return None
+            # Tokens go below zero for the requests queued behind
+            self.tokens -= 1
+            return wait
+
+
+class HostLimits:
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 requests_per_second=None, burst=DEFAULT_BURST):
+        # None for no limit
+        self.max_connections = max_connections
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+
+    @classmethod
+    def from_settings(cls, settings, defaults=None):
+        defaults = defaults or cls()
+        return cls(
+            settings.get('max_connections', defaults.max_connections),
+            settings.get('requests_per_second',
+                         defaults.requests_per_second),
+            settings.get('burst', defaults.burst))
+
+
+class HostState:
+    def __init__(self, limits):
+        self.limits = limits
+        self.semaphore = threading.BoundedSemaphore(limits.max_connections) \
+            if limits.max_connections else None
+        self.bucket = TokenBucket(limits.requests_per_second, limits.burst) \
+            if limits.requests_per_second else None
+        # time.monotonic() before which no request is sent to the host
+        self.blocked_until = 0.0
+
+
+class Slot:
+    """
+    A connection to a host granted by the scheduler, to release once
+    the response is read
+    """
+
+    def __init__(self, semaphore=None, wait_time=0.0):
+        self.wait_time = wait_time
+        self.__semaphore = semaphore
+        self.__lock = threading.Lock()
+
+    def release(self):
+        with self.__lock:
+            semaphore, self.__semaphore = self.__semaphore, None
+        if semaphore is not None:
+            semaphore.release()
+
+
+class Scheduler:
+    """
+    Gate in front of the requests to each host: at most max_connections
+    requests in flight, at most requests_per_second on average, and
+    none while the host asked to retry later. The defaults apply to
+    every host, the `hosts` settings override them per host name (or
+    host:port).
+    """
+
+    def __init__(self, settings=None):
+        settings = settings or {}
+        self.default_limits = HostLimits.from_settings(settings)
+        self.host_limits = {
+            host.lower(): HostLimits.from_settings(
+                host_settings, self.default_limits)
+            for host, host_settings in settings.get('hosts', {}).items()
+        }
+        self.__hosts = {}
+        self.__lock = threading.Lock()
+
+    def acquire(self, url, deadline=None):
+        """
+        Wait for the turn of a request to url and return its Slot.
+        `deadline` is a time.monotonic() value not to wait past: then
+        DeadlineExceeded is raised.
+        """
+        state = self._get_state(url)
+        start_time = time.monotonic()
+        self._wait_until_unblocked(url, state, deadline)
+
+        semaphore = state.semaphore
+        if semaphore is not None and not semaphore.acquire(
+                timeout=self._get_remaining(url, deadline)):
+            raise DeadlineExceeded(
+                f'Deadline exceeded waiting for a connection to {url}')
+        slot = Slot(semaphore)
+
+        if state.bucket is not None:
+            wait = state.bucket.reserve(deadline)
+            if wait is None:
+                slot.release()
+                raise DeadlineExceeded(
+                    f'Deadline exceeded waiting for the rate limit of {url}')
+            time.sleep(wait)
+
+        slot.wait_time = time.monotonic() - start_time
+        return slot
+
+    def defer(self, url, seconds):
+        """
+        Hold back the requests to the host of url for `seconds`, as asked
+        by its Retry-After header
+        """
+        state = self._get_state(url)
+        with self.__lock:
+            state.blocked_until = max(
+                state.blocked_until, time.monotonic() + seconds)
+
+    def _wait_until_unblocked(self, url, state, deadline):
+        # The block may be extended by other responses while waiting
+        while True:
+            wait = state.blocked_until - time.monotonic()
+            if wait <= 0:
+                return
+            if deadline is not None and state.blocked_until >= deadline:
+                raise DeadlineExceeded(
+                    f'Deadline exceeded waiting to retry {url}')
+            time.sleep(wait)
+
+    def _get_state(self, url):
+        netloc = url_utils.parse_url(url).netloc.lower()
+        with self.__lock:
+            state = self.__hosts.get(netloc)
+            if state is None:
+                state = self.__hosts[netloc] = HostState(
+                    self._get_limits(netloc))
+            return state
+
+    def _get_limits(self, netloc):
+        hostname = netloc.rpartition('@')[2].partition(':')[0]
+        return self.host_limits.get(netloc) or \
+            self.host_limits.get(hostname) or self.default_limits
+
+    @staticmethod
+    def _get_remaining(url, deadline):
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f'Deadline exceeded for {url}')
+        return remaining
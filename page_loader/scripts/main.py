@@ -1,30 +1,202 @@
 import argparse
+import functools
+import json
 import logging
 import os
 import sys
 import time
 
 from page_loader.__version__ import __version__
-from page_loader.download_manager import DownloadManager
-from page_loader.exceptions.io_exceptions import DirectoryError, SaveError
-from page_loader.exceptions.network_exceptions import HttpError, RequestError
+from page_loader.parsers import AUTO_PARSER, PARSERS
+
+# Only the modules needed to parse the arguments are imported up front:
+# requests, bs4 and dotenv load once a download starts, so that --version
+# and usage errors return right away
+
+STDIN_URL = '-'
+STATS_FORMATS = ('text', 'json')
+
+
+@functools.lru_cache(maxsize=None)
+def get_exit_codes():
+    from page_loader.exceptions.io_exceptions import DirectoryError, SaveError
+    from page_loader.exceptions.network_exceptions import (
+        HttpError,
+        RequestError,
+    )
+    from page_loader.exceptions.parser_exceptions import ParserNotFoundError
+
+    return {
+        HttpError: os.EX_PROTOCOL,
+        RequestError: os.EX_UNAVAILABLE,
+        SaveError: os.EX_OSFILE,
+        DirectoryError: os.EX_IOERR,
+        ParserNotFoundError: os.EX_CONFIG,
+    }
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            f'expected a positive integer, got {value}')
+    return number
+
+
+def positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(
+            f'expected a positive number, got {value}')
+    return number
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Web page downloader')
-    parser.add_argument('url', metavar='url')
+    parser.add_argument(
+        'urls', metavar='url', nargs='*',
+        help=f"Page URL(s) to download, '{STDIN_URL}' to read them from stdin"
+    )
+    parser.add_argument(
+        '-i', '--input-file',
+        help='File with page URLs to download, one per line',
+        default=None
+    )
     parser.add_argument(
         '-o', '--output',
         help='Output directory',
         default=os.getcwd()
     )
+    parser.add_argument(
+        '-w', '--workers',
+        type=positive_int,
+        help='Number of assets downloaded concurrently',
+        default=None
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=positive_int,
+        help='Number of pages downloaded concurrently in batch mode',
+        default=None
+    )
+    parser.add_argument(
+        '-d', '--depth',
+        type=int,
+        help='Mirror same-host pages linked up to this depth',
+        default=None
+    )
+    parser.add_argument(
+        '--max-pages',
+        type=positive_int,
+        help='Maximum number of pages saved when mirroring',
+        default=None
+    )
+    parser.add_argument(
+        '-p', '--parser',
+        choices=(AUTO_PARSER, ) + PARSERS,
+        help='HTML parser backend (default: fastest installed)',
+        default=None
+    )
+    parser.add_argument(
+        '--preserve-source',
+        action='store_const', const=True, default=None,
+        help='Patch only the rewritten links into the original page bytes'
+    )
+    parser.add_argument(
+        '--streaming',
+        action='store_const', const=True, default=None,
+        help='Rewrite the page while it downloads, without a parse tree'
+    )
+    parser.add_argument(
+        '--full',
+        dest='incremental', action='store_const', const=False, default=None,
+        help='Fetch and save everything again, ignoring the page manifest'
+    )
+    parser.add_argument(
+        '--adaptive',
+        action='store_const', const=True, default=None,
+        help='Adapt the number of concurrent requests to the latency and '
+             'errors observed'
+    )
+    parser.add_argument(
+        '--deadline',
+        type=positive_float, metavar='SECONDS',
+        help='Time limit of a page download, its assets included',
+        default=None
+    )
+    parser.add_argument(
+        '--progress',
+        action=argparse.BooleanOptionalAction, default=None,
+        help='Show the bytes, throughput and assets downloaded on stderr '
+             '(default: if stderr is a terminal)'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Only list the assets that would be downloaded'
+    )
+    parser.add_argument(
+        '--stats',
+        nargs='?', const=STATS_FORMATS[0], default=None,
+        metavar='{' + ','.join(STATS_FORMATS) + '}',
+        help='Report per-phase timings and transfer counters to stderr'
+    )
+    # Each would mostly measure the other: cProfile the snapshots of
+    # tracemalloc, tracemalloc the records of cProfile
+    profiling = parser.add_mutually_exclusive_group()
+    profiling.add_argument(
+        '--profile',
+        action='store_true',
+        help='Write the cProfile stats of the run to the output directory'
+    )
+    profiling.add_argument(
+        '--trace-memory',
+        action='store_true',
+        help='Write the top memory allocations of each phase, traced with '
+             'tracemalloc, to the output directory'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        help='Directory of the persistent HTTP cache',
+        default=None
+    )
     parser.add_argument(
         '-v', '--version',
         action='version',
         version=f'Page downloader {__version__}',
         help='Show the program version and exit.'
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.stats is not None and args.stats not in STATS_FORMATS:
+        # `--stats url`: the optional format swallowed the first url
+        args.urls.insert(0, args.stats)
+        args.stats = STATS_FORMATS[0]
+    args.urls = collect_urls(args.urls, args.input_file)
+    if not args.urls:
+        parser.error('at least one url is required')
+    return args
+
+
+def read_urls(lines):
+    return [line.strip() for line in lines
+            if line.strip() and not line.lstrip().startswith('#')]
+
+
+def collect_urls(urls, input_file=None):
+    collected_urls = []
+    for url in urls:
+        if url == STDIN_URL:
+            collected_urls.extend(read_urls(sys.stdin))
+        else:
+            collected_urls.append(url)
+
+    if input_file == STDIN_URL:
+        collected_urls.extend(read_urls(sys.stdin))
+    elif input_file:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            collected_urls.extend(read_urls(f))
+
+    return collected_urls
 
 
 def setup_logging():
@@ -44,7 +216,8 @@ def setup_logging():
 
 
 def log_arguments(logger, args):
-    logger.info(f'requested url: {args.url}')
+    for url in args.urls:
+        logger.info(f'requested url: {url}')
     logger.info(f'output path: {args.output}')
 
 
@@ -53,6 +226,40 @@ def log_download_info(logger, download_manager):
     assets_dir = download_manager.assets_dir
     logger.info(f'write html file: {path_to_save_page_content}')
     logger.info(f'create directory for assets: {assets_dir}')
+    if download_manager.metrics.duplicates_skipped:
+        logger.info(f'skipped duplicate assets: '
+                    f'{download_manager.metrics.duplicates_skipped}')
+
+
+def report_stats(stats_format, metrics):
+    metrics = [page_metrics for page_metrics in metrics if page_metrics]
+    if not stats_format or not metrics:
+        return
+    if stats_format == 'json':
+        print(json.dumps([page_metrics.to_dict() for page_metrics in metrics]),
+              file=sys.stderr)
+    else:
+        for page_metrics in metrics:
+            print(page_metrics.format(), file=sys.stderr)
+
+
+def report_failed_assets(error_logger, metrics):
+    for page_metrics in filter(None, metrics):
+        for asset in page_metrics.failed_assets:
+            error_logger.error(
+                f'failed to download asset {asset.url}: {asset.error}')
+
+
+def create_progress_renderer(args):
+    from page_loader.progress import ProgressRenderer
+
+    enabled = sys.stderr.isatty() if args.progress is None else args.progress
+    return ProgressRenderer(sys.stderr) if enabled else None
+
+
+def close_progress_renderer(renderer):
+    if renderer is not None:
+        renderer.close()
 
 
 def handle_result(result_path, elapsed_time):
@@ -63,27 +270,59 @@ def handle_result(result_path, elapsed_time):
 
 
 def run_download(info_logger, error_logger, args):  # noqa: C901
+    from page_loader.download_manager import DownloadManager
+
+    exit_codes = get_exit_codes()
+    url, = args.urls
+    renderer = create_progress_renderer(args)
     try:
         start_time = time.time()
-        manager = DownloadManager(args.url, args.output)
-        result_path = manager.download()
+        manager = DownloadManager(
+            url, args.output,
+            workers=args.workers, cache_dir=args.cache_dir,
+            parser=args.parser, preserve_source=args.preserve_source,
+            streaming=args.streaming, incremental=args.incremental,
+            deadline=args.deadline, adaptive=args.adaptive,
+            on_event=renderer)
+        try:
+            result_path = manager.download()
+        finally:
+            close_progress_renderer(renderer)
 
         if result_path is None:
             error_logger.error(
-                f'Failed to download page: no content at {args.url}')
+                f'Failed to download page: no content at {url}')
             sys.exit(os.EX_OSFILE)
 
         log_download_info(info_logger, manager)
+        report_failed_assets(error_logger, [manager.metrics])
+        report_stats(args.stats, [manager.metrics])
         handle_result(result_path, time.time() - start_time)
 
-    except (HttpError, RequestError, SaveError, DirectoryError) as e:
+    except tuple(exit_codes) as e:
+        error_logger.error(e)
+        sys.exit(exit_codes[type(e)])
+
+    except Exception as e:
+        error_logger.error(f'Some unexpected error:\n{e}')
+        sys.exit(os.EX_SOFTWARE)
+
+
+def run_dry_run(error_logger, args):
+    from page_loader.download_manager import DownloadManager
+
+    exit_codes = get_exit_codes()
+    try:
+        for url in args.urls:
+            manager = DownloadManager(
+                url, args.output, cache_dir=args.cache_dir,
+                parser=args.parser)
+            for asset_url in manager.list_assets():
+                print(asset_url)
+        sys.exit(os.EX_OK)
+
+    except tuple(exit_codes) as e:
         error_logger.error(e)
-        exit_codes = {
-            HttpError: os.EX_PROTOCOL,
-            RequestError: os.EX_UNAVAILABLE,
-            SaveError: os.EX_OSFILE,
-            DirectoryError: os.EX_IOERR,
-        }
         sys.exit(exit_codes[type(e)])
 
     except Exception as e:
@@ -91,14 +330,92 @@ def run_download(info_logger, error_logger, args):  # noqa: C901
         sys.exit(os.EX_SOFTWARE)
 
 
+def exit_code(result):
+    if result.ok:
+        return os.EX_OK
+    if result.error is None:
+        return os.EX_OSFILE
+    return get_exit_codes().get(type(result.error), os.EX_SOFTWARE)
+
+
+def run_batch(error_logger, args):
+    from page_loader.batch import download_many
+
+    start_time = time.time()
+    renderer = create_progress_renderer(args)
+    try:
+        results = download_many(
+            args.urls, args.output, jobs=args.jobs,
+            workers=args.workers, cache_dir=args.cache_dir,
+            parser=args.parser, preserve_source=args.preserve_source,
+            streaming=args.streaming, incremental=args.incremental,
+            deadline=args.deadline, adaptive=args.adaptive,
+            on_event=renderer)
+    finally:
+        close_progress_renderer(renderer)
+    report_results(error_logger, results, time.time() - start_time,
+                   args.stats)
+
+
+def run_mirror(error_logger, args):
+    from page_loader.mirroring import mirror
+
+    start_time = time.time()
+    renderer = create_progress_renderer(args)
+    try:
+        results = mirror(
+            args.urls, args.output, depth=args.depth,
+            max_pages=args.max_pages, jobs=args.jobs, workers=args.workers,
+            cache_dir=args.cache_dir, parser=args.parser,
+            preserve_source=args.preserve_source,
+            incremental=args.incremental, deadline=args.deadline,
+            adaptive=args.adaptive, on_event=renderer)
+    finally:
+        close_progress_renderer(renderer)
+    report_results(error_logger, results, time.time() - start_time,
+                   args.stats)
+
+
+def report_results(error_logger, results, elapsed_time, stats_format=None):
+    exit_codes = [exit_code(result) for result in results]
+
+    for result, code in zip(results, exit_codes):
+        if result.ok:
+            print(f'[{code}] {result.url} -> \'{result.path}\'')
+        else:
+            error = result.error or 'no content'
+            error_logger.error(f'[{code}] {result.url}: {error}')
+
+    report_failed_assets(error_logger, [result.metrics for result in results])
+    succeeded = exit_codes.count(os.EX_OK)
+    print(f'Downloaded {succeeded} of {len(results)} pages')
+    print(f'Elapsed time: {elapsed_time:.2f} seconds')
+    report_stats(stats_format, [result.metrics for result in results])
+
+    failed_codes = [code for code in exit_codes if code != os.EX_OK]
+    sys.exit(failed_codes[0] if failed_codes else os.EX_OK)
+
+
 def main():
     args = parse_args()
+    from page_loader.profiling import Profiling
+
     setup_logging()
     info_logger = logging.getLogger('info_logger')
     error_logger = logging.getLogger('error_logger')
 
     log_arguments(info_logger, args)
-    run_download(info_logger, error_logger, args)
+    # The runs end with sys.exit, the profiles are written on the way out
+    with Profiling(args.output, cpu=args.profile, memory=args.trace_memory,
+                   logger=info_logger):
+        if args.dry_run:
+            run_dry_run(error_logger, args)
+        elif args.depth is not None:
+            run_mirror(error_logger, args)
+        elif len(args.urls) == 1:
+            run_download(info_logger, error_logger, args)
+        else:
+            run_batch(error_logger, args)
 
 
 if __name__ == '__main__':
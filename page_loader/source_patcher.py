@@ -0,0 +1,73 @@
+import html
+import re
+
+TAG_NAME_PATTERN = re.compile(r'<[a-zA-Z][^\s/>]*')
+ATTRIBUTE_PATTERN = re.compile(
+    r'[\s/]*(?P<name>[^\s/>"\'=][^\s/>=]*)'
+    r'(?:\s*=\s*(?P<value>"[^"]*"|\'[^\']*\'|[^\s>]*))?')
+
+
+class SourcePatcher:
+    """
+    Replace attribute values of start tags in the original page source,
+    leaving every other character untouched. Tags are located by the
+    (line, column) position BeautifulSoup's html.parser builder records
+    in Tag.sourceline and Tag.sourcepos.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.__line_offsets = self.__get_line_offsets(source)
+        self.__patches = {}
+
+    def patch(self, line, column, attr, value, tag_name=None):
+        """
+        Schedule the replacement of attr's value in the start tag at
+        (line, column). Return False if the attribute cannot be located,
+        or if the tag there is not a `tag_name` one: then the position
+        is off and the source must not be patched.
+        """
+        if line is None or column is None or \
+                line > len(self.__line_offsets):
+            return False
+        tag_offset = self.__line_offsets[line - 1] + column
+        span = self._find_attribute_value(tag_offset, attr, tag_name)
+        if span is None:
+            return False
+        self.__patches[span] = f'"{html.escape(value, quote=True)}"'
+        return True
+
+    def apply(self):
+        chunks = []
+        position = 0
+        for (start, end), replacement in sorted(self.__patches.items()):
+            chunks.append(self.source[position:start])
+            chunks.append(replacement)
+            position = end
+        chunks.append(self.source[position:])
+        return ''.join(chunks)
+
+    def _find_attribute_value(self, tag_offset, attr, expected_name=None):
+        tag_name = TAG_NAME_PATTERN.match(self.source, tag_offset)
+        if not tag_name:
+            return None
+        if expected_name is not None and \
+                tag_name.group()[1:].lower() != expected_name.lower():
+            return None
+
+        position = tag_name.end()
+        while True:
+            attribute = ATTRIBUTE_PATTERN.match(self.source, position)
+            if not attribute or attribute.end() == position:
+                return None
+            if attribute.group('name').lower() == attr.lower():
+                if attribute.group('value') is None:
+                    return None
+                return attribute.span('value')
+            position = attribute.end()
+
+    @staticmethod
+    def __get_line_offsets(source):
+        offsets = [0]
+        offsets.extend(match.end() for match in re.finditer('\n', source))
+        return offsets
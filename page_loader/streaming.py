@@ -0,0 +1,91 @@
+import codecs
+from html.parser import HTMLParser
+
+from .encoding import detect_encoding
+from .events import PAGE_FETCHED
+from .file_utils import atomic_write
+from .source_patcher import SourcePatcher
+
+
+class StreamingRewriter(HTMLParser):
+    """
+    Incremental tokenizer echoing its input unchanged, except for the
+    start tags `rewrite_tag(tag, attrs)` returns an (attr, new value)
+    for. Only the unconsumed tail of the fed data is kept in memory.
+    """
+
+    def __init__(self, rewrite_tag, write):
+        super().__init__(convert_charrefs=False)
+        self.__rewrite_tag = rewrite_tag
+        self.__write = write
+        self.__rewritten_starttag = None
+
+    def handle_starttag(self, tag, attrs):
+        rewrite = self.__rewrite_tag(tag, attrs)
+        if not rewrite:
+            return
+        attr, value = rewrite
+        patcher = SourcePatcher(self.get_starttag_text())
+        if patcher.patch(1, 0, attr, value, tag):
+            self.__rewritten_starttag = patcher.apply()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def updatepos(self, i, j):
+        # Called by the tokenizer with the span of every piece of input
+        # it consumes, right after the handler of that piece. Not public:
+        # test_streamed_page_matches_patched_source guards the output
+        if i < j:
+            text = self.rawdata[i:j]
+            if self.__rewritten_starttag is not None:
+                starttag_length = len(self.get_starttag_text())
+                text = self.__rewritten_starttag + text[starttag_length:]
+                self.__rewritten_starttag = None
+            self.__write(text)
+        return super().updatepos(i, j)
+
+
+class StreamingPageProcessor:
+    """
+    Download a page without building a parse tree: the page is
+    tokenized as it streams in, asset downloads are queued as soon as
+    their tags are seen, and the rewritten html is written out
+    immediately. Peak memory does not depend on the page size.
+    """
+
+    def __init__(self, download_manager):
+        self.__download_manager = download_manager
+        self.__assets_processor = download_manager.assets_processor
+        self.__http_client = download_manager.http_client
+        self.__logger = download_manager.logger
+
+    def process(self, response, path_to_save):
+        chunks = self.__http_client.iter_content(response)
+        first_chunk = next(chunks, b'')
+        encoding, method = detect_encoding(
+            response.headers.get('Content-Type'), first_chunk)
+        self.__download_manager.page_encoding = encoding
+        self.__download_manager.encoding_method = method
+        self.__logger.debug(
+            'Page encoding: %s (detected from %s)', encoding, method)
+
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        try:
+            with atomic_write(path_to_save, encoding=encoding, newline='',
+                              errors='xmlcharrefreplace') as f:
+                rewriter = StreamingRewriter(
+                    self.__assets_processor.process_streamed_asset, f.write)
+                rewriter.feed(decoder.decode(first_chunk))
+                size = len(first_chunk)
+                for chunk in chunks:
+                    rewriter.feed(decoder.decode(chunk))
+                    size += len(chunk)
+                rewriter.feed(decoder.decode(b'', final=True))
+                rewriter.close()
+                self.__download_manager.metrics.record_bytes(response, size)
+                self.__download_manager.events.emit(
+                    PAGE_FETCHED, self.__download_manager.url, size=size)
+                self.__assets_processor.finish_streamed_assets()
+        finally:
+            self.__assets_processor.finish_streamed_assets()
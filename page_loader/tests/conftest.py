@@ -2,7 +2,9 @@
 
 from .fixtures.fixtures import (
     cleanup_downloaded_files,
+    download,
     expected_content,
+    no_retry_backoff,
     retrieved_content,
     setup_mocking,
     setup_mocking_http_fail_response,
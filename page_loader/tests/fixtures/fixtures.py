@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import shutil
@@ -8,10 +9,13 @@ import requests
 import requests_mock
 from bs4 import BeautifulSoup
 
+import page_loader
+
 # Constants for URL and local file/directory names used in tests
 URL = 'https://ru.hexlet.io/courses'
 ASSETS_DIR = 'ru-hexlet-io-courses_files'
 CONTENT_FILE = 'ru-hexlet-io-courses.html'
+MANIFEST_FILE = 'ru-hexlet-io-courses_manifest.json'
 HTTP_ERROR_CODES = 400, 401, 403, 404, 405, 408, 500, 501, 502, 503, 504, 505
 
 # Get the directory where this fixtures file is located
@@ -32,6 +36,32 @@ def compare_prettified_htmls(html_content1, html_content2):
     return soap1.prettify() == soap2.prettify()
 
 
+@pytest.fixture(autouse=True)
+def no_retry_backoff(monkeypatch):
+    """
+    Fixture retrying failed requests right away, so that tests of error
+    responses do not wait for the backoff delays.
+    """
+    monkeypatch.setattr(
+        'page_loader.http_client.backoff_delay', lambda *args: 0.0)
+
+
+@pytest.fixture(params=['sync', 'async'])
+def download(request):
+    """
+    Fixture to run a test against both download engines: the synchronous
+    `page_loader.download` and `page_loader.download_async` driven by
+    its own event loop.
+    """
+    if request.param == 'sync':
+        return page_loader.download
+
+    def download_with_event_loop(*args, **kwargs):
+        return asyncio.run(page_loader.download_async(*args, **kwargs))
+
+    return download_with_event_loop
+
+
 @pytest.fixture
 def retrieved_content(filename):
     """
@@ -56,12 +86,13 @@ def expected_content():
 def cleanup_downloaded_files():
     """
     Fixture that yields control to the test, then cleans up downloaded
-    HTML file and assets directory after the test finishes.
+    HTML file, its manifest and assets directory after the test finishes.
     """
     yield
 
-    if os.path.isfile(CONTENT_FILE):
-        os.remove(CONTENT_FILE)
+    for path in (CONTENT_FILE, MANIFEST_FILE):
+        if os.path.isfile(path):
+            os.remove(path)
     if os.path.isdir(ASSETS_DIR):
         shutil.rmtree(ASSETS_DIR)
 
@@ -0,0 +1,116 @@
+import io
+import logging
+import os
+import sys
+
+import pytest
+import requests
+
+from page_loader.download_manager import DownloadManager
+from page_loader.scripts import main as cli
+
+from .fixtures.fixtures import CONTENT_FILE, URL
+
+OTHER_URL = 'https://ru.hexlet.io/about'
+OTHER_FILE = 'ru-hexlet-io-about.html'
+MISSING_URL = 'https://ru.hexlet.io/missing'
+UNREACHABLE_URL = 'https://unreachable.hexlet.io/'
+
+
+@pytest.fixture
+def run_cli(monkeypatch):
+    """
+    Run the CLI with the given arguments and return its exit code
+    """
+    def run(*args):
+        monkeypatch.setattr(sys, 'argv', ['page-loader', *args])
+        with pytest.raises(SystemExit) as exit_info:
+            cli.main()
+        return exit_info.value.code
+
+    yield run
+    # main() adds its handlers on every run
+    for name in ('info_logger', 'error_logger'):
+        logging.getLogger(name).handlers.clear()
+
+
+def test_dry_run_unexpected_error(run_cli, capsys, tmp_path, monkeypatch):
+    def fail(self):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(DownloadManager, 'list_assets', fail)
+
+    assert run_cli('--dry-run', '-o', str(tmp_path), URL) == os.EX_SOFTWARE
+    assert 'Some unexpected error:\nboom' in capsys.readouterr().err
+
+
+def assert_downloaded(output, temp_dir, count):
+    assert f"[0] {URL} -> '{os.path.join(temp_dir, CONTENT_FILE)}'" \
+        in output
+    assert f"[0] {OTHER_URL} -> '{os.path.join(temp_dir, OTHER_FILE)}'" \
+        in output
+    assert f'Downloaded {count} of {count} pages' in output
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_batch_downloads_every_url(filename, setup_mocking, temp_directory,
+                                   run_cli, capsys):
+    with setup_mocking as m, temp_directory as temp_dir:
+        m.get(OTHER_URL, text='<html><body>About</body></html>')
+        code = run_cli('-o', temp_dir, '-j', '2', URL, OTHER_URL)
+
+        assert code == os.EX_OK
+        assert_downloaded(capsys.readouterr().out, temp_dir, 2)
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+@pytest.mark.parametrize('source', ['input_file', 'stdin', 'stdin_file'])
+def test_batch_reads_urls(filename, source, setup_mocking, temp_directory,
+                          run_cli, capsys, monkeypatch):
+    lines = f'# pages\n{URL}\n\n  # {MISSING_URL}\n{OTHER_URL}\n'
+    with setup_mocking as m, temp_directory as temp_dir:
+        m.get(OTHER_URL, text='<html><body>About</body></html>')
+        if source == 'input_file':
+            input_file = os.path.join(temp_dir, 'urls.txt')
+            with open(input_file, 'w', encoding='utf-8') as f:
+                f.write(lines)
+            args = ['-i', input_file]
+        else:
+            monkeypatch.setattr(sys, 'stdin', io.StringIO(lines))
+            args = ['-'] if source == 'stdin' else ['-i', '-']
+        code = run_cli('-o', temp_dir, *args)
+
+        assert code == os.EX_OK
+        assert_downloaded(capsys.readouterr().out, temp_dir, 2)
+    assert MISSING_URL not in [r.url for r in m.request_history]
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_stats_does_not_swallow_first_url(filename, setup_mocking,
+                                          temp_directory, run_cli, capsys):
+    with setup_mocking as m, temp_directory as temp_dir:
+        m.get(OTHER_URL, text='<html><body>About</body></html>')
+        code = run_cli('-o', temp_dir, '--stats', URL, OTHER_URL)
+
+        assert code == os.EX_OK
+        captured = capsys.readouterr()
+        assert_downloaded(captured.out, temp_dir, 2)
+    assert f'Stats for {URL}:' in captured.err
+    assert f'Stats for {OTHER_URL}:' in captured.err
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_batch_exits_with_first_failure(filename, setup_mocking,
+                                        temp_directory, run_cli, capsys):
+    with setup_mocking as m, temp_directory as temp_dir:
+        m.get(UNREACHABLE_URL, exc=requests.exceptions.ConnectionError)
+        m.get(MISSING_URL, status_code=404)
+        code = run_cli('-o', temp_dir, URL, UNREACHABLE_URL, MISSING_URL)
+
+        captured = capsys.readouterr()
+        assert f"[0] {URL} -> '{os.path.join(temp_dir, CONTENT_FILE)}'" \
+            in captured.out
+    assert code == os.EX_UNAVAILABLE
+    assert 'Downloaded 1 of 3 pages' in captured.out
+    assert f'[{os.EX_UNAVAILABLE}] {UNREACHABLE_URL}: ' in captured.err
+    assert f'[{os.EX_PROTOCOL}] {MISSING_URL}: ' in captured.err
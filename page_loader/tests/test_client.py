@@ -0,0 +1,93 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import page_loader.client
+from page_loader import PageLoader
+from page_loader.download_manager import create_http_client, load_settings
+from page_loader.exceptions.network_exceptions import HttpError
+
+from .fixtures.fixtures import ASSETS_DIR, CONTENT_FILE, URL
+
+MISSING_URL = 'https://ru.hexlet.io/missing'
+
+
+@pytest.fixture
+def created_clients(monkeypatch):
+    clients = []
+
+    def create(*args, **kwargs):
+        clients.append(create_http_client(*args, **kwargs))
+        return clients[-1]
+
+    monkeypatch.setattr(page_loader.client, 'create_http_client', create)
+    return clients
+
+
+def test_construction_does_no_io(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('I/O on construction')
+
+    monkeypatch.setattr(page_loader.client, 'load_settings', fail)
+    monkeypatch.setattr(page_loader.client, 'create_http_client', fail)
+
+    with PageLoader('missing_dir', jobs=4, workers=4):
+        pass
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_client_is_reused_across_downloads(filename, setup_mocking,
+                                           temp_directory, created_clients):
+    with setup_mocking, temp_directory as temp_dir, \
+            PageLoader(temp_dir, workers=2) as client:
+        first_path = client.download(URL)
+        other_dir = os.path.join(temp_dir, 'other')
+        os.mkdir(other_dir)
+        second_path = client.download(URL, other_dir)
+
+    assert first_path == os.path.join(temp_dir, CONTENT_FILE)
+    assert second_path == os.path.join(other_dir, CONTENT_FILE)
+    assert len(created_clients) == 1
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_many_returns_results_in_order(filename, setup_mocking,
+                                                temp_directory):
+    with setup_mocking as m, temp_directory as temp_dir, \
+            PageLoader(temp_dir, jobs=2) as client:
+        m.get(MISSING_URL, status_code=404)
+        results = client.download_many([MISSING_URL, URL])
+
+    assert [result.url for result in results] == [MISSING_URL, URL]
+    assert isinstance(results[0].error, HttpError)
+    assert results[1].ok and results[1].metrics.assets
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_client_is_shared_across_threads(filename, setup_mocking,
+                                         temp_directory, created_clients):
+    with setup_mocking, temp_directory as temp_dir, \
+            PageLoader(temp_dir, jobs=4) as client:
+        paths = [os.path.join(temp_dir, str(index)) for index in range(4)]
+        for path in paths:
+            os.mkdir(path)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(
+                lambda path: client.download(URL, path), paths))
+
+    assert results == [os.path.join(path, CONTENT_FILE) for path in paths]
+    assert len(created_clients) == 1
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_settings_override_the_settings_file(filename, setup_mocking,
+                                             temp_directory):
+    settings = dict(load_settings(), asset_tags={})
+    with setup_mocking, temp_directory as temp_dir, \
+            PageLoader(temp_dir, settings=settings) as client:
+        client.download(URL)
+
+        assert client.settings is settings
+        assert not os.path.exists(
+            os.path.join(temp_dir, ASSETS_DIR))
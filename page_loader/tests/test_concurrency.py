@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from page_loader import download_with_metrics
+from page_loader.concurrency import AdaptiveLimiter
+from page_loader.exceptions.network_exceptions import DeadlineExceeded
+
+from .fixtures.fixtures import URL
+
+
+def soon():
+    return time.monotonic() + 0.05
+
+
+def test_limit_caps_requests_in_flight():
+    limiter = AdaptiveLimiter(min_limit=1, max_limit=4)
+    permit = limiter.acquire()
+
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire(deadline=soon())
+
+    permit.release()
+    # Releasing twice does not let another request in
+    permit.release()
+    limiter.acquire(deadline=soon())
+    assert limiter.in_flight == 1
+
+
+def test_limit_grows_additively_up_to_max():
+    limiter = AdaptiveLimiter(min_limit=1, max_limit=3)
+    concurrencies = []
+    for _ in range(10):
+        permits = [limiter.acquire() for _ in range(limiter.concurrency)]
+        limiter.record(0.01)
+        concurrencies.append(limiter.concurrency)
+        for permit in permits:
+            permit.release()
+
+    # 1 -> 2 -> 2.5 -> 2.9 -> 3.2, capped at 3
+    assert concurrencies[:4] == [2, 2, 2, 3]
+    assert max(concurrencies) == 3
+
+
+def test_unused_limit_does_not_grow():
+    limiter = AdaptiveLimiter(min_limit=1, max_limit=16, initial_limit=8)
+    for _ in range(20):
+        with_one_in_flight = limiter.acquire()
+        limiter.record(0.01)
+        with_one_in_flight.release()
+
+    assert limiter.concurrency == 8
+
+
+def test_overload_cuts_limit_once_per_round_trip():
+    limiter = AdaptiveLimiter(max_limit=16, initial_limit=10,
+                              backoff_ratio=0.5)
+
+    limiter.record(1.0, overloaded=True)
+    limiter.record(1.0, overloaded=True)
+
+    assert limiter.concurrency == 5
+
+
+def test_growing_latency_cuts_limit():
+    limiter = AdaptiveLimiter(max_limit=16, initial_limit=10,
+                              latency_tolerance=2.0, backoff_ratio=0.5)
+    limiter.record(0.001)
+    for _ in range(10):
+        limiter.record(0.01)
+
+    assert limiter.concurrency < 10
+    assert limiter.concurrency >= limiter.min_limit
+
+
+@pytest.mark.parametrize('latencies', [
+    # Jitter below the latency floor
+    [0.0001] + [0.0009] * 20,
+    # Too few samples
+    [0.01] + [0.1] * 3,
+])
+def test_latency_noise_does_not_cut_limit(latencies):
+    limiter = AdaptiveLimiter(max_limit=16, initial_limit=10)
+    for latency in latencies:
+        limiter.record(latency)
+
+    assert limiter.concurrency == 10
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_reports_concurrency(filename, setup_mocking,
+                                      temp_directory, monkeypatch):
+    # Fixed latencies, whatever the mocked requests take
+    record = AdaptiveLimiter.record
+    monkeypatch.setattr(
+        AdaptiveLimiter, 'record',
+        lambda self, latency, overloaded=False:
+            record(self, 0.01, overloaded))
+
+    with setup_mocking, temp_directory as temp_dir:
+        _, fixed = download_with_metrics(URL, path=temp_dir, workers=3)
+        _, adaptive = download_with_metrics(
+            URL, path=temp_dir, workers=2, adaptive=True)
+
+    assert (fixed.concurrency, fixed.adaptive_concurrency) == (3, False)
+    assert adaptive.adaptive_concurrency
+    assert adaptive.concurrency >= 2
+    assert adaptive.to_dict()['concurrency'] == adaptive.concurrency
+    assert 'concurrency' in adaptive.format()
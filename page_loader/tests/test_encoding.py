@@ -0,0 +1,71 @@
+import codecs
+
+import pytest
+
+from page_loader.encoding import (
+    BOM_METHOD,
+    DEFAULT_ENCODING,
+    DEFAULT_METHOD,
+    DETECTOR_METHOD,
+    HEADER_METHOD,
+    META_METHOD,
+    SNIFF_SIZE,
+    detect_encoding,
+)
+
+CYRILLIC_PAGE = ('<html><body><p>'
+                 + 'Съешь же ещё этих мягких французских булок. ' * 20
+                 + '</p></body></html>')
+
+
+@pytest.mark.parametrize('bom, expected', [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+])
+def test_bom_wins_over_everything(bom, expected):
+    head = bom + b'<meta charset="koi8-r">'
+    assert detect_encoding('text/html; charset=cp1251', head) == \
+        (expected, BOM_METHOD)
+
+
+def test_header_charset():
+    head = b'<meta charset="koi8-r">'
+    assert detect_encoding('text/html; charset="Windows-1251"', head) == \
+        ('cp1251', HEADER_METHOD)
+
+
+def test_unknown_header_charset_falls_through_to_meta():
+    head = b'<head><meta charset="koi8-r"></head>'
+    assert detect_encoding('text/html; charset=bogus', head) == \
+        ('koi8-r', META_METHOD)
+
+
+def test_http_equiv_meta():
+    head = (b'<meta http-equiv="Content-Type" '
+            b'content="text/html; charset=iso-8859-5">')
+    assert detect_encoding('text/html', head) == \
+        ('iso8859-5', META_METHOD)
+
+
+def test_meta_beyond_sniff_size_is_ignored():
+    head = b' ' * SNIFF_SIZE + b'<meta charset="koi8-r">'
+    assert detect_encoding(None, head) == (DEFAULT_ENCODING, DEFAULT_METHOD)
+
+
+def test_ascii_defaults_without_detector(monkeypatch):
+    def fail(sample):
+        raise AssertionError('detector must not run on ascii')
+
+    monkeypatch.setattr(
+        'page_loader.encoding.detect_encoding_statistically', fail)
+    assert detect_encoding('text/html', b'<html></html>') == \
+        (DEFAULT_ENCODING, DEFAULT_METHOD)
+
+
+def test_detector_is_last_resort():
+    head = CYRILLIC_PAGE.encode('cp1251')
+    encoding, method = detect_encoding('text/html', head)
+
+    assert method == DETECTOR_METHOD
+    assert head.decode(encoding) == CYRILLIC_PAGE
@@ -0,0 +1,140 @@
+import io
+import os
+from collections import Counter
+
+import pytest
+
+from page_loader import download_with_metrics
+from page_loader.events import (
+    ASSET_DONE,
+    ASSET_FAILED,
+    ASSET_PROGRESS,
+    ASSET_QUEUED,
+    ASSET_STARTED,
+    PAGE_FETCHED,
+    PAGE_SAVED,
+    Event,
+    EventEmitter,
+)
+from page_loader.progress import ProgressRenderer
+
+from .fixtures.fixtures import ASSETS, CONTENT_FILE, URL
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_emits_events(filename, streaming, setup_mocking,
+                               temp_directory):
+    events = []
+    with setup_mocking as m, temp_directory as temp_dir:
+        m.get(ASSETS[0]['url'], status_code=404)
+        _, metrics = download_with_metrics(
+            URL, path=temp_dir, streaming=streaming, on_event=events.append)
+
+    counts = Counter(event.type for event in events)
+    assets = len(metrics.assets)
+    assert counts[ASSET_QUEUED] == counts[ASSET_STARTED] == assets
+    assert counts[ASSET_DONE] == assets - 1
+    assert counts[ASSET_FAILED] == 1
+    assert counts[PAGE_FETCHED] == counts[PAGE_SAVED] == 1
+    assert all(event.page_url == URL for event in events)
+
+    failed, = [event for event in events if event.type == ASSET_FAILED]
+    assert failed.url == ASSETS[0]['url']
+    assert failed.error == 'Status code: 404'
+    progress = sum(event.size for event in events
+                   if event.type == ASSET_PROGRESS)
+    done = sum(event.size for event in events if event.type == ASSET_DONE)
+    assert progress == done == sum(asset.size for asset in metrics.assets)
+
+    assert events[-1].type == PAGE_SAVED
+    assert events[-1].path == os.path.join(temp_dir, CONTENT_FILE)
+
+
+def test_emitter_without_observers_creates_no_events(monkeypatch):
+    emitter = EventEmitter(URL, [None])
+    monkeypatch.setattr('page_loader.events.Event', None)
+
+    assert not emitter
+    emitter.emit(PAGE_FETCHED, URL, size=1)
+
+
+def test_observers_can_subscribe_and_unsubscribe():
+    events = []
+    emitter = EventEmitter(URL)
+    emitter.subscribe(events.append)
+    emitter.emit(PAGE_FETCHED, URL, size=1)
+    emitter.unsubscribe(events.append)
+    emitter.emit(PAGE_SAVED, URL)
+
+    assert [event.type for event in events] == [PAGE_FETCHED]
+
+
+def test_renderer_throttles_redraws():
+    stream = io.StringIO()
+    clock = Clock()
+    renderer = ProgressRenderer(stream, clock=clock)
+
+    assert renderer.interval == 5.0
+    for url in ('a.css', 'b.css'):
+        renderer(Event(ASSET_QUEUED, URL, url))
+    renderer(Event(ASSET_PROGRESS, URL, 'a.css', size=2048))
+    clock.now = 1.0
+    renderer(Event(ASSET_DONE, URL, 'a.css', size=2048))
+    assert stream.getvalue().count('\n') == 1
+
+    clock.now = 6.0
+    renderer(Event(ASSET_FAILED, URL, 'b.css', error='timed out'))
+    renderer.close()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 3
+    assert lines[0] == 'Downloading: 0/1 assets, 0 B'
+    assert lines[-1] == \
+        'Downloading: 2/2 assets (1 failed), 2.0 KiB, 341 B/s'
+
+
+def test_renderer_estimates_time_left():
+    stream = io.StringIO()
+    clock = Clock()
+    renderer = ProgressRenderer(stream, interval=0, clock=clock)
+
+    for url in ('a.css', 'b.css', 'c.css'):
+        renderer(Event(ASSET_QUEUED, URL, url))
+    clock.now = 10.0
+    renderer(Event(ASSET_DONE, URL, 'a.css'))
+
+    assert stream.getvalue().splitlines()[-1].endswith('ETA 00:20')
+
+
+@pytest.mark.parametrize('total, eta', [
+    # From the bytes left of the video
+    (100 * 1024 * 1024, 'ETA 00:09'),
+    # Unknown size: from the assets left
+    (None, 'ETA 00:00'),
+])
+def test_renderer_estimates_time_left_from_bytes(total, eta):
+    stream = io.StringIO()
+    clock = Clock()
+    renderer = ProgressRenderer(stream, interval=0, clock=clock)
+    icons = [f'{index}.png' for index in range(9)]
+
+    for url in ['video.mp4', *icons]:
+        renderer(Event(ASSET_QUEUED, URL, url))
+        renderer(Event(ASSET_STARTED, URL, url))
+    for url in icons:
+        renderer(Event(ASSET_PROGRESS, URL, url, size=1024, total=1024))
+        renderer(Event(ASSET_DONE, URL, url, size=1024))
+    clock.now = 1.0
+    renderer(Event(ASSET_PROGRESS, URL, 'video.mp4',
+                   size=10 * 1024 * 1024, total=total))
+
+    assert stream.getvalue().splitlines()[-1].endswith(eta)
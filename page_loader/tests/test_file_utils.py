@@ -0,0 +1,28 @@
+import pytest
+
+from page_loader.file_utils import atomic_write
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    path = tmp_path / 'page.html'
+    path.write_text('old')
+
+    with atomic_write(str(path), encoding='utf-8') as f:
+        f.write('new')
+        assert path.read_text() == 'old'
+
+    assert path.read_text() == 'new'
+    assert [p.name for p in tmp_path.iterdir()] == ['page.html']
+
+
+def test_failed_atomic_write_keeps_file(tmp_path):
+    path = tmp_path / 'page.html'
+    path.write_text('old')
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path), encoding='utf-8') as f:
+            f.write('partial')
+            raise RuntimeError
+
+    assert path.read_text() == 'old'
+    assert [p.name for p in tmp_path.iterdir()] == ['page.html']
@@ -0,0 +1,153 @@
+import gc
+import os
+import warnings
+
+import pytest
+import requests_mock
+
+from page_loader.http_cache import HttpCache
+from page_loader.http_client import HttpClient
+from page_loader.metrics import DownloadMetrics
+
+ASSET_URL = 'https://ru.hexlet.io/assets/application.css'
+CONTENT = b'* { margin: 0; }'
+
+
+def fetch(client, url=ASSET_URL):
+    with client.get(url) as response:
+        return response.status_code, client.read_content(response)
+
+
+def test_fresh_entry_is_served_without_request(tmp_path):
+    client = HttpClient(cache=HttpCache(str(tmp_path)))
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=CONTENT,
+              headers={'Cache-Control': 'max-age=3600'})
+        assert fetch(client) == (200, CONTENT)
+        assert fetch(client) == (200, CONTENT)
+
+    assert m.call_count == 1
+
+
+def test_cache_hits_are_counted(tmp_path):
+    client = HttpClient(cache=HttpCache(str(tmp_path)))
+    metrics = DownloadMetrics()
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=CONTENT,
+              headers={'Cache-Control': 'max-age=3600'})
+        for _ in range(2):
+            with client.get(ASSET_URL) as response:
+                metrics.record_response(response)
+                metrics.record_bytes(
+                    response, len(client.read_content(response)))
+
+    assert (metrics.requests, metrics.cache_hits) == (1, 1)
+    assert metrics.bytes_downloaded == metrics.bytes_from_cache == \
+        len(CONTENT)
+
+
+def test_stale_entry_is_revalidated(tmp_path):
+    client = HttpClient(cache=HttpCache(str(tmp_path)))
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=CONTENT, headers={
+            'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Sep 2025 10:00:00 GMT'})
+        assert fetch(client) == (200, CONTENT)
+
+        m.get(ASSET_URL, status_code=304)
+        assert fetch(client) == (200, CONTENT)
+
+    revalidation = m.request_history[-1]
+    assert revalidation.headers['If-None-Match'] == '"v1"'
+    assert revalidation.headers['If-Modified-Since'] == \
+        'Mon, 01 Sep 2025 10:00:00 GMT'
+
+
+def test_changed_entry_is_replaced(tmp_path):
+    client = HttpClient(cache=HttpCache(str(tmp_path)))
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=CONTENT, headers={'ETag': '"v1"'})
+        fetch(client)
+        m.get(ASSET_URL, content=b'new content', headers={'ETag': '"v2"'})
+        assert fetch(client) == (200, b'new content')
+
+        m.get(ASSET_URL, status_code=304)
+        assert fetch(client) == (200, b'new content')
+
+
+def test_no_store_response_is_not_cached(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    client = HttpClient(cache=cache)
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=CONTENT,
+              headers={'ETag': '"v1"', 'Cache-Control': 'no-store'})
+        fetch(client)
+
+    assert cache.lookup(ASSET_URL) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = HttpCache(str(tmp_path), max_size=2 * len(CONTENT))
+    client = HttpClient(cache=cache)
+    urls = [f'https://ru.hexlet.io/assets/{i}.css' for i in range(3)]
+
+    with requests_mock.Mocker() as m:
+        for i, url in enumerate(urls):
+            m.get(url, content=CONTENT, headers={'ETag': f'"{i}"'})
+            fetch(client, url)
+
+    assert cache.lookup(urls[0]) is None
+    assert cache.lookup(urls[1]) is not None
+    assert cache.lookup(urls[2]) is not None
+    assert cache.total_size == 2 * len(CONTENT)
+
+
+def test_cache_dir_is_scanned_once(tmp_path, monkeypatch):
+    urls = [f'https://ru.hexlet.io/assets/{i}.css' for i in range(3)]
+    with requests_mock.Mocker() as m:
+        client = HttpClient(cache=HttpCache(str(tmp_path)))
+        for i, url in enumerate(urls[:2]):
+            m.get(url, content=CONTENT, headers={'ETag': f'"{i}"'})
+            fetch(client, url)
+            # Make the access order explicit regardless of timer resolution
+            entry = client.cache.lookup(url)
+            os.utime(client.cache.meta_path(entry.key), (i, i))
+
+        # A new cache picks up the entries and their order from the disk
+        cache = HttpCache(str(tmp_path), max_size=2 * len(CONTENT))
+        assert cache.total_size == 2 * len(CONTENT)
+
+        def fail(path):
+            raise AssertionError('cache dir scanned on store')
+
+        monkeypatch.setattr(os, 'listdir', fail)
+        m.get(urls[2], content=CONTENT, headers={'ETag': '"2"'})
+        fetch(HttpClient(cache=cache), urls[2])
+
+    assert cache.lookup(urls[0]) is None
+    assert cache.lookup(urls[1]) is not None
+    assert cache.lookup(urls[2]) is not None
+
+
+@pytest.mark.filterwarnings('error::ResourceWarning')
+def test_cache_hits_close_their_files(tmp_path):
+    client = HttpClient(cache=HttpCache(str(tmp_path)))
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=CONTENT,
+              headers={'Cache-Control': 'max-age=3600'})
+        fetch(client)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', ResourceWarning)
+            # Read without closing the response, then closed unread
+            response = client.get(ASSET_URL)
+            assert client.read_content(response) == CONTENT
+            client.get(ASSET_URL).close()
+            del response
+            gc.collect()
+
+    assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
@@ -0,0 +1,119 @@
+import os
+import time
+
+import pytest
+import requests
+import requests_mock
+
+from page_loader.exceptions.network_exceptions import DeadlineExceeded
+from page_loader.http_client import HttpClient, backoff_delay
+
+ASSET_URL = 'https://ru.hexlet.io/assets/video.mp4'
+
+
+def test_save_content_streams_body_in_chunks(tmp_path):
+    content = os.urandom(10 * 1024 + 17)
+    client = HttpClient({'chunk_size': 1024})
+    save_path = tmp_path / 'video.mp4'
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=content)
+        with client.get(ASSET_URL) as response:
+            chunks = list(client.iter_content(response))
+
+        with client.get(ASSET_URL) as response:
+            size = client.save_content(response, save_path)
+
+    assert max(len(chunk) for chunk in chunks) <= 1024
+    assert b''.join(chunks) == content
+    assert size == len(content)
+    assert save_path.read_bytes() == content
+
+
+def test_read_content():
+    client = HttpClient()
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=b'page content')
+        with client.get(ASSET_URL) as response:
+            assert client.read_content(response) == b'page content'
+
+
+def test_request_timeouts_are_configurable():
+    client = HttpClient({'connect_timeout': 2, 'read_timeout': 5})
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=b'')
+        client.get(ASSET_URL).close()
+
+    assert m.request_history[0].timeout == (2, 5)
+
+
+def test_connection_errors_are_retried():
+    client = HttpClient({'retries': 2})
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, [
+            {'exc': requests.exceptions.ConnectTimeout},
+            {'status_code': 503},
+            {'content': b'video'},
+        ])
+        with client.get(ASSET_URL) as response:
+            assert client.read_content(response) == b'video'
+
+    assert response.attempts == m.call_count == 3
+
+
+@pytest.mark.parametrize('status_code', [503, 500, 404])
+def test_last_response_is_returned_when_retries_run_out(status_code):
+    client = HttpClient({'retries': 2})
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, status_code=status_code)
+        with client.get(ASSET_URL) as response:
+            assert response.status_code == status_code
+
+    # Only the retry statuses are retried: a plain 500 is not transient
+    assert m.call_count == (3 if status_code == 503 else 1)
+
+
+def test_retried_errors_are_raised_when_retries_run_out():
+    client = HttpClient({'retries': 1})
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, exc=requests.exceptions.ConnectionError)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.get(ASSET_URL)
+
+    assert m.call_count == 2
+
+
+def test_expired_deadline_sends_no_request():
+    client = HttpClient()
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=b'video')
+        with pytest.raises(DeadlineExceeded):
+            client.get(ASSET_URL, deadline=time.monotonic())
+
+    assert not m.called
+
+
+def test_deadline_bounds_the_timeouts():
+    client = HttpClient({'connect_timeout': 10, 'read_timeout': 30})
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=b'video')
+        client.get(ASSET_URL, deadline=time.monotonic() + 1).close()
+
+    connect_timeout, read_timeout = m.request_history[0].timeout
+    assert 0 < connect_timeout <= 1 and 0 < read_timeout <= 1
+
+
+def test_backoff_delay_is_jittered_exponential():
+    delays = [backoff_delay(attempt, 0.5, 3) for attempt in range(6)
+              for _ in range(20)]
+
+    assert all(0 <= delay <= 3 for delay in delays)
+    assert all(0 <= backoff_delay(0, 0.5, 3) <= 0.5 for _ in range(20))
+    assert len(set(delays)) > 1
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import page_loader
+from page_loader.__version__ import __version__
+
+ROOT_DIR = os.path.dirname(os.path.dirname(page_loader.__file__))
+# Loaded once a download starts, never for --version or usage errors
+HEAVY_MODULES = ('requests', 'urllib3', 'bs4', 'lxml', 'dotenv')
+# Microseconds the page_loader modules may take to import, about ten
+# times what they take
+IMPORT_TIME_BUDGET = 50_000
+
+
+def import_times(*args):
+    """
+    Run python -X importtime with args and return the output and the
+    import time of every module imported, in microseconds by name
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        capture_output=True, text=True, env=env, cwd=ROOT_DIR)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(self_time)
+    return process, times
+
+
+@pytest.mark.parametrize('args, output', [
+    (['--version'], f'Page downloader {__version__}'),
+    ([], 'at least one url is required'),
+])
+def test_cli_starts_without_heavy_imports(args, output):
+    process, times = import_times('-m', 'page_loader.scripts.main', *args)
+
+    assert output in process.stdout + process.stderr
+    assert not [name for name in times
+                if name.split('.')[0] in HEAVY_MODULES]
+
+
+def test_cli_import_time_budget():
+    _, times = import_times('-c', 'import page_loader.scripts.main')
+
+    own_time = sum(time for name, time in times.items()
+                   if name.split('.')[0] == 'page_loader')
+    assert 0 < own_time < IMPORT_TIME_BUDGET
+
+
+def test_package_exports_load_on_first_access():
+    process, times = import_times(
+        '-c', 'import page_loader.mirroring, page_loader; '
+              'print(page_loader.mirror.__name__, page_loader.download)')
+
+    assert process.stdout.startswith('mirror <function download')
+    assert 'bs4' in times
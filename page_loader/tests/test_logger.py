@@ -0,0 +1,54 @@
+import logging
+
+from page_loader.logger import Logger, PageFileHandler, get_logging_setup
+
+
+class Rendered:
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return 'rendered'
+
+
+def test_handlers_are_added_once():
+    logger = logging.getLogger('page_loader.logger')
+    Logger('first.html')
+    handlers = list(logger.handlers)
+    Logger('second.html')
+
+    assert logger.handlers == handlers
+    assert get_logging_setup() is get_logging_setup()
+
+
+def test_messages_are_formatted_only_if_logged():
+    logger = Logger('page.html')
+    argument = Rendered()
+    level = logging.getLogger('page_loader.logger').level
+    try:
+        logging.getLogger('page_loader.logger').setLevel(logging.INFO)
+        logger.debug('Asset: %s', argument)
+    finally:
+        logging.getLogger('page_loader.logger').setLevel(level)
+
+    assert argument.count == 0
+
+
+def test_records_are_written_to_their_download_file(tmp_path):
+    handler = PageFileHandler()
+    first_path = str(tmp_path / 'logs' / 'first.log')
+    second_path = str(tmp_path / 'logs' / 'second.log')
+
+    for path, message in [(first_path, 'first %s'), (second_path, 'second %s'),
+                          (first_path, 'third %s')]:
+        handler.handle(logging.makeLogRecord(
+            {'msg': message, 'args': ('page',), 'log_path': path}))
+    handler.handle(logging.makeLogRecord(
+        {'log_path': first_path, 'close_log_file': True}))
+    handler.close()
+
+    with open(first_path) as f:
+        assert f.read() == 'first page\nthird page\n'
+    with open(second_path) as f:
+        assert f.read() == 'second page\n'
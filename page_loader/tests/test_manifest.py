@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+
+import pytest
+import requests_mock
+
+import page_loader
+
+PAGE_URL = 'https://site.io/blog'
+PAGE_FILE = 'site-io-blog.html'
+MANIFEST_FILE = 'site-io-blog_manifest.json'
+LOGO_FILE = os.path.join('site-io-blog_files', 'site-io-logo.png')
+PAGE = '''<html><head><link rel="stylesheet" href="/app.css"></head>
+<body><img src="/logo.png"></body></html>'''
+PAGE_WITHOUT_LOGO = '''<html><head><link rel="stylesheet" href="/app.css">
+</head><body></body></html>'''
+PAST = 1_000_000_000
+
+
+class Site:
+    """
+    Mocked site answering conditional requests with 304 while the
+    content of a url is unchanged
+    """
+
+    def __init__(self, mocker):
+        self.mocker = mocker
+        self.contents = {
+            PAGE_URL: PAGE.encode(),
+            'https://site.io/app.css': b'body { margin: 0; }',
+            'https://site.io/logo.png': b'\x89PNG logo',
+        }
+        for url in self.contents:
+            mocker.get(url, content=self.respond)
+
+    def respond(self, request, context):
+        content = self.contents[request.url]
+        etag = f'"{hashlib.sha256(content).hexdigest()[:16]}"'
+        context.headers['ETag'] = etag
+        if request.headers.get('If-None-Match') == etag:
+            context.status_code = 304
+            return b''
+        return content
+
+    def conditional_requests(self, since=0):
+        return [request.url
+                for request in self.mocker.request_history[since:]
+                if 'If-None-Match' in request.headers]
+
+
+@pytest.fixture
+def site():
+    with requests_mock.Mocker() as m:
+        yield Site(m)
+
+
+def set_past_mtime(path):
+    os.utime(path, (PAST, PAST))
+
+
+def test_manifest_records_page_and_assets(download, site, tmp_path):
+    download(PAGE_URL, path=str(tmp_path))
+
+    with open(tmp_path / MANIFEST_FILE) as f:
+        manifest = json.load(f)
+    assert manifest['page']['path'] == PAGE_FILE
+    assert manifest['page']['size'] == os.path.getsize(tmp_path / PAGE_FILE)
+    logo = {record['url']: record for record in manifest['assets']}[
+        'https://site.io/logo.png']
+    assert logo['path'] == LOGO_FILE
+    assert logo['size'] == len(site.contents['https://site.io/logo.png'])
+    assert logo['sha256'] == hashlib.sha256(
+        site.contents['https://site.io/logo.png']).hexdigest()
+    assert logo['etag']
+
+
+def test_unchanged_page_is_only_revalidated(download, site, tmp_path):
+    download(PAGE_URL, path=str(tmp_path))
+    set_past_mtime(tmp_path / PAGE_FILE)
+    set_past_mtime(tmp_path / LOGO_FILE)
+    first_run_requests = site.mocker.call_count
+
+    download(PAGE_URL, path=str(tmp_path))
+
+    assert sorted(site.conditional_requests(first_run_requests)) == sorted(
+        site.contents)
+    assert os.path.getmtime(tmp_path / PAGE_FILE) == PAST
+    assert os.path.getmtime(tmp_path / LOGO_FILE) == PAST
+
+
+def test_changed_asset_is_downloaded_again(download, site, tmp_path):
+    download(PAGE_URL, path=str(tmp_path))
+    set_past_mtime(tmp_path / PAGE_FILE)
+    site.contents['https://site.io/logo.png'] = b'\x89PNG new logo'
+
+    download(PAGE_URL, path=str(tmp_path))
+
+    with open(tmp_path / LOGO_FILE, 'rb') as f:
+        assert f.read() == b'\x89PNG new logo'
+    assert os.path.getmtime(tmp_path / PAGE_FILE) == PAST
+
+
+def test_corrupted_asset_is_downloaded_again(download, site, tmp_path):
+    download(PAGE_URL, path=str(tmp_path))
+    # Same size, different content
+    with open(tmp_path / LOGO_FILE, 'r+b') as f:
+        f.write(b'X')
+    first_run_requests = site.mocker.call_count
+
+    download(PAGE_URL, path=str(tmp_path))
+
+    with open(tmp_path / LOGO_FILE, 'rb') as f:
+        assert f.read() == site.contents['https://site.io/logo.png']
+    assert 'https://site.io/logo.png' not in \
+        site.conditional_requests(first_run_requests)
+
+
+def test_changed_page_drops_stale_assets(download, site, tmp_path):
+    download(PAGE_URL, path=str(tmp_path))
+    site.contents[PAGE_URL] = PAGE_WITHOUT_LOGO.encode()
+
+    download(PAGE_URL, path=str(tmp_path))
+
+    assert not os.path.exists(tmp_path / LOGO_FILE)
+    with open(tmp_path / MANIFEST_FILE) as f:
+        manifest = json.load(f)
+    assert [record['url'] for record in manifest['assets']] == [
+        'https://site.io/app.css']
+
+
+def test_cache_busted_asset_is_kept(download, site, tmp_path):
+    busted_page = PAGE.replace('/app.css', '/app.css?v={}')
+    for version in (1, 2):
+        url = f'https://site.io/app.css?v={version}'
+        site.contents[url] = f'body {{ margin: {version}px; }}'.encode()
+        site.mocker.get(url, content=site.respond)
+    site.contents[PAGE_URL] = busted_page.format(1).encode()
+    download(PAGE_URL, path=str(tmp_path))
+    site.contents[PAGE_URL] = busted_page.format(2).encode()
+
+    download(PAGE_URL, path=str(tmp_path))
+
+    # Both versions are saved to the same file, which stays
+    css_file = tmp_path / 'site-io-blog_files' / 'site-io-app.css'
+    with open(css_file, 'rb') as f:
+        assert f.read() == b'body { margin: 2px; }'
+    with open(tmp_path / PAGE_FILE) as f:
+        assert 'site-io-blog_files/site-io-app.css' in f.read()
+
+
+def test_same_html_is_not_rewritten(site, tmp_path):
+    page_loader.download(PAGE_URL, path=str(tmp_path))
+    set_past_mtime(tmp_path / PAGE_FILE)
+    # Changes nothing in the parse tree: the saved html stays the same
+    site.contents[PAGE_URL] = PAGE.replace('<img', '<img ').encode()
+
+    page_loader.download(PAGE_URL, path=str(tmp_path))
+
+    assert os.path.getmtime(tmp_path / PAGE_FILE) == PAST
+
+
+def test_full_download_ignores_manifest(site, tmp_path):
+    page_loader.download(PAGE_URL, path=str(tmp_path))
+    first_run_requests = site.mocker.call_count
+
+    page_loader.download(PAGE_URL, path=str(tmp_path), incremental=False)
+
+    assert site.mocker.call_count == 2 * first_run_requests
+    assert not site.conditional_requests(first_run_requests)
+    assert os.path.exists(tmp_path / MANIFEST_FILE)
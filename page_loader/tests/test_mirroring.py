@@ -0,0 +1,93 @@
+import os
+
+import pytest
+import requests_mock
+
+from page_loader import mirror
+
+PAGES = {
+    'https://site.io/': '''
+        <html><body>
+          <a href="/about">About</a>
+          <a href="docs/intro.html#start">Intro</a>
+          <a href="https://external.net/page">External</a>
+          <a href="/files/report.pdf">Report</a>
+        </body></html>''',
+    'https://site.io/about': '''
+        <html><body>
+          <a href="/">Home</a>
+          <a href="/team">Team</a>
+        </body></html>''',
+    'https://site.io/docs/intro.html': '<html><body>Intro</body></html>',
+    'https://site.io/team': '<html><body>Team</body></html>',
+}
+
+
+@pytest.fixture
+def site_mocking():
+    with requests_mock.Mocker() as m:
+        for url, content in PAGES.items():
+            m.get(url, text=content)
+        yield m
+
+
+def read(temp_dir, filename):
+    with open(os.path.join(temp_dir, filename)) as f:
+        return f.read()
+
+
+def test_mirror_follows_same_host_links(site_mocking, tmp_path):
+    results = mirror('https://site.io/', path=str(tmp_path), depth=1)
+
+    assert sorted(result.url for result in results) == [
+        'https://site.io/',
+        'https://site.io/about',
+        'https://site.io/docs/intro.html',
+    ]
+    assert all(result.ok for result in results)
+
+    home = read(tmp_path, 'site-io.html')
+    assert 'href="site-io-about.html"' in home
+    assert 'href="site-io-docs-intro.html#start"' in home
+    assert 'href="https://external.net/page"' in home
+    assert 'href="/files/report.pdf"' in home
+
+    about = read(tmp_path, 'site-io-about.html')
+    assert 'href="site-io.html"' in about
+    # Pages beyond the crawl depth keep their original links
+    assert 'href="/team"' in about
+    assert not os.path.exists(os.path.join(tmp_path, 'site-io-team.html'))
+
+
+def test_mirror_respects_page_budget(site_mocking, tmp_path):
+    results = mirror(
+        'https://site.io/', path=str(tmp_path), depth=2, max_pages=2)
+
+    assert [result.url for result in results] == [
+        'https://site.io/', 'https://site.io/about']
+    requested_urls = [request.url for request in site_mocking.request_history]
+    assert len(requested_urls) == len(set(requested_urls))
+
+
+def test_mirror_normalizes_hosts(tmp_path):
+    with requests_mock.Mocker() as m:
+        m.get('https://site.io/',
+              text='<a href="HTTPS://Site.IO:443/about">About</a>')
+        m.get('https://site.io/about', text='<html><body></body></html>')
+        results = mirror('https://site.io/', path=str(tmp_path), depth=1)
+
+    assert len(results) == 2 and all(result.ok for result in results)
+    assert 'href="site-io-about.html"' in read(tmp_path, 'site-io.html')
+
+
+@pytest.mark.parametrize('preserve_source', [False, True])
+def test_mirror_links_failed_pages_to_their_urls(site_mocking, tmp_path,
+                                                 preserve_source):
+    site_mocking.get('https://site.io/about', status_code=404)
+    results = mirror('https://site.io/', path=str(tmp_path), depth=1,
+                     preserve_source=preserve_source)
+
+    assert [result.ok for result in results] == [True, False, True]
+    home = read(tmp_path, 'site-io.html')
+    assert 'href="https://site.io/about"' in home
+    assert 'href="site-io-docs-intro.html#start"' in home
@@ -1,11 +1,24 @@
+import json
 import os
 import stat
+import tempfile
 
 import pytest
+import requests
+import requests_mock
 
-from page_loader import download
+from page_loader import download_many, download_with_metrics
+from page_loader.download_manager import DownloadManager
 from page_loader.exceptions.io_exceptions import DirectoryError, SaveError
 from page_loader.exceptions.network_exceptions import HttpError, RequestError
+from page_loader.metrics import (
+    ASSET_DISCOVERY,
+    ASSET_DOWNLOAD,
+    PAGE_FETCH,
+    PARSE,
+    SERIALIZE,
+    WRITE,
+)
 
 from .fixtures.fixtures import (
     ASSETS,
@@ -20,8 +33,8 @@ from .fixtures.fixtures import (
 # Test the download of HTML content
 @pytest.mark.parametrize(
     'filename', ['retrieved.html'])
-def test_download_html(
-        filename, expected_content, setup_mocking, temp_directory):
+def test_download_html(download, filename, expected_content,
+                       setup_mocking, temp_directory):
     with setup_mocking, temp_directory as temp_dir:
         result_path = download(URL, path=temp_dir)
 
@@ -41,7 +54,7 @@ def test_download_html(
 
 # Test the download of assets and ensure proper link transformation
 @pytest.mark.parametrize('filename', ['retrieved.html'])
-def test_download_assets(filename, setup_mocking, temp_directory):
+def test_download_assets(download, filename, setup_mocking, temp_directory):
     with setup_mocking, temp_directory as temp_dir:
         download(URL, path=temp_dir)
         assets_dir_path = os.path.join(temp_dir, ASSETS_DIR)
@@ -83,9 +96,81 @@ def test_download_assets(filename, setup_mocking, temp_directory):
             "External image files should not be saved"
 
 
-@pytest.mark.parametrize('filename', ['retrieved_without_assets.html'])
+# Test that only the rewritten links differ from the original page bytes
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_preserving_source(
+        download, filename, retrieved_content, setup_mocking, temp_directory):
+    with setup_mocking, temp_directory as temp_dir:
+        result_path = download(URL, path=temp_dir, preserve_source=True)
+        with open(result_path, encoding='utf-8', newline='') as f:
+            html_content = f.read()
+
+    # Original link attribute values in retrieved.html -> asset index
+    rewritten_links = {
+        '"/assets/application.css"': 3,
+        '"/courses"': 6,
+        '"blog/about"': 7,
+        '"/assets/professions/python.png"': 0,
+        "'assets/professions/python.jpg'": 1,
+        "'https://ru.hexlet.io/courses/assets/professions/python.bmp'": 2,
+        '"https://ru.hexlet.io/packs/js/runtime.js"': 4,
+        '"/packs/js/script.js"': 5,
+    }
+    expected_content = retrieved_content
+    for original_link, asset_index in rewritten_links.items():
+        local_link = os.path.join(ASSETS_DIR, ASSETS[asset_index]['path'])
+        expected_content = expected_content.replace(
+            original_link, f'"{local_link}"')
+
+    assert html_content == expected_content
+
+
+# Test that streaming gives the same page bytes and assets as patching
+# the links into the original page source
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_streaming(download, filename, setup_mocking, tmp_path):
+    results = {}
+    with setup_mocking as m:
+        for mode in ('preserve_source', 'streaming'):
+            mode_dir = tmp_path / mode
+            mode_dir.mkdir()
+            result_path = download(URL, path=str(mode_dir), **{mode: True})
+            with open(result_path, 'rb') as f:
+                results[mode] = (
+                    f.read(), sorted(os.listdir(mode_dir / ASSETS_DIR)))
+
+        asset_urls = [request.url for request in m.request_history
+                      if request.url != URL]
+
+    assert results['streaming'] == results['preserve_source']
+    assert len(asset_urls) == 2 * len(set(asset_urls)), \
+        "Every asset should be requested once per download"
+
+
+# Test that concurrent asset downloads give the same result as serial ones
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+@pytest.mark.parametrize('workers', [2, 8])
+def test_download_assets_concurrently(
+        download, filename, workers, setup_mocking, temp_directory):
+    with setup_mocking, temp_directory as serial_dir, \
+            tempfile.TemporaryDirectory() as concurrent_dir:
+        serial_path = download(URL, path=serial_dir)
+        concurrent_path = download(URL, path=concurrent_dir, workers=workers)
+
+        with open(serial_path) as serial, open(concurrent_path) as concurrent:
+            assert serial.read() == concurrent.read(), \
+                "Concurrent download should rewrite links deterministically"
+
+        assert sorted(os.listdir(os.path.join(serial_dir, ASSETS_DIR))) == \
+            sorted(os.listdir(os.path.join(concurrent_dir, ASSETS_DIR))), \
+            "Concurrent download should save the same assets"
+
+
+@pytest.mark.parametrize(
+    'filename', ['retrieved_without_assets.html',
+                 'retrieved_with_external_assets.html'])
 def test_download_html_without_assets_to_download(
-        filename, setup_mocking, temp_directory):
+        download, filename, setup_mocking, temp_directory):
     with setup_mocking, temp_directory as temp_dir:
         download(URL, path=temp_dir)
         assets_dir_path = os.path.join(temp_dir, ASSETS_DIR)
@@ -96,7 +181,7 @@ def test_download_html_without_assets_to_download(
 @pytest.mark.parametrize(
     'filename', ['retrieved.html', 'retrieved_without_assets.html'])
 def test_download_return_value_with_none_path(
-        filename, setup_mocking, cleanup_downloaded_files):
+        download, filename, setup_mocking, cleanup_downloaded_files):
     with setup_mocking:
         result_path = download(URL)
         assert os.path.isfile(result_path), \
@@ -109,7 +194,7 @@ def test_download_return_value_with_none_path(
 @pytest.mark.parametrize(
     'filename', ['retrieved.html', 'retrieved_without_assets.html'])
 def test_missing_destination_directory_issue(
-        filename, setup_mocking, temp_directory):
+        download, filename, setup_mocking, temp_directory):
     with setup_mocking, temp_directory as temp_dir:
         os.rmdir(temp_dir)
         with pytest.raises(DirectoryError) as e:
@@ -122,7 +207,8 @@ def test_missing_destination_directory_issue(
 # Test the processing of various HTTP error responses
 @pytest.mark.parametrize('status_code', HTTP_ERROR_CODES)
 def test_download_html_with_http_fail_response(
-        setup_mocking_http_fail_response, temp_directory, status_code):
+        download, setup_mocking_http_fail_response, temp_directory,
+        status_code):
 
     with setup_mocking_http_fail_response, temp_directory as temp_dir:
         with pytest.raises(HttpError) as e:
@@ -135,7 +221,7 @@ def test_download_html_with_http_fail_response(
 
 # Test the processing of RequestException during download
 def test_download_html_with_request_error(
-        setup_mocking_request_exception, temp_directory):
+        download, setup_mocking_request_exception, temp_directory):
 
     with setup_mocking_request_exception, temp_directory as temp_dir:
         with pytest.raises(RequestError) as e:
@@ -155,7 +241,8 @@ def test_download_html_with_request_error(
 # TODO: Or add other scenarios - for example, when there's no enough disk space
 @pytest.mark.parametrize(
     'filename', ['retrieved.html', 'retrieved_without_assets.html'])
-def test_save_error_permission_issue(filename, setup_mocking, temp_directory):
+def test_save_error_permission_issue(
+        download, filename, setup_mocking, temp_directory):
     with setup_mocking, temp_directory as temp_dir:
         html_path = os.path.join(temp_dir, CONTENT_FILE)
         with open(html_path, 'w'):
@@ -182,7 +269,7 @@ def test_save_error_permission_issue(filename, setup_mocking, temp_directory):
 @pytest.mark.parametrize(
     'filename', ['retrieved.html', 'retrieved_without_assets.html'])
 def test_save_error_permission_issue_on_directory(
-        filename, setup_mocking, tmp_path):
+        download, filename, setup_mocking, tmp_path):
     with setup_mocking:
         protected_dir = tmp_path / 'protected_dir'
         protected_dir.mkdir()
@@ -203,3 +290,166 @@ def test_save_error_permission_issue_on_directory(
             f'No files (except for {CONTENT_FILE}) should remain in '
             f'the destination directory if the download fails.'
         )
+
+
+# Test that the page and its assets are fetched with the configured headers
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_uses_configured_session_headers(
+        download, filename, setup_mocking, temp_directory):
+    with setup_mocking as m, temp_directory as temp_dir:
+        download(URL, path=temp_dir)
+
+        assert m.request_history, "Requests should be sent"
+        for request in m.request_history:
+            assert request.headers['User-Agent'].startswith('page-loader'), \
+                f"Request to {request.url} should use the session headers"
+
+
+# Test that an asset referenced by several tags is downloaded only once
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_duplicate_assets_once(
+        download, filename, setup_mocking, temp_directory):
+    with setup_mocking as m, temp_directory as temp_dir:
+        download(URL, path=temp_dir)
+
+        # The first request fetches the page itself
+        asset_urls = [request.url for request in m.request_history[1:]]
+        assert len(asset_urls) == len(set(asset_urls)), \
+            "Every asset should be requested only once"
+
+        with open(os.path.join(temp_dir, CONTENT_FILE)) as f:
+            html_content = f.read()
+        duplicate_link = os.path.join(ASSETS_DIR, CONTENT_FILE)
+        assert html_content.count(duplicate_link) == 2, \
+            "Every duplicate reference should link to the same local file"
+
+
+# Test that urls saved to the same file are downloaded only once
+@pytest.mark.parametrize('streaming', [False, True])
+def test_query_string_variants_are_downloaded_once(streaming, tmp_path):
+    page_url = 'https://site.io/blog'
+    page = ('<html><head>'
+            '<link rel="stylesheet" href="/app.css?v=1">'
+            '<link rel="stylesheet" href="/app.css?v=2">'
+            '</head><body></body></html>')
+    with requests_mock.Mocker() as m:
+        m.get(page_url, text=page)
+        m.get('https://site.io/app.css?v=1', text='v1')
+        m.get('https://site.io/app.css?v=2', text='v2')
+        _, metrics = download_with_metrics(
+            page_url, path=str(tmp_path), workers=4, streaming=streaming)
+
+    assert [request.url for request in m.request_history[1:]] == [
+        'https://site.io/app.css?v=1']
+    assert metrics.duplicates_skipped == 1
+    css_path = tmp_path / 'site-io-blog_files' / 'site-io-app.css'
+    assert css_path.read_text() == 'v1'
+    html = (tmp_path / 'site-io-blog.html').read_text()
+    assert html.count('site-io-blog_files/site-io-app.css') == 2
+
+
+# Test that the skipped duplicates are counted in the metrics
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+@pytest.mark.parametrize('streaming', [False, True])
+def test_duplicate_assets_are_counted(filename, streaming, setup_mocking,
+                                      temp_directory):
+    with setup_mocking, temp_directory as temp_dir:
+        _, metrics = download_with_metrics(
+            URL, path=temp_dir, streaming=streaming)
+
+    assert metrics.duplicates_skipped == 1
+    assert metrics.to_dict()['duplicates_skipped'] == 1
+    assert '1 duplicates skipped' in metrics.format()
+
+
+# Test that a batch download reports every page instead of stopping
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_many(filename, setup_mocking, temp_directory):
+    failed_url = 'https://ru.hexlet.io/missing'
+    with setup_mocking as m, temp_directory as temp_dir:
+        m.get(failed_url, status_code=404)
+        results = download_many([failed_url, URL], path=temp_dir, jobs=2)
+
+    assert [result.url for result in results] == [failed_url, URL]
+    assert not results[0].ok
+    assert isinstance(results[0].error, HttpError)
+    assert results[1].ok
+    assert results[1].path == os.path.join(temp_dir, CONTENT_FILE)
+
+
+# Test that the phases and transfers of a download are measured
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_with_metrics(filename, retrieved_content, setup_mocking,
+                               temp_directory):
+    with setup_mocking as m, temp_directory as temp_dir:
+        result_path, metrics = download_with_metrics(URL, path=temp_dir)
+
+        assert result_path == os.path.join(temp_dir, CONTENT_FILE)
+        assert metrics.requests == m.call_count
+        assert metrics.cache_hits == 0
+        # The first request fetches the page itself
+        assert sorted(asset.url for asset in metrics.assets) == \
+            sorted(request.url for request in m.request_history[1:])
+        for asset in metrics.assets:
+            assert asset.status_code == 200
+            assert not asset.from_cache
+        assert metrics.bytes_downloaded == \
+            len(retrieved_content.encode()) + \
+            sum(asset.size for asset in metrics.assets)
+
+    for phase in (PAGE_FETCH, PARSE, ASSET_DISCOVERY, ASSET_DOWNLOAD,
+                  SERIALIZE, WRITE):
+        assert metrics.phases[phase] > 0, f'{phase} should be timed'
+    assert metrics.elapsed_time >= metrics.phases[ASSET_DOWNLOAD]
+    assert json.loads(json.dumps(metrics.to_dict()))['url'] == URL
+
+
+# Test that failed assets are retried, then reported in the metrics
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_failed_assets_are_reported(filename, setup_mocking, temp_directory):
+    failing_url, timing_out_url = ASSETS[0]['url'], ASSETS[1]['url']
+    with setup_mocking as m, temp_directory as temp_dir:
+        m.get(failing_url, status_code=503)
+        m.get(timing_out_url, exc=requests.exceptions.ReadTimeout('timed out'))
+        result_path, metrics = download_with_metrics(URL, path=temp_dir)
+
+    assert result_path == os.path.join(temp_dir, CONTENT_FILE)
+    failed_assets = {asset.url: asset for asset in metrics.failed_assets}
+    assert set(failed_assets) == {failing_url, timing_out_url}
+    assert failed_assets[failing_url].error == 'Status code: 503'
+    assert failed_assets[failing_url].attempts == 3
+    assert 'timed out' in failed_assets[timing_out_url].error
+    assert metrics.retries == 2
+    assert 'failed: ' + failing_url in metrics.format()
+
+
+# Test that a download past its deadline sends no more requests
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_download_deadline(filename, setup_mocking, temp_directory):
+    with setup_mocking as m, temp_directory as temp_dir:
+        with pytest.raises(RequestError, match='Deadline exceeded'):
+            download_with_metrics(URL, path=temp_dir, deadline=1e-9)
+
+    assert not m.called
+
+
+# Test that listing the assets does not download or save anything
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_list_assets(filename, setup_mocking, temp_directory):
+    with setup_mocking as m, temp_directory as temp_dir:
+        asset_urls = DownloadManager(URL, temp_dir).list_assets()
+
+        assert m.call_count == 1, "Only the page should be requested"
+        assert not os.listdir(temp_dir), "No files should be saved"
+
+    # Assets are listed once each, in document order
+    assert asset_urls == [
+        'https://ru.hexlet.io/assets/application.css',
+        'https://ru.hexlet.io/courses',
+        'https://ru.hexlet.io/courses/blog/about',
+        'https://ru.hexlet.io/assets/professions/python.png',
+        'https://ru.hexlet.io/courses/assets/professions/python.jpg',
+        'https://ru.hexlet.io/courses/assets/professions/python.bmp',
+        'https://ru.hexlet.io/packs/js/runtime.js',
+        'https://ru.hexlet.io/packs/js/script.js',
+    ]
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from page_loader import download
+from page_loader.download_manager import load_settings
+from page_loader.exceptions.parser_exceptions import ParserNotFoundError
+from page_loader.parsers import (
+    AUTO_PARSERS,
+    PARSERS,
+    available_parsers,
+    is_available,
+    select_parser,
+)
+
+from .fixtures.fixtures import ASSETS_DIR, URL
+
+
+def rewritten_links(html):
+    asset_tags = load_settings()['asset_tags']
+    soup = BeautifulSoup(html, 'html.parser')
+    return [(tag.name, tag.get(asset_tags[tag.name]))
+            for tag in soup.find_all(list(asset_tags))]
+
+
+def test_select_parser():
+    assert select_parser('html.parser') == 'html.parser'
+    assert select_parser('auto') == next(
+        parser for parser in AUTO_PARSERS if is_available(parser))
+
+    with pytest.raises(ParserNotFoundError):
+        select_parser('unknown-parser')
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+@pytest.mark.parametrize('parser', PARSERS)
+def test_parsers_give_identical_results(
+        filename, parser, setup_mocking, tmp_path):
+    if not is_available(parser):
+        pytest.skip(f'{parser} is not installed')
+
+    results = {}
+    with setup_mocking:
+        for backend in {parser, 'html.parser'}:
+            backend_dir = tmp_path / backend.replace('.', '_')
+            backend_dir.mkdir()
+            result_path = download(URL, path=str(backend_dir), parser=backend)
+            with open(result_path) as f:
+                results[backend] = (
+                    rewritten_links(f.read()),
+                    sorted(os.listdir(backend_dir / ASSETS_DIR)),
+                )
+
+    assert results[parser] == results['html.parser'], \
+        f'{parser} should discover and rewrite the same assets'
+
+
+def test_available_parsers():
+    assert 'html.parser' in available_parsers()
@@ -0,0 +1,55 @@
+import os
+import pstats
+
+import pytest
+
+from page_loader import download, metrics
+from page_loader.profiling import Profiling
+
+from .fixtures.fixtures import URL
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_cpu_profile_is_written(filename, setup_mocking, temp_directory):
+    with setup_mocking, temp_directory as temp_dir:
+        with Profiling(temp_dir, cpu=True) as profiling:
+            download(URL, temp_dir, workers=2)
+
+        path, = profiling.paths
+        assert os.path.dirname(path) == temp_dir
+        assert path.endswith('.prof')
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+
+    # The asset workers are profiled too
+    assert {'download', '_download_asset'} <= functions
+
+
+@pytest.mark.parametrize('filename', ['retrieved.html'])
+def test_memory_report_is_written_per_phase(filename, setup_mocking,
+                                            temp_directory):
+    with setup_mocking, temp_directory as temp_dir:
+        with Profiling(temp_dir, memory=True) as profiling:
+            download(URL, temp_dir)
+
+        path, = profiling.paths
+        with open(path, encoding='utf-8') as f:
+            report = f.read()
+
+    assert metrics._phase_tracer is None
+    assert report.startswith('Peak traced memory: ')
+    for phase in (metrics.PARSE, metrics.ASSET_DISCOVERY,
+                  metrics.ASSET_DOWNLOAD, metrics.SERIALIZE):
+        assert f'\n{phase}: ' in report
+    assert 'Held at the end of the run:' in report
+
+
+def test_profiles_are_written_on_exit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit):
+        with Profiling(str(tmp_path / 'missing'), cpu=True) as profiling:
+            raise SystemExit(0)
+
+    # Next to the output, or in the current directory without it
+    path, = profiling.paths
+    assert os.path.dirname(path) == str(tmp_path)
+    assert os.path.getsize(path)
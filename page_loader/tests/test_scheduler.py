@@ -0,0 +1,117 @@
+import time
+
+import pytest
+import requests_mock
+
+from page_loader.exceptions.network_exceptions import DeadlineExceeded
+from page_loader.http_client import HttpClient
+from page_loader.scheduler import Scheduler, TokenBucket, parse_retry_after
+
+ASSET_URL = 'https://ru.hexlet.io/assets/application.css'
+OTHER_HOST_URL = 'https://cdn.hexlet.io/assets/application.css'
+
+
+def soon():
+    return time.monotonic() + 0.05
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('120', 120),
+    ('Thu, 01 Jan 1970 00:02:00 GMT', 20),
+    ('Thu, 01 Jan 1970 00:00:00 GMT', 0),
+    ('soon', None),
+    (None, None),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value, now=100) == expected
+
+
+def test_connections_are_capped_per_host():
+    scheduler = Scheduler({'max_connections': 2})
+    slots = [scheduler.acquire(ASSET_URL) for _ in range(2)]
+
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire(ASSET_URL, deadline=soon())
+    scheduler.acquire(OTHER_HOST_URL, deadline=soon())
+
+    slots[0].release()
+    # Releasing twice does not free another connection
+    slots[0].release()
+    scheduler.acquire(ASSET_URL, deadline=soon())
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire(ASSET_URL, deadline=soon())
+
+
+def test_host_settings_override_the_defaults():
+    scheduler = Scheduler({
+        'max_connections': 1,
+        'hosts': {'cdn.hexlet.io': {'max_connections': None}},
+    })
+
+    for _ in range(3):
+        scheduler.acquire(OTHER_HOST_URL, deadline=soon())
+    scheduler.acquire(ASSET_URL)
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire(ASSET_URL, deadline=soon())
+
+
+def test_token_bucket_allows_bursts_then_spaces_requests():
+    bucket = TokenBucket(rate=10, burst=2)
+
+    assert bucket.reserve() == bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+    assert bucket.reserve(deadline=time.monotonic() + 0.1) is None
+
+
+def test_deferred_host_is_held_back():
+    scheduler = Scheduler()
+    scheduler.defer(ASSET_URL, 60)
+
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire(ASSET_URL, deadline=soon())
+    scheduler.acquire(OTHER_HOST_URL, deadline=soon())
+
+
+def test_retry_after_is_honored():
+    client = HttpClient(scheduler=Scheduler())
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, [
+            {'status_code': 429, 'headers': {'Retry-After': '0'}},
+            {'content': b'* {}'},
+        ])
+        with client.get(ASSET_URL) as response:
+            assert client.read_content(response) == b'* {}'
+
+    assert response.attempts == 2
+
+
+def test_long_retry_after_is_not_waited_for():
+    client = HttpClient({'max_retry_after': 10}, scheduler=Scheduler())
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, status_code=503, headers={'Retry-After': '3600'})
+        with client.get(ASSET_URL) as response:
+            assert response.status_code == 503
+
+    assert m.call_count == 1
+    # The host stays held back, for at most max_retry_after
+    with pytest.raises(DeadlineExceeded):
+        client.get(ASSET_URL, deadline=soon())
+
+
+def test_connection_is_released_once_the_body_is_read():
+    client = HttpClient(scheduler=Scheduler({'max_connections': 1}))
+
+    with requests_mock.Mocker() as m:
+        m.get(ASSET_URL, content=b'* {}')
+        response = client.get(ASSET_URL)
+        with pytest.raises(DeadlineExceeded):
+            client.get(ASSET_URL, deadline=soon())
+
+        client.read_content(response)
+        client.get(ASSET_URL, deadline=soon()).close()
+        client.get(ASSET_URL, deadline=soon()).close()
+
+    response.close()
@@ -0,0 +1,57 @@
+from bs4 import BeautifulSoup
+
+from page_loader.source_patcher import SourcePatcher
+
+SOURCE = '''<html>
+  <head><LINK rel=stylesheet HREF=/app.css></head>
+  <body>
+    <img alt="a > b" src='/logo.png'><img src="/icon.png"/>
+    <script src = "/app.js" defer></script>
+  </body>
+</html>'''
+
+
+def patch_tags(source, tag_names, attr_names):
+    soup = BeautifulSoup(source, 'html.parser')
+    patcher = SourcePatcher(source)
+    results = [
+        patcher.patch(tag.sourceline, tag.sourcepos, attr_names[tag.name],
+                      f'local/{tag.name}')
+        for tag in soup.find_all(tag_names)
+    ]
+    return results, patcher.apply()
+
+
+def test_patch_only_rewritten_attributes():
+    results, patched = patch_tags(
+        SOURCE, ['link', 'img', 'script'],
+        {'link': 'href', 'img': 'src', 'script': 'src'})
+
+    assert all(results)
+    assert patched == SOURCE \
+        .replace('HREF=/app.css', 'HREF="local/link"') \
+        .replace("src='/logo.png'", 'src="local/img"') \
+        .replace('src="/icon.png"', 'src="local/img"') \
+        .replace('src = "/app.js"', 'src = "local/script"')
+
+
+def test_patch_escapes_values():
+    patcher = SourcePatcher('<a href="/x">x</a>')
+    assert patcher.patch(1, 0, 'href', 'a"b&c')
+    assert patcher.apply() == '<a href="a&quot;b&amp;c">x</a>'
+
+
+def test_patch_missing_attribute():
+    patcher = SourcePatcher('<img alt="src=/x.png">')
+    assert not patcher.patch(1, 0, 'src', 'local.png')
+    assert not patcher.patch(None, None, 'src', 'local.png')
+    assert patcher.apply() == '<img alt="src=/x.png">'
+
+
+def test_patch_checks_tag_name():
+    source = '<p><img src="/a.png"><script src="/a.js"></script></p>'
+    patcher = SourcePatcher(source)
+    # An offset off by one tag must not patch the other element
+    assert not patcher.patch(1, 3, 'src', 'local.js', 'script')
+    assert patcher.patch(1, 3, 'src', 'local.png', 'IMG')
+    assert patcher.apply() == source.replace('/a.png', 'local.png')
@@ -0,0 +1,78 @@
+import pytest
+import requests_mock
+
+from page_loader import PageLoader
+from page_loader.download_manager import load_settings
+from page_loader.streaming import StreamingRewriter
+
+from .fixtures.fixtures import current_file_directory
+
+PAGE_URL = 'https://site.io/blog'
+
+
+def rewrite(source, rewrite_tag, chunk_size):
+    output = []
+    rewriter = StreamingRewriter(rewrite_tag, output.append)
+    for i in range(0, len(source), chunk_size):
+        rewriter.feed(source[i:i + chunk_size])
+    rewriter.close()
+    return ''.join(output)
+
+
+def read_fixture(filename):
+    with open(f'{current_file_directory}/{filename}', newline='') as f:
+        return f.read()
+
+
+def test_streaming_rewriter_echoes_input():
+    source = read_fixture('retrieved.html') + (
+        '<!-- comment --><?pi?><script>if (a < b) {}</script>'
+        '&amp; &#123; <style>p > a {}</style></BODY >')
+
+    for chunk_size in (1, 7, 4096):
+        assert rewrite(source, lambda tag, attrs: None, chunk_size) == source
+
+
+def test_streaming_rewriter_patches_start_tags():
+    source = ("<p>text</p><img alt='x' src='/a.png'/>"
+              '<script src="/b.js"></script><img src=/a.png>')
+
+    def rewrite_tag(tag, attrs):
+        if tag in ('img', 'script'):
+            return 'src', f'local/{tag}'
+
+    assert rewrite(source, rewrite_tag, 5) == (
+        '<p>text</p><img alt=\'x\' src="local/img"/>'
+        '<script src="local/script"></script><img src="local/img">')
+
+
+# The rewriter echoes the input through the private HTMLParser.updatepos
+# hook: the streamed page must stay byte for byte the patched source
+@pytest.mark.parametrize('encoding', ['utf-8', 'cp1251'])
+def test_streamed_page_matches_patched_source(encoding, tmp_path):
+    page = ('<!DOCTYPE html>\r\n<html><head>\r\n'
+            '<title>Привет, мир</title>\r\n'
+            '<LINK rel=stylesheet HREF=/app.css>\r\n</head><body>\r\n'
+            '<p>Ёлки &amp; палки &#1025;</p>'
+            "<img alt='ж > з' src='/logo.png'/>\r\n"
+            '<script src = "/app.js" defer></script>\r\n'
+            '</body></html>\r\n').encode(encoding)
+    settings = dict(load_settings())
+    # Tags and multibyte characters split across chunks
+    settings['http'] = dict(settings['http'], chunk_size=7)
+    saved = []
+    with requests_mock.Mocker() as m:
+        m.get(PAGE_URL, content=page,
+              headers={'Content-Type': f'text/html; charset={encoding}'})
+        for asset in ('app.css', 'logo.png', 'app.js'):
+            m.get(f'https://site.io/{asset}', content=b'asset')
+        for options in ({'streaming': True}, {'preserve_source': True}):
+            path = tmp_path / str(len(saved))
+            path.mkdir()
+            with PageLoader(str(path), settings=settings, **options) as client:
+                with open(client.download(PAGE_URL), 'rb') as f:
+                    saved.append(f.read())
+
+    streamed, patched = saved
+    assert streamed == patched
+    assert b'site-io-blog_files' in streamed and b'\r\n' in streamed
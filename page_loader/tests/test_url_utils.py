@@ -1,5 +1,8 @@
 # tests/test_url_utils.py
+import pytest
+
 from page_loader.url_utils import (
+    ParsedUrl,
     base_url,
     dirname_for_web_assets,
     domain,
@@ -10,6 +13,8 @@ from page_loader.url_utils import (
     full_domain,
     full_url,
     is_absolute_path,
+    normalize_url,
+    parse_url,
     scheme,
 )
 
@@ -114,3 +119,56 @@ def test_extension():
 def test_is_absolute_path():
     assert is_absolute_path('/assets/professions/python.png')
     assert not is_absolute_path('assets/professions/python.png')
+
+
+def test_normalize_url():
+    assert (normalize_url('HTTPS://Lorem.Dot.NET:443/assets/Logo.png#top')
+            == 'https://lorem.dot.net/assets/Logo.png')
+    assert (normalize_url('http://lorem.dot.net:8080/a.js?v=1')
+            == 'http://lorem.dot.net:8080/a.js?v=1')
+    assert normalize_url('https://lorem.dot.net') == 'https://lorem.dot.net/'
+
+
+def test_parsed_url_host():
+    assert parse_url('HTTPS://Lorem.Dot.NET:443/site/').host == \
+        'lorem.dot.net'
+    assert parse_url('http://lorem.dot.net:8080/a.js').host == \
+        'lorem.dot.net:8080'
+
+
+@pytest.mark.parametrize('url', [
+    'https://lorem.dot.net/professions/assets/python.png',
+    'HTTPS://Lorem.Dot.NET:443/site/#top',
+    '/assets/professions/python.png',
+    'assets/application.css?v=2',
+])
+def test_parsed_url_matches_functions(url):
+    parsed_url = parse_url(url)
+
+    assert parsed_url.scheme == scheme(url)
+    assert parsed_url.netloc == domain(url)
+    assert parsed_url.extension == extension(url)
+    assert parsed_url.is_absolute_path == is_absolute_path(url)
+    assert parsed_url.local_filename == filename_from_full_url(url)
+    assert parsed_url.normalized == normalize_url(url)
+    if parsed_url.netloc:
+        assert parsed_url.full_domain == full_domain(url)
+
+
+def test_parse_url_is_memoized():
+    url = 'https://lorem.dot.net/assets/python.png'
+
+    assert parse_url(url) is parse_url(url)
+    assert parse_url(url) == ParsedUrl(url)
+    assert str(parse_url(url)) == url
+
+
+def test_parsed_url_is_read_only():
+    parsed_url = parse_url('https://lorem.dot.net/assets/python.png')
+
+    with pytest.raises(AttributeError):
+        parsed_url.url = 'https://other.net'
+    with pytest.raises(AttributeError):
+        parsed_url.netloc = 'other.net'
+    with pytest.raises(AttributeError):
+        parsed_url.anything = 1
@@ -1,5 +1,126 @@
 import os
-from urllib.parse import urlparse
+from functools import lru_cache
+from urllib.parse import urldefrag, urljoin, urlparse, urlunparse
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+PARSED_URLS_CACHE_SIZE = 4096
+
+
+class ParsedUrl:
+    """
+    Read-only url with its components computed on first access and
+    kept, so a url is parsed once however many of them are read.
+    Get instances through parse_url(), which memoizes them.
+    """
+
+    __slots__ = ('_url', '_parts', '_extension', '_local_filename',
+                 '_normalized')
+
+    def __init__(self, url):
+        self._url = url
+        self._parts = None
+        self._extension = None
+        self._local_filename = None
+        self._normalized = None
+
+    def __eq__(self, other):
+        if not isinstance(other, ParsedUrl):
+            return NotImplemented
+        return self._url == other._url
+
+    def __hash__(self):
+        return hash(self._url)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self._url!r})'
+
+    def __str__(self):
+        return self._url
+
+    @property
+    def url(self):
+        return self._url
+
+    @property
+    def scheme(self):
+        return self._get_parts().scheme
+
+    @property
+    def netloc(self):
+        return self._get_parts().netloc
+
+    @property
+    def host(self):
+        """
+        The netloc as normalize_url() gives it: lowercase, without the
+        default port of the scheme
+        """
+        parts = self._get_parts()
+        netloc = parts.netloc.lower()
+        if parts.port and DEFAULT_PORTS.get(parts.scheme.lower()) == \
+                parts.port:
+            netloc = netloc.rsplit(':', 1)[0]
+        return netloc
+
+    @property
+    def path(self):
+        return self._get_parts().path
+
+    @property
+    def full_domain(self):
+        return f'{self.scheme}://{self.netloc}'
+
+    @property
+    def is_absolute_path(self):
+        return self._url.startswith('/')
+
+    @property
+    def extension(self):
+        extension = self._extension
+        if extension is None:
+            _, extension = os.path.splitext(self.path)
+            extension = self._extension = extension[1:]
+        return extension
+
+    @property
+    def local_filename(self):
+        """
+        The filename filename_from_full_url() gives for the url
+        """
+        local_filename = self._local_filename
+        if local_filename is None:
+            domain = self.netloc.replace('.', '-')
+            path_part = self.path.replace('/', '-').rstrip('-')
+            local_filename = self._local_filename = f'{domain}{path_part}'
+        return local_filename
+
+    @property
+    def normalized(self):
+        """
+        The url normalize_url() gives
+        """
+        normalized = self._normalized
+        if normalized is None:
+            parts = self._get_parts()
+            netloc = self.host
+            path = parts.path or ('/' if netloc else '')
+            normalized = self._normalized = urlunparse(
+                (parts.scheme.lower(), netloc, path, parts.params,
+                 parts.query, ''))
+        return normalized
+
+    def _get_parts(self):
+        # Computing a component twice from two threads is harmless: both
+        # store the same value
+        parts = self._parts
+        if parts is None:
+            parts = self._parts = urlparse(self._url)
+        return parts
+
+
+@lru_cache(maxsize=PARSED_URLS_CACHE_SIZE)
+def parse_url(url):
+    return ParsedUrl(url)
 
 
 def filename_from_url(url):
@@ -77,3 +198,19 @@ def file_name(url):
 
 def is_absolute_path(url):
     return url.startswith('/')
+
+
+def normalize_url(url):
+    """
+    Normalize a url for comparison: lowercase the scheme and host,
+    drop the default port and the fragment
+    """
+    return parse_url(url).normalized
+
+
+def resolve_url(page_url, link):
+    """
+    Resolve a link found on the page at page_url to an absolute url
+    without the fragment
+    """
+    return urldefrag(urljoin(page_url, link)).url